@@ -1,29 +1,91 @@
-import os, io, uuid, json
-from flask import Flask, request, jsonify, render_template_string
+import os, io, uuid, json, zlib
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-import requests
 from pathlib import Path
-from PyPDF2 import PdfReader
 from PIL import Image
 from dotenv import load_dotenv
+from session_store import make_session_store, FileRecord, VersionConflict
+from order_store import OrderStore
+from whatsapp_client import WhatsAppClient
+from outbox import OutboundScheduler
+from blob_store import BlobStore
+from chunked_upload import ChunkedUploads, UploadError
+from page_counter import count_pdf_pages, count_document_pages
+from meta_cache import MetadataCache, describe_file
+from pricing import PRICING, PricingEngine, ENGINE as pricing_engine
+from static_assets import StaticAssets, IMMUTABLE, REVALIDATE
+from events import EventBus, format_sse
+from prerender import Prerenderer
 from datetime import datetime
 import threading
+import queue
 import time
-import math
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 load_dotenv()
 WHATSAPP_TOKEN = os.getenv("WHATSAPP_TOKEN")
 WHATSAPP_PHONE_ID = os.getenv("WHATSAPP_PHONE_ID")
 NGROK_URL = os.getenv("NGROK_URL")  # Add this to your .env file
+WHATSAPP_API_BASE = os.getenv("WHATSAPP_API_BASE", "https://graph.facebook.com/v17.0")
 UPLOAD_DIR = Path("uploads")
 ORDERS_DIR = Path("orders")
 UPLOAD_DIR.mkdir(exist_ok=True)
 ORDERS_DIR.mkdir(exist_ok=True)
+blobs = BlobStore(UPLOAD_DIR)
+chunked_uploads = ChunkedUploads(
+    UPLOAD_DIR / "partial", blobs,
+    max_size=int(os.getenv("CHUNKED_UPLOAD_MAX_MB", "200")) * 1024 * 1024,
+)
+metadata_cache = MetadataCache(
+    os.getenv("METADATA_CACHE_DB", "metadata_cache.db"),
+    max_entries=int(os.getenv("METADATA_CACHE_SIZE", "50000")),
+)
 
-app = Flask(__name__)
+# Static files are served by static_file() below with fingerprinted URLs
+app = Flask(__name__, static_folder=None)
 CORS(app, resources={r"/*": {"origins": "*"}})
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
-sessions = {}
+static_assets = StaticAssets(Path(__file__).parent / "static")
+order_template = app.jinja_env.get_template("order.html")  # compiled once at startup
+# SESSION_BACKEND=sqlite shares sessions between gunicorn workers and restarts
+sessions = make_session_store(
+    os.getenv("SESSION_BACKEND", "memory"),
+    os.getenv("SESSION_DB", "sessions.db"),
+    ttl=int(os.getenv("SESSION_TTL", str(24 * 3600))),
+    completed_ttl=int(os.getenv("COMPLETED_SESSION_TTL", "3600")),
+    max_sessions=int(os.getenv("MAX_SESSIONS", "10000")),
+)
+
+# Indexed order database; seeded from orders/*.json on first start
+orders_db = OrderStore(os.getenv("ORDER_DB", "orders.db"))
+if len(orders_db) == 0:
+    imported = orders_db.import_json_dir(ORDERS_DIR)
+    if imported:
+        print(f"✅ Imported {imported} existing order(s) into {orders_db.path}")
+
+# Printer-ready PDFs rendered in the background when files arrive and
+# when orders are placed, so the print service only has to spool them
+prerenderer = Prerenderer(
+    UPLOAD_DIR,
+    dpi=int(os.getenv("PRERENDER_DPI", "300")),
+    workers=int(os.getenv("PRERENDER_WORKERS", "2")),
+    image_workers=int(os.getenv("IMAGE_WORKERS", "2")),
+    # Trim the table/background around photographed documents
+    autocrop=os.getenv("PRERENDER_AUTOCROP", "0") == "1",
+)
+
+# Per-file save/hash/page-count work for multi-file web uploads
+upload_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("UPLOAD_WORKERS", "4")), thread_name_prefix="upload")
+
+# Webhook ingestion: messages are queued and handled by a bounded worker pool
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", "4"))
+MEDIA_QUEUE_SIZE = int(os.getenv("MEDIA_QUEUE_SIZE", "200"))
+SEEN_MESSAGE_LIMIT = 5000
+media_queue = queue.Queue(maxsize=MEDIA_QUEUE_SIZE)
+seen_message_ids = OrderedDict()
+seen_lock = threading.Lock()
 
 SUPPORTED_FORMATS = {
     'pdf': ['pdf'],
@@ -33,42 +95,47 @@ SUPPORTED_FORMATS = {
     'presentation': ['ppt', 'pptx']
 }
 
-PRICING = {
-    'sheet_bw': 1.1,
-    'sheet_color': 6.0
-}
+DOCUMENT_FORMATS = (
+    SUPPORTED_FORMATS['document'] + SUPPORTED_FORMATS['spreadsheet'] + SUPPORTED_FORMATS['presentation']
+)
+
+whatsapp = WhatsAppClient(
+    WHATSAPP_TOKEN,
+    WHATSAPP_PHONE_ID,
+    base_url=WHATSAPP_API_BASE,
+    max_retries=int(os.getenv("WHATSAPP_MAX_RETRIES", "3")),
+)
 
 def send_whatsapp_text(to_phone, text):
     """Send WhatsApp message"""
-    url = f"https://graph.facebook.com/v17.0/{WHATSAPP_PHONE_ID}/messages"
-    headers = {"Authorization": f"Bearer {WHATSAPP_TOKEN}", "Content-Type": "application/json"}
-    payload = {"messaging_product":"whatsapp", "to": to_phone, "type":"text", "text": {"body": text}}
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=5)
-        r.raise_for_status()
-        return r.json()
+        return whatsapp.send_text(to_phone, text)
     except Exception as e:
         print(f"Send error: {e}")
         return None
 
+# All customer-facing messages go through the outbox: per-user coalescing, global rate limit
+# Live order page updates (Server-Sent Events)
+events = EventBus()
+SSE_HEARTBEAT = int(os.getenv("SSE_HEARTBEAT", "15"))      # seconds between keep-alive comments
+SSE_MAX_AGE = int(os.getenv("SSE_MAX_AGE", "900"))         # close and let the browser reconnect
+SSE_RETRY_MS = 3000
+PRINT_STATUSES = ("queued", "printing", "printed", "failed")
+PRINT_STATUS_TOKEN = os.getenv("PRINT_STATUS_TOKEN")
+
+outbox = OutboundScheduler(
+    send_whatsapp_text,
+    window=float(os.getenv("OUTBOX_WINDOW", "1.5")),
+    rate=float(os.getenv("OUTBOX_RATE", "20")),
+)
+
 def download_media_fast(media_id, filename):
-    """Download media file"""
+    """Download media file into the blob store; returns (blob, media_url)"""
     try:
-        url = f"https://graph.facebook.com/v17.0/{media_id}"
-        headers = {"Authorization": f"Bearer {WHATSAPP_TOKEN}"}
-        r = requests.get(url, headers=headers, timeout=10)
-        r.raise_for_status()
-        media_url = r.json().get("url")
-        
-        r2 = requests.get(media_url, headers=headers, stream=True, timeout=30)
-        r2.raise_for_status()
-        
-        path = UPLOAD_DIR / filename
-        with open(path, "wb") as f:
-            for chunk in r2.iter_content(chunk_size=128*1024):
-                if chunk:
-                    f.write(chunk)
-        return str(path), media_url
+        media_url, r = whatsapp.open_media(media_id)
+        with r:
+            blob = blobs.write_stream(r.iter_content(chunk_size=128*1024), get_file_extension(filename))
+        return blob, media_url
     except Exception as e:
         print(f"Download error: {e}")
         raise
@@ -76,36 +143,42 @@ def download_media_fast(media_id, filename):
 def get_file_extension(filename):
     return filename.lower().rsplit('.', 1)[-1] if '.' in filename else ''
 
-def count_pages_smart(file_path, file_ext):
-    """Count pages based on file type"""
+def count_pages_smart(file_path, file_ext, sha256=None):
+    """Count pages based on file type (cached by content hash, else size/mtime/inode)"""
     try:
-        if file_ext == 'pdf':
-            reader = PdfReader(file_path)
-            return len(reader.pages)
-        elif file_ext in SUPPORTED_FORMATS['image']:
-            if file_ext in ['tiff', 'tif']:
-                try:
-                    img = Image.open(file_path)
-                    pages = 1
-                    try:
-                        while True:
-                            img.seek(img.tell() + 1)
-                            pages += 1
-                    except EOFError:
-                        pass
-                    return pages
-                except:
-                    return 1
-            return 1
-        elif file_ext in SUPPORTED_FORMATS['document']:
-            file_size = os.path.getsize(file_path)
-            return max(1, min(100, file_size // 3000 if file_ext == 'txt' else file_size // 50000))
-        else:
-            return 1
+        key = metadata_cache.key_for(file_path, sha256)
+        meta = metadata_cache.get(key)
+        if meta and meta.get("page_count"):
+            return meta["page_count"]
+        pages, source = count_pages_uncached(file_path, file_ext)
+        if source == "size-estimate":
+            print(f"⚠️ No page metadata in {Path(file_path).name}: {pages} pages estimated from file size")
+        meta = describe_file(file_path, file_ext, pages)
+        meta["page_count_source"] = source
+        metadata_cache.put(key, meta)
+        return pages
     except Exception as e:
         print(f"Page count error: {e}")
         return 1
 
+def count_pages_uncached(file_path, file_ext):
+    """Count pages based on file type; returns (pages, source)"""
+    if file_ext == 'pdf':
+        return count_pdf_pages(file_path), "pdf"
+    elif file_ext in SUPPORTED_FORMATS['image']:
+        if file_ext in ['tiff', 'tif']:
+            # Frame count comes from the TIFF directory chain; no frame is decoded
+            try:
+                with Image.open(file_path) as img:
+                    return getattr(img, "n_frames", 1), "image"
+            except Exception:
+                return 1, "image"
+        return 1, "image"
+    elif file_ext in DOCUMENT_FORMATS:
+        return count_document_pages(file_path, file_ext)
+    else:
+        return 1, "default"
+
 def is_supported_format(filename):
     ext = get_file_extension(filename)
     all_formats = []
@@ -113,11 +186,28 @@ def is_supported_format(filename):
         all_formats.extend(formats)
     return ext in all_formats
 
+def add_session_file(job, record):
+    """Add a file to the session and push it to any open order page"""
+    sessions.add_file(job, record)
+    events.publish(job.session_id, "file-added", {"version": job.version, "file": record.to_dict()})
+    prerenderer.submit(record.local_path, record.sha256, record.file_type, record.print_options)
+    return record
+
+def publish_order_update(job):
+    """Push the current file list and totals to any open order page"""
+    events.publish(job.session_id, "quote-updated", {
+        "version": job.version,
+        "files": job.order_data()["files"],
+        "total_pages": job.total_pages,
+        "total_sheets": job.total_sheets,
+        "total_price": job.total_price
+    })
+
 def send_web_link(from_phone, session_id):
     """Send web interface link to user"""
     web_url = f"{NGROK_URL}/order/{session_id}"
     message = f"🔗 {web_url}"
-    send_whatsapp_text(from_phone, message)
+    outbox.post_link(from_phone, message)
 
 def process_uploaded_file(from_phone, media_id, filename):
     """Process uploaded file and add to session"""
@@ -127,30 +217,13 @@ def process_uploaded_file(from_phone, media_id, filename):
     
     try:
         print(f"📥 Downloading: {filename}")
-        local_path, file_url = download_media_fast(media_id, filename)
+        blob, file_url = download_media_fast(media_id, filename)
         file_ext = get_file_extension(filename)
-        pages = count_pages_smart(local_path, file_ext)
-        
-        file_id = f"FILE_{len(job['order_data']['files']) + 1}"
-        file_obj = {
-            "file_id": file_id,
-            "file_url": file_url,
-            "filename": filename,
-            "file_type": file_ext,
-            "local_path": local_path,
-            "print_options": {
-                "color": False,
-                "sides": "double",
-                "copies": 1
-            },
-            "page_count": pages,
-            "sheets_required": None,
-            "total_sheets": None,
-            "price": None,
-            "processing_status": "pending"
-        }
+        pages = count_pages_smart(str(blob.path), file_ext, sha256=blob.sha256)
         
-        job["order_data"]["files"].append(file_obj)
+        record = FileRecord(filename, file_ext, str(blob.path), page_count=pages,
+                            file_url=file_url, sha256=blob.sha256)
+        add_session_file(job, record)
         print(f"✅ Processed: {filename} ({pages} pages)")
         return True
         
@@ -162,6 +235,89 @@ def process_uploaded_file(from_phone, media_id, filename):
 def home():
     return "WhatsApp Print Shop Bot is running!"
 
+def handle_message(m, value):
+    """Handle a single WhatsApp message (runs on a media worker)"""
+    from_phone = m.get("from")
+    msg_type = m.get("type")
+
+    # Initialize session
+    job = sessions.get_or_create(from_phone)
+    session_id = job.session_id
+
+    # Handle TEXT messages
+    if msg_type == "text":
+        text = m.get("text", {}).get("body", "").strip().lower()
+
+        # RESTART KEYWORD: "hi" resets everything
+        if text == "hi":
+            job = sessions.create(from_phone)
+            session_id = job.session_id
+
+            greeting = (
+                "👋 *Welcome to Print Shop!*\n\n"
+                "💰 Pricing:\n"
+                f"• B&W: ₹{PRICING['sheet_bw']:g}/sheet\n"
+                f"• Color: ₹{PRICING['sheet_color']:g}/sheet\n\n"
+                "📤 Send your files to get started!"
+            )
+            outbox.post(from_phone, greeting)
+            send_web_link(from_phone, session_id)
+        else:
+            send_web_link(from_phone, session_id)
+
+    # Handle IMAGE and DOCUMENT uploads
+    elif msg_type in ("image", "document"):
+        media_obj = m.get(msg_type) or {}
+        media_id = media_obj.get("id")
+
+        # Generate filename
+        if msg_type == "image":
+            mime_type = media_obj.get("mime_type", "image/jpeg")
+            ext = mime_type.split('/')[-1].replace('jpeg', 'jpg')
+            filename = media_obj.get("filename") or f"img_{uuid.uuid4().hex[:8]}.{ext}"
+        else:
+            filename = media_obj.get("filename") or f"doc_{uuid.uuid4().hex[:8]}.pdf"
+
+        if not is_supported_format(filename):
+            outbox.post(from_phone, f"❌ {filename}: Unsupported format")
+            return
+
+        # Process file
+        success = process_uploaded_file(from_phone, media_id, filename)
+
+        if success:
+            outbox.post_upload(from_phone, filename)
+            send_web_link(from_phone, session_id)
+
+def media_worker():
+    """Drain the webhook queue: download, count pages, notify"""
+    while True:
+        m, value = media_queue.get()
+        try:
+            handle_message(m, value)
+        except Exception as e:
+            print(f"❌ Worker error: {e}")
+        finally:
+            media_queue.task_done()
+
+def start_media_workers():
+    """Start the background media worker pool"""
+    for i in range(MEDIA_WORKERS):
+        t = threading.Thread(target=media_worker, name=f"media-worker-{i}", daemon=True)
+        t.start()
+
+def mark_message_seen(msg_id):
+    """Return False if this message id was already queued (Meta retries)"""
+    if not msg_id:
+        return True
+    with seen_lock:
+        if msg_id in seen_message_ids:
+            return False
+        seen_message_ids[msg_id] = True
+        if len(seen_message_ids) > SEEN_MESSAGE_LIMIT:
+            seen_message_ids.popitem(last=False)
+        return True
+
 @app.route("/webhook", methods=["GET","POST"])
 def webhook():
     if request.method == "GET":
@@ -174,827 +330,223 @@ def webhook():
             return challenge, 200
         return "Verification failed", 403
 
+    # Fast path: status-only payloads (delivery/read receipts) carry no messages
+    raw = request.get_data(cache=True)
+    if b'"messages"' not in raw:
+        return jsonify({"status":"received"}), 200
+
     try:
-        data = request.get_json(force=True)
+        data = json.loads(raw)
     except Exception as e:
         return jsonify({"status":"error"}), 400
 
+    if not isinstance(data, dict):
+        return jsonify({"status":"error"}), 400
+
     entries = data.get("entry") or []
-    messages = []
     for ent in entries:
         for change in ent.get("changes", []):
             value = change.get("value", {})
             msgs = value.get("messages") or []
             for m in msgs:
-                messages.append((m, value))
-
-    for m, value in messages:
-        from_phone = m.get("from")
-        msg_type = m.get("type")
-        
-        # Initialize session
-        if from_phone not in sessions:
-            session_id = uuid.uuid4().hex[:12].upper()
-            sessions[from_phone] = {
-                "session_id": session_id,
-                "order_placed": False,
-                "order_data": {
-                    "order_id": f"ORD_{uuid.uuid4().hex[:8].upper()}",
-                    "session_id": session_id,
-                    "user_id": from_phone,
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "files": [],
-                    "total_price": None,
-                    "total_pages": None,
-                    "total_sheets": None,
-                    "payment_status": "pending",
-                    "order_status": "pending"
-                }
-            }
-        
-        job = sessions[from_phone]
-        session_id = job["session_id"]
-
-        # Handle TEXT messages
-        if msg_type == "text":
-            text = m.get("text", {}).get("body", "").strip().lower()
-            
-            # RESTART KEYWORD: "hi" resets everything
-            if text == "hi":
-                session_id = uuid.uuid4().hex[:12].upper()
-                sessions[from_phone] = {
-                    "session_id": session_id,
-                    "order_placed": False,
-                    "order_data": {
-                        "order_id": f"ORD_{uuid.uuid4().hex[:8].upper()}",
-                        "session_id": session_id,
-                        "user_id": from_phone,
-                        "timestamp": datetime.utcnow().isoformat(),
-                        "files": [],
-                        "total_price": None,
-                        "total_pages": None,
-                        "total_sheets": None,
-                        "payment_status": "pending",
-                        "order_status": "pending"
-                    }
-                }
-                
-                greeting = (
-                    "👋 *Welcome to Print Shop!*\n\n"
-                    "💰 Pricing:\n"
-                    "• B&W: ₹1.1/sheet\n"
-                    "• Color: ₹6/sheet\n\n"
-                    "📤 Send your files to get started!"
-                )
-                send_whatsapp_text(from_phone, greeting)
-                time.sleep(0.5)
-                send_web_link(from_phone, session_id)
-            else:
-                send_web_link(from_phone, session_id)
-
-        # Handle IMAGE and DOCUMENT uploads
-        elif msg_type in ("image", "document"):
-            media_obj = m.get(msg_type) or {}
-            media_id = media_obj.get("id")
-            
-            # Generate filename
-            if msg_type == "image":
-                mime_type = media_obj.get("mime_type", "image/jpeg")
-                ext = mime_type.split('/')[-1].replace('jpeg', 'jpg')
-                filename = media_obj.get("filename") or f"img_{uuid.uuid4().hex[:8]}.{ext}"
-            else:
-                filename = media_obj.get("filename") or f"doc_{uuid.uuid4().hex[:8]}.pdf"
-            
-            if not is_supported_format(filename):
-                send_whatsapp_text(from_phone, f"❌ {filename}: Unsupported format")
-                continue
-            
-            # Process file
-            success = process_uploaded_file(from_phone, media_id, filename)
-            
-            if success:
-                send_whatsapp_text(from_phone, f"✓ {filename} uploaded!")
-                time.sleep(0.5)
-                send_web_link(from_phone, session_id)
+                if not m.get("from"):
+                    continue
+                if not mark_message_seen(m.get("id")):
+                    continue
+                try:
+                    media_queue.put_nowait((m, value))
+                except queue.Full:
+                    # Let Meta retry later; already-queued ids are skipped on retry
+                    with seen_lock:
+                        seen_message_ids.pop(m.get("id"), None)
+                    print("⚠️ Media queue full, asking Meta to retry")
+                    return jsonify({"status":"busy"}), 503
 
     return jsonify({"status":"received"}), 200
 
+start_media_workers()
+
 @app.route("/order/<session_id>")
 def order_page(session_id):
     """Web interface for configuring print order"""
-    
-    HTML_TEMPLATE = '''
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Print Shop - Configure Order</title>
-        <style>
-            * {
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }
-            
-            body {
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-                padding: 20px;
-            }
-            
-            .container {
-                max-width: 900px;
-                margin: 0 auto;
-            }
-            
-            .header {
-                text-align: center;
-                color: white;
-                margin-bottom: 30px;
-            }
-            
-            .header h1 {
-                font-size: 2.5rem;
-                margin-bottom: 10px;
-            }
-            
-            .pricing-info {
-                background: rgba(255, 255, 255, 0.2);
-                backdrop-filter: blur(10px);
-                border-radius: 15px;
-                padding: 20px;
-                color: white;
-                margin-bottom: 30px;
-            }
-            
-            .upload-area {
-                background: white;
-                border-radius: 15px;
-                padding: 40px;
-                text-align: center;
-                border: 3px dashed #667eea;
-                cursor: pointer;
-                transition: all 0.3s;
-                margin-bottom: 30px;
-            }
-            
-            .upload-area:hover {
-                border-color: #764ba2;
-                background: #f8f9ff;
-            }
-            
-            .upload-area.dragover {
-                background: #e8ebff;
-                border-color: #764ba2;
-            }
-            
-            .files-container {
-                display: flex;
-                flex-direction: column;
-                gap: 15px;
-                margin-bottom: 30px;
-            }
-            
-            .file-card {
-                background: white;
-                border-radius: 15px;
-                padding: 20px;
-                box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-            }
-            
-            .file-header {
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-                margin-bottom: 15px;
-            }
-            
-            .file-name {
-                font-weight: bold;
-                font-size: 1.1rem;
-                color: #333;
-                flex: 1;
-            }
-            
-            .remove-btn {
-                background: #ff4757;
-                color: white;
-                border: none;
-                padding: 8px 16px;
-                border-radius: 8px;
-                cursor: pointer;
-                font-weight: bold;
-            }
-            
-            .remove-btn:hover {
-                background: #ff3838;
-            }
-            
-            .file-options {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
-                gap: 15px;
-                margin-bottom: 15px;
-            }
-            
-            .option-group {
-                display: flex;
-                flex-direction: column;
-                gap: 5px;
-            }
-            
-            .option-group label {
-                font-weight: 600;
-                color: #666;
-                font-size: 0.9rem;
-            }
-            
-            .option-group select,
-            .option-group input {
-                padding: 10px;
-                border: 2px solid #e0e0e0;
-                border-radius: 8px;
-                font-size: 1rem;
-                transition: border 0.3s;
-            }
-            
-            .option-group select:focus,
-            .option-group input:focus {
-                outline: none;
-                border-color: #667eea;
-            }
-            
-            .file-price {
-                text-align: right;
-                font-size: 1.3rem;
-                font-weight: bold;
-                color: #667eea;
-            }
-            
-            .summary {
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                border-radius: 15px;
-                padding: 30px;
-                color: white;
-                margin-bottom: 20px;
-            }
-            
-            .summary h2 {
-                margin-bottom: 20px;
-            }
-            
-            .summary-row {
-                display: flex;
-                justify-content: space-between;
-                margin-bottom: 10px;
-                font-size: 1.1rem;
-            }
-            
-            .summary-total {
-                font-size: 1.8rem;
-                font-weight: bold;
-                border-top: 2px solid rgba(255, 255, 255, 0.3);
-                padding-top: 15px;
-                margin-top: 15px;
-            }
-            
-            .action-buttons {
-                display: grid;
-                grid-template-columns: 1fr 1fr;
-                gap: 15px;
-            }
-            
-            .btn {
-                padding: 18px;
-                border: none;
-                border-radius: 12px;
-                font-size: 1.1rem;
-                font-weight: bold;
-                cursor: pointer;
-                transition: all 0.3s;
-            }
-            
-            .btn-primary {
-                background: #10ac84;
-                color: white;
-            }
-            
-            .btn-primary:hover:not(:disabled) {
-                background: #0e9770;
-                transform: translateY(-2px);
-                box-shadow: 0 8px 15px rgba(16, 172, 132, 0.3);
-            }
-            
-            .btn-primary:disabled {
-                opacity: 0.5;
-                cursor: not-allowed;
-            }
-            
-            .btn-secondary {
-                background: #ff6b6b;
-                color: white;
-            }
-            
-            .btn-secondary:hover {
-                background: #ee5a52;
-            }
-            
-            .hidden {
-                display: none;
-            }
-            
-            .loading {
-                text-align: center;
-                padding: 20px;
-                color: white;
-                font-size: 1.2rem;
-            }
-            
-            @media (max-width: 768px) {
-                .file-options {
-                    grid-template-columns: 1fr;
-                }
-                
-                .action-buttons {
-                    grid-template-columns: 1fr;
-                }
-            }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>📄 Print Shop</h1>
-                <p>Upload your documents and configure print settings</p>
-            </div>
-            
-            <div class="pricing-info">
-                <h3>💰 Pricing (per sheet):</h3>
-                <p>B&W: ₹1.1/sheet | Color: ₹6/sheet</p>
-                <p style="margin-top: 10px; font-size: 0.9rem;">
-                    Single-sided: 1 page = 1 sheet | Double-sided: 2 pages = 1 sheet
-                </p>
-            </div>
-            
-            <div class="upload-area" id="uploadArea">
-                <div style="font-size: 3rem; margin-bottom: 15px;">📤</div>
-                <h3>Drop files here or click to upload</h3>
-                <p style="color: #666; margin-top: 10px;">Supports: PDF, Images, DOC, XLS, PPT</p>
-                <input type="file" id="fileInput" multiple accept=".pdf,.jpg,.jpeg,.png,.doc,.docx,.xls,.xlsx,.ppt,.pptx" class="hidden">
-            </div>
-            
-            <div id="loadingIndicator" class="loading hidden">
-                <div style="font-size: 2rem; margin-bottom: 10px;">⏳</div>
-                <div>Uploading files...</div>
-            </div>
-            
-            <div class="files-container" id="filesContainer"></div>
-            
-            <div class="summary" id="summary" style="display: none;">
-                <h2>📋 Order Summary</h2>
-                <div class="summary-row">
-                    <span>Total Pages:</span>
-                    <span id="totalPages">0</span>
-                </div>
-                <div class="summary-row">
-                    <span>Total Sheets:</span>
-                    <span id="totalSheets">0</span>
-                </div>
-                <div class="summary-row summary-total">
-                    <span>Total Price:</span>
-                    <span id="totalPrice">₹0.00</span>
-                </div>
-            </div>
-            
-            <div class="action-buttons">
-                <button class="btn btn-primary" id="placeOrderBtn" onclick="placeOrder()">
-                    💳 Place Order
-                </button>
-                <button class="btn btn-secondary" onclick="clearAll()">
-                    🗑️ Clear All
-                </button>
-            </div>
-        </div>
-        
-        <script>
-            const SESSION_ID = "{{ session_id }}";
-            let files = [];
-            
-            // Load existing files
-            async function loadFiles() {
-                try {
-                    const response = await fetch(`/api/order/${SESSION_ID}`);
-                    const data = await response.json();
-                    
-                    if (data.files && data.files.length > 0) {
-                        files = data.files;
-                        renderFiles();
-                    }
-                } catch (error) {
-                    console.error('Error loading files:', error);
-                }
-            }
-            
-            // Upload area interactions
-            const uploadArea = document.getElementById('uploadArea');
-            const fileInput = document.getElementById('fileInput');
-            const loadingIndicator = document.getElementById('loadingIndicator');
-            
-            uploadArea.addEventListener('click', () => fileInput.click());
-            
-            uploadArea.addEventListener('dragover', (e) => {
-                e.preventDefault();
-                uploadArea.classList.add('dragover');
-            });
-            
-            uploadArea.addEventListener('dragleave', () => {
-                uploadArea.classList.remove('dragover');
-            });
-            
-            uploadArea.addEventListener('drop', (e) => {
-                e.preventDefault();
-                uploadArea.classList.remove('dragover');
-                handleFiles(e.dataTransfer.files);
-            });
-            
-            fileInput.addEventListener('change', (e) => {
-                handleFiles(e.target.files);
-                fileInput.value = ''; // Reset input
-            });
-            
-            async function handleFiles(fileList) {
-                if (!fileList || fileList.length === 0) {
-                    return;
-                }
-                
-                const formData = new FormData();
-                
-                for (let file of fileList) {
-                    formData.append('files', file);
-                }
-                
-                formData.append('session_id', SESSION_ID);
-                
-                // Show loading
-                loadingIndicator.classList.remove('hidden');
-                uploadArea.style.opacity = '0.5';
-                uploadArea.style.pointerEvents = 'none';
-                
-                try {
-                    const response = await fetch('/api/upload', {
-                        method: 'POST',
-                        body: formData
-                    });
-                    
-                    const data = await response.json();
-                    
-                    if (data.success) {
-                        files = data.files;
-                        renderFiles();
-                        
-                        // Show success message
-                        alert(`Successfully uploaded ${fileList.length} file(s)`);
-                    } else {
-                        alert('Failed to upload files: ' + (data.error || 'Unknown error'));
-                    }
-                } catch (error) {
-                    console.error('Upload error:', error);
-                    alert('Failed to upload files. Please try again.');
-                } finally {
-                    // Hide loading
-                    loadingIndicator.classList.add('hidden');
-                    uploadArea.style.opacity = '1';
-                    uploadArea.style.pointerEvents = 'auto';
-                }
-            }
-            
-            function renderFiles() {
-                const container = document.getElementById('filesContainer');
-                const summary = document.getElementById('summary');
-                
-                if (files.length === 0) {
-                    container.innerHTML = '';
-                    summary.style.display = 'none';
-                    return;
-                }
-                
-                summary.style.display = 'block';
-                
-                container.innerHTML = files.map((file, index) => `
-                    <div class="file-card">
-                        <div class="file-header">
-                            <div class="file-name">📄 ${file.filename} <span style="color: #999; font-size: 0.9rem;">(${file.page_count} pages)</span></div>
-                            <button class="remove-btn" onclick="removeFile(${index})">✕</button>
-                        </div>
-                        <div class="file-options">
-                            <div class="option-group">
-                                <label>Print Mode</label>
-                                <select onchange="updateFile(${index}, 'sides', this.value)">
-                                    <option value="double" ${file.print_options.sides === 'double' ? 'selected' : ''}>Double-sided</option>
-                                    <option value="single" ${file.print_options.sides === 'single' ? 'selected' : ''}>Single-sided</option>
-                                </select>
-                            </div>
-                            <div class="option-group">
-                                <label>Color</label>
-                                <select onchange="updateFile(${index}, 'color', this.value === 'true')">
-                                    <option value="false" ${!file.print_options.color ? 'selected' : ''}>B&W</option>
-                                    <option value="true" ${file.print_options.color ? 'selected' : ''}>Color</option>
-                                </select>
-                            </div>
-                            <div class="option-group">
-                                <label>Copies</label>
-                                <input type="number" min="1" max="100" value="${file.print_options.copies}" onchange="updateFile(${index}, 'copies', parseInt(this.value))">
-                            </div>
-                        </div>
-                        <div class="file-price" id="price_${index}">₹${calculatePrice(file).toFixed(2)}</div>
-                    </div>
-                `).join('');
-                
-                updateSummary();
-            }
-            
-            function calculatePrice(file) {
-                const pages = file.page_count;
-                const copies = file.print_options.copies;
-                const color = file.print_options.color;
-                const sides = file.print_options.sides;
-                
-                let sheets = sides === 'single' ? pages : Math.ceil(pages / 2);
-                let totalSheets = sheets * copies;
-                let rate = color ? 6.0 : 1.1;
-                
-                return totalSheets * rate;
-            }
-            
-            async function updateFile(index, key, value) {
-                files[index].print_options[key] = value;
-                
-                // Update on server
-                try {
-                    await fetch('/api/update', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({
-                            session_id: SESSION_ID,
-                            files: files
-                        })
-                    });
-                    
-                    renderFiles();
-                } catch (error) {
-                    console.error('Update error:', error);
-                }
-            }
-            
-            async function removeFile(index) {
-                if (!confirm('Remove this file?')) {
-                    return;
-                }
-                
-                files.splice(index, 1);
-                
-                try {
-                    await fetch('/api/update', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({
-                            session_id: SESSION_ID,
-                            files: files
-                        })
-                    });
-                    
-                    renderFiles();
-                } catch (error) {
-                    console.error('Remove error:', error);
-                }
-            }
-            
-            function updateSummary() {
-                let totalPages = 0;
-                let totalSheets = 0;
-                let totalPrice = 0;
-                
-                files.forEach(file => {
-                    totalPages += file.page_count;
-                    
-                    const sheets = file.print_options.sides === 'single' 
-                        ? file.page_count 
-                        : Math.ceil(file.page_count / 2);
-                    
-                    totalSheets += sheets * file.print_options.copies;
-                    totalPrice += calculatePrice(file);
-                });
-                
-                document.getElementById('totalPages').textContent = totalPages;
-                document.getElementById('totalSheets').textContent = totalSheets;
-                document.getElementById('totalPrice').textContent = `₹${totalPrice.toFixed(2)}`;
-            }
-            
-            async function placeOrder() {
-                const btn = document.getElementById('placeOrderBtn');
-                
-                if (files.length === 0) {
-                    alert('Please upload at least one file');
-                    return;
-                }
-                
-                // Disable button to prevent double-click
-                if (btn.disabled) {
-                    return;
-                }
-                
-                btn.disabled = true;
-                btn.style.opacity = '0.5';
-                btn.style.cursor = 'not-allowed';
-                btn.innerHTML = '⏳ Processing...';
-                
-                try {
-                    const response = await fetch('/api/place-order', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({
-                            session_id: SESSION_ID
-                        })
-                    });
-                    
-                    const data = await response.json();
-                    
-                    if (data.success) {
-                        btn.innerHTML = '✅ Order Placed!';
-                        alert('Order placed successfully! Redirecting to payment...');
-                        
-                        // Redirect to UPI payment
-                        setTimeout(() => {
-                            window.location.href = data.payment_url;
-                        }, 1500);
-                    } else {
-                        alert(data.message || data.error || 'Failed to place order');
-                        // Re-enable button if there was an error
-                        btn.disabled = false;
-                        btn.style.opacity = '1';
-                        btn.style.cursor = 'pointer';
-                        btn.innerHTML = '💳 Place Order';
-                    }
-                } catch (error) {
-                    console.error('Order error:', error);
-                    alert('Failed to place order. Please try again.');
-                    
-                    // Re-enable button on error
-                    btn.disabled = false;
-                    btn.style.opacity = '1';
-                    btn.style.cursor = 'pointer';
-                    btn.innerHTML = '💳 Place Order';
-                }
-            }
-            
-            function clearAll() {
-                if (confirm('Clear all files?')) {
-                    files = [];
-                    renderFiles();
-                    
-                    fetch('/api/update', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({
-                            session_id: SESSION_ID,
-                            files: []
-                        })
-                    });
-                }
-            }
-            
-            // Load files on page load
-            loadFiles();
-        </script>
-    </body>
-    </html>
-    '''
-    
-    return render_template_string(HTML_TEMPLATE, session_id=session_id)
+    html = order_template.render(session_id=session_id, asset_url=static_assets.url,
+                                 pricing=PRICING)
+    response = Response(html, mimetype="text/html")
+    response.headers["Cache-Control"] = "no-cache"
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route("/static/<path:name>")
+def static_file(name):
+    """Fingerprinted CSS/JS: cached forever, served precompressed"""
+    asset, immutable = static_assets.lookup(name)
+    if asset is None:
+        return "Not found", 404
+    encoding, body = asset.negotiate(request.headers.get("Accept-Encoding"))
+    headers = {
+        "Cache-Control": IMMUTABLE if immutable else REVALIDATE,
+        "Vary": "Accept-Encoding",
+        "ETag": f'"{asset.etag(encoding)}"',
+    }
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    if asset.etag(encoding) in request.if_none_match:
+        return Response(status=304, headers=headers)
+    return Response(body, headers=headers, content_type=asset.content_type)
 
 @app.route("/api/order/<session_id>")
 def get_order_api(session_id):
-    """Get order data by session ID"""
-    for phone, job in sessions.items():
-        if job.get("session_id") == session_id:
-            return jsonify(job["order_data"])
-    return jsonify({"files": []})
+    """Get order data by session ID (ETag is the session version)"""
+    version = sessions.version_of(session_id)
+    if version is not None and f"{session_id}-{version}" in request.if_none_match:
+        response = Response(status=304)
+    else:
+        job = sessions.get_by_id(session_id)
+        if not job:
+            return jsonify({"files": []})
+        data = job.order_data()
+        data["version"] = version = job.version
+        response = jsonify(data)
+    response.set_etag(f"{session_id}-{version}")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def expected_version(data):
+    """Version the client based its change on (JSON "version" or If-Match)"""
+    if data.get("version") is not None:
+        return int(data["version"])
+    for tag in request.if_match.as_set():
+        return int(tag.rsplit("-", 1)[-1])
+    return None
+
+def version_conflict(e, job):
+    return jsonify({
+        "success": False,
+        "error": str(e),
+        "version": e.version,
+        "files": job.order_data()["files"]
+    }), 409
+
+@app.route("/api/order/<session_id>/files/<file_id>", methods=["PATCH", "DELETE"])
+def patch_order_file(session_id, file_id):
+    """PATCH: change one file's print options. DELETE: remove the file"""
+    try:
+        data = request.get_json(silent=True) or {}
+        job = sessions.get_by_id(session_id)
+        if not job:
+            return jsonify({"success": False, "error": "Session not found"}), 404
+        if job.order_placed:
+            return jsonify({"success": False, "error": "Order already placed"}), 409
+        
+        if request.method == "DELETE":
+            if not sessions.remove_file(job, file_id, expected_version(data)):
+                return jsonify({"success": False, "error": "File not found"}), 404
+            publish_order_update(job)
+            return jsonify({"success": True, "version": job.version})
+        
+        options = data.get("print_options") or {}
+        record = sessions.patch_file(job, file_id, options, expected_version(data))
+        if record is None:
+            return jsonify({"success": False, "error": "File not found"}), 404
+        publish_order_update(job)
+        return jsonify({"success": True, "version": job.version, "file": record.to_dict()})
+    except VersionConflict as e:
+        return version_conflict(e, sessions.get_by_id(session_id))
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+@app.route("/api/order/<session_id>/files", methods=["DELETE"])
+def clear_order_files(session_id):
+    """Remove every file from the order"""
+    try:
+        job = sessions.get_by_id(session_id)
+        if not job:
+            return jsonify({"success": False, "error": "Session not found"}), 404
+        if job.order_placed:
+            return jsonify({"success": False, "error": "Order already placed"}), 409
+        sessions.set_files(job, [], expected_version(request.get_json(silent=True) or {}))
+        publish_order_update(job)
+        return jsonify({"success": True, "version": job.version})
+    except VersionConflict as e:
+        return version_conflict(e, sessions.get_by_id(session_id))
+
+def store_upload(file, filename):
+    """Save, hash and page-count one uploaded file (runs on the upload pool)"""
+    file_ext = get_file_extension(filename)
+    # Save file by content hash (repeat uploads reuse the stored blob)
+    blob = blobs.save_fileobj(file.stream, file_ext)
+    if not blob.path.exists():
+        raise Exception("File not saved to disk")
+    pages = count_pages_smart(str(blob.path), file_ext, sha256=blob.sha256)
+    print(f"✅ Stored {filename}: {blob.size} bytes, {pages} pages{' (duplicate)' if blob.existed else ''}")
+    return FileRecord(filename, file_ext, str(blob.path), page_count=pages, sha256=blob.sha256)
 
 @app.route("/api/upload", methods=["POST"])
 def upload_files():
     """Handle file uploads from web interface"""
     try:
-        print("📤 Upload request received")
-        print(f"Form data: {request.form}")
-        print(f"Files: {request.files}")
-        
         session_id = request.form.get('session_id')
-        print(f"Session ID: {session_id}")
         
         if not session_id:
             return jsonify({"success": False, "error": "Session ID required"})
         
         # Get files from request
-        uploaded_files = request.files.getlist('files')
-        print(f"Number of files received: {len(uploaded_files)}")
+        uploaded_files = [f for f in request.files.getlist('files') if f and f.filename]
         
-        if not uploaded_files or len(uploaded_files) == 0:
+        if not uploaded_files:
             return jsonify({"success": False, "error": "No files uploaded"})
         
         # Find session
-        job = None
-        for phone, sess in sessions.items():
-            if sess.get("session_id") == session_id:
-                job = sess
-                break
+        job = sessions.get_by_id(session_id)
         
         if not job:
             print(f"❌ Session not found: {session_id}")
             return jsonify({"success": False, "error": "Session not found"})
         
-        print(f"✅ Session found for phone: {job['order_data']['user_id']}")
+        print(f"📤 Upload: {len(uploaded_files)} file(s) for {job.phone}")
+        
+        # Save/hash/count every file in parallel, then add them in upload order
+        results = []
+        futures = []
+        for file in uploaded_files:
+            result = {"filename": file.filename, "success": False}
+            results.append(result)
+            if not is_supported_format(file.filename):
+                result["error"] = f"Unsupported format: {file.filename}"
+                futures.append(None)
+            else:
+                futures.append(upload_pool.submit(store_upload, file, file.filename))
         
         uploaded_count = 0
         errors = []
-        
-        for file in uploaded_files:
-            if not file or not file.filename:
-                print("⚠️ Empty file or no filename")
-                continue
-                
-            filename = file.filename
-            print(f"Processing file: {filename}")
-            
-            # Check if supported format
-            if not is_supported_format(filename):
-                error_msg = f"Unsupported format: {filename}"
-                print(f"⚠️ {error_msg}")
-                errors.append(error_msg)
-                continue
-            
-            try:
-                # Generate unique filename to avoid conflicts
-                unique_filename = f"{uuid.uuid4().hex[:8]}_{filename}"
-                file_path = UPLOAD_DIR / unique_filename
-                
-                # Save file
-                file.save(str(file_path))
-                print(f"✅ Saved to: {file_path}")
-                
-                # Verify file was saved
-                if not file_path.exists():
-                    raise Exception("File not saved to disk")
-                
-                file_size = os.path.getsize(file_path)
-                print(f"File size: {file_size} bytes")
-                
-                # Count pages
-                file_ext = get_file_extension(filename)
-                pages = count_pages_smart(str(file_path), file_ext)
-                print(f"Page count: {pages}")
-                
-                # Add to order
-                file_id = f"FILE_{len(job['order_data']['files']) + 1}"
-                file_obj = {
-                    "file_id": file_id,
-                    "filename": filename,
-                    "file_type": file_ext,
-                    "local_path": str(file_path),
-                    "print_options": {
-                        "color": False,
-                        "sides": "double",
-                        "copies": 1
-                    },
-                    "page_count": pages,
-                    "processing_status": "pending"
-                }
-                
-                job["order_data"]["files"].append(file_obj)
-                uploaded_count += 1
-                print(f"✅ Added to order: {filename} ({pages} pages)")
-                
-            except Exception as e:
-                error_msg = f"Error processing {filename}: {str(e)}"
-                print(f"❌ {error_msg}")
-                errors.append(error_msg)
-                import traceback
-                traceback.print_exc()
-                continue
+        for result, future in zip(results, futures):
+            if future is not None:
+                try:
+                    record = future.result()
+                    add_session_file(job, record)
+                    result.update(success=True, file_id=record.file_id, page_count=record.page_count)
+                    uploaded_count += 1
+                except Exception as e:
+                    result["error"] = f"Error processing {result['filename']}: {str(e)}"
+            if not result["success"]:
+                print(f"❌ {result['error']}")
+                errors.append(result["error"])
         
         if uploaded_count == 0:
             error_detail = " | ".join(errors) if errors else "Unknown error"
             return jsonify({
                 "success": False, 
-                "error": f"No files were successfully uploaded. {error_detail}"
+                "error": f"No files were successfully uploaded. {error_detail}",
+                "results": results
             })
         
         print(f"✅ Successfully uploaded {uploaded_count} file(s)")
         return jsonify({
             "success": True, 
-            "files": job["order_data"]["files"],
+            "files": job.order_data()["files"],
+            "version": job.version,
             "uploaded_count": uploaded_count,
+            "results": results,
             "errors": errors if errors else None
         })
         
@@ -1004,9 +556,69 @@ def upload_files():
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)})
 
+@app.route("/api/upload/init", methods=["POST"])
+def chunked_upload_init():
+    """Start (or resume) a chunked upload"""
+    try:
+        data = request.get_json(force=True) or {}
+        session_id = data.get('session_id')
+        filename = data.get('filename') or ''
+        if not sessions.get_by_id(session_id):
+            return jsonify({"success": False, "error": "Session not found"}), 404
+        if not is_supported_format(filename):
+            return jsonify({"success": False, "error": f"Unsupported format: {filename}"}), 400
+        upload = chunked_uploads.init(session_id, filename, int(data.get('size') or 0), data.get('upload_id'))
+        return jsonify({
+            "success": True,
+            "upload_id": upload["upload_id"],
+            "offset": upload["offset"],
+            "chunk_size": chunked_uploads.chunk_size
+        })
+    except UploadError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+
+@app.route("/api/upload/<upload_id>", methods=["GET", "PUT"])
+def chunked_upload_chunk(upload_id):
+    """GET: current server offset. PUT ?offset=N: append the raw request body"""
+    try:
+        if request.method == "GET":
+            upload = chunked_uploads.status(upload_id)
+            return jsonify({"success": True, "offset": upload["offset"], "size": upload["size"]})
+        offset = request.args.get("offset", type=int)
+        if offset is None:
+            return jsonify({"success": False, "error": "offset required"}), 400
+        new_offset = chunked_uploads.write_chunk(upload_id, offset, request.stream)
+        return jsonify({"success": True, "offset": new_offset})
+    except UploadError as e:
+        return jsonify({"success": False, "error": str(e), "offset": e.offset}), e.status
+
+@app.route("/api/upload/<upload_id>/finalize", methods=["POST"])
+def chunked_upload_finalize(upload_id):
+    """Hash-check, page-count and attach a completed chunked upload"""
+    try:
+        header = chunked_uploads.status(upload_id)
+        job = sessions.get_by_id(header["session_id"])
+        if not job:
+            return jsonify({"success": False, "error": "Session not found"}), 404
+        filename = header["filename"]
+        file_ext = get_file_extension(filename)
+        blob, _ = chunked_uploads.finalize(upload_id, file_ext)
+        pages = count_pages_smart(str(blob.path), file_ext, sha256=blob.sha256)
+        record = FileRecord(filename, file_ext, str(blob.path), page_count=pages, sha256=blob.sha256)
+        add_session_file(job, record)
+        print(f"✅ Chunked upload complete: {filename} ({blob.size} bytes, {pages} pages)")
+        return jsonify({
+            "success": True,
+            "file_id": record.file_id,
+            "files": job.order_data()["files"],
+            "version": job.version
+        })
+    except UploadError as e:
+        return jsonify({"success": False, "error": str(e), "offset": e.offset}), e.status
+
 @app.route("/api/update", methods=["POST"])
 def update_order():
-    """Update order data"""
+    """Replace the whole file list (older clients; the order page uses PATCH)"""
     try:
         data = request.json
         session_id = data.get('session_id')
@@ -1015,13 +627,17 @@ def update_order():
         if not session_id:
             return jsonify({"success": False, "error": "Session ID required"})
         
-        for phone, job in sessions.items():
-            if job.get("session_id") == session_id:
-                job["order_data"]["files"] = files
-                return jsonify({"success": True})
+        job = sessions.get_by_id(session_id)
+        if job:
+            sessions.set_files(job, [FileRecord.from_dict(f) for f in files or []],
+                               expected_version(data))
+            publish_order_update(job)
+            return jsonify({"success": True, "version": job.version})
         
         return jsonify({"success": False, "error": "Session not found"})
         
+    except VersionConflict as e:
+        return version_conflict(e, sessions.get_by_id(data.get('session_id')))
     except Exception as e:
         print(f"❌ Update error: {e}")
         return jsonify({"success": False, "error": str(e)})
@@ -1034,77 +650,48 @@ def place_order():
         session_id = data.get('session_id')
         
         # Find session
-        job = None
-        phone = None
-        for p, sess in sessions.items():
-            if sess.get("session_id") == session_id:
-                job = sess
-                phone = p
-                break
+        job = sessions.get_by_id(session_id)
         
         if not job:
             return jsonify({"success": False, "error": "Session not found"})
-        
-        # Check if order already placed (prevent duplicate orders)
-        if job.get("order_placed", False):
-            return jsonify({
-                "success": False, 
-                "error": "Order already placed",
-                "message": "This order has already been confirmed"
-            })
+        phone = job.phone
         
         # Validate files exist
-        if not job["order_data"]["files"] or len(job["order_data"]["files"]) == 0:
+        if not job.files:
             return jsonify({
                 "success": False,
                 "error": "No files in order"
             })
         
-        # Mark order as placed immediately to prevent duplicates
-        job["order_placed"] = True
-        
-        # Calculate totals
-        total_price = 0
-        total_pages = 0
-        total_sheets = 0
+        # Mark order as placed atomically to prevent duplicate orders
+        if not sessions.mark_placed(job):
+            return jsonify({
+                "success": False, 
+                "error": "Order already placed",
+                "message": "This order has already been confirmed"
+            })
         
-        for file_obj in job["order_data"]["files"]:
-            pages = file_obj["page_count"]
-            copies = file_obj["print_options"]["copies"]
-            color = file_obj["print_options"]["color"]
-            sides = file_obj["print_options"]["sides"]
-            
-            # Calculate sheets
-            sheets = pages if sides == 'single' else math.ceil(pages / 2)
-            total_sheets_file = sheets * copies
-            
-            # Calculate price
-            rate = PRICING['sheet_color'] if color else PRICING['sheet_bw']
-            price = total_sheets_file * rate
-            
-            file_obj["sheets_required"] = sheets
-            file_obj["total_sheets"] = total_sheets_file
-            file_obj["price"] = round(price, 2)
-            file_obj["processing_status"] = "completed"
-            
-            total_price += price
-            total_pages += pages
-            total_sheets += total_sheets_file
+        # Totals are kept up to date on every file change; nothing to recompute
+        total_price = job.total_price
+        for record in job.files:
+            record.processing_status = "completed"
         
-        job["order_data"]["total_price"] = round(total_price, 2)
-        job["order_data"]["total_pages"] = total_pages
-        job["order_data"]["total_sheets"] = total_sheets
-        job["order_data"]["order_status"] = "confirmed"
-        job["order_data"]["order_placed_at"] = datetime.utcnow().isoformat()
+        job.order_status = "confirmed"
+        job.order_placed_at = datetime.utcnow().isoformat()
+        sessions.save(job)
+        order_data = job.order_data()
+        publish_order_update(job)
         
         # Save order to JSON file
-        order_id = job["order_data"]["order_id"]
+        order_id = order_data["order_id"]
         
         # Save to server orders directory
         server_path = ORDERS_DIR / f"{order_id}.json"
         with open(server_path, 'w') as f:
-            json.dump(job["order_data"], f, indent=2)
+            json.dump(order_data, f, indent=2)
         print(f"✅ Order saved to server: {server_path}")
+        orders_db.put(order_data)
+        prerenderer.submit_order(order_data)
         
         # Save to Downloads folder
         try:
@@ -1116,12 +703,12 @@ def place_order():
             if downloads_dir.exists():
                 pc_path = downloads_dir / f"{order_id}.json"
                 with open(pc_path, 'w') as f:
-                    json.dump(job["order_data"], f, indent=2)
+                    json.dump(order_data, f, indent=2)
                 print(f"✅ Order saved to PC Downloads: {pc_path}")
             else:
                 pc_path = Path(f"{order_id}.json")
                 with open(pc_path, 'w') as f:
-                    json.dump(job["order_data"], f, indent=2)
+                    json.dump(order_data, f, indent=2)
                 print(f"✅ Order saved to current dir: {pc_path}")
         except Exception as e:
             print(f"⚠️ Could not save to Downloads: {e}")
@@ -1133,7 +720,7 @@ def place_order():
         # Send detailed confirmation to WhatsApp
         summary = f"✅ *Order #{order_id}*\n\n"
         
-        for i, f in enumerate(job["order_data"]["files"], 1):
+        for i, f in enumerate(order_data["files"], 1):
             opts = f['print_options']
             
             if opts["color"]:
@@ -1148,18 +735,19 @@ def place_order():
             summary += f"{i}. {f['filename']}\n"
             summary += f"   {f['page_count']}p|{sides}|{color}|{opts['copies']}x = {sheets_info} = ₹{f['price']}\n"
         
-        summary += f"\n📄 {job['order_data']['total_pages']}p total"
-        if job['order_data'].get('total_sheets'):
-            summary += f"\n📋 {job['order_data']['total_sheets']} sheets"
-        summary += f"\n💰 *₹{job['order_data']['total_price']}*"
+        summary += f"\n📄 {order_data['total_pages']}p total"
+        if order_data.get('total_sheets'):
+            summary += f"\n📋 {order_data['total_sheets']} sheets"
+        summary += f"\n💰 *₹{order_data['total_price']}*"
         summary += f"\n\n💳 UPI Payment:\n{payment_url}"
         
-        send_whatsapp_text(phone, summary)
+        outbox.post(phone, summary)
+        events.publish(job.session_id, "queued", {"order_id": order_id})
         
         # Print order to console
         print("\n" + "="*50)
         print("ORDER JSON:")
-        print(json.dumps(job["order_data"], indent=2))
+        print(json.dumps(order_data, indent=2))
         print("="*50 + "\n")
         
         return jsonify({
@@ -1173,28 +761,220 @@ def place_order():
         print(f"❌ Place order error: {e}")
         return jsonify({"success": False, "error": str(e)})
 
+def session_quote(job):
+    """Per-file prices and totals for a session"""
+    return {
+        "version": job.version,
+        "files": [
+            {k: f[k] for k in ("file_id", "sheets_required", "total_sheets", "price")}
+            for f in job.order_data()["files"]
+        ],
+        "total_pages": job.total_pages,
+        "total_sheets": job.total_sheets,
+        "total_price": job.total_price
+    }
+
+@app.route("/api/quote", methods=["GET", "POST"])
+def quote():
+    """Price quote
+
+    GET ?session_id=  current session (ETag is the session version)
+    GET               the rate card
+    POST {"files": [{"page_count", "print_options"}...]}  quote without a session
+    """
+    try:
+        if request.method == "POST":
+            files = (request.get_json(silent=True) or {}).get("files") or []
+            return jsonify({"success": True, **pricing_engine.quote(files)})
+        
+        session_id = request.args.get("session_id")
+        if not session_id:
+            return jsonify({"success": True, "pricing": pricing_engine.describe()})
+        version = sessions.version_of(session_id)
+        if version is None:
+            return jsonify({"success": False, "error": "Session not found"}), 404
+        etag = f"quote-{session_id}-{version}"
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            job = sessions.get_by_id(session_id)
+            data = session_quote(job)
+            etag = f"quote-{session_id}-{job.version}"
+            response = jsonify({"success": True, **data})
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+@app.route("/api/order/<session_id>/events")
+def order_events(session_id):
+    """Server-Sent Events: file-added, quote-updated and print progress for one session"""
+    if sessions.version_of(session_id) is None:
+        return jsonify({"success": False, "error": "Session not found"}), 404
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    sub = events.subscribe(session_id, last_event_id)
+
+    def stream():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            deadline = time.monotonic() + SSE_MAX_AGE
+            while time.monotonic() < deadline and not sub.dropped:
+                event = sub.get(timeout=SSE_HEARTBEAT)
+                yield format_sse(*event) if event else ": ping\n\n"
+        finally:
+            sub.close()
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@app.route("/api/print-status", methods=["POST"])
+def print_status():
+    """Progress reports from printer_service.py, relayed to the order page"""
+    if PRINT_STATUS_TOKEN and request.headers.get("X-Print-Token") != PRINT_STATUS_TOKEN:
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    data = request.get_json(silent=True) or {}
+    status = data.get("status")
+    if status not in PRINT_STATUSES:
+        return jsonify({"success": False, "error": f"Unknown status: {status}"}), 400
+    order = orders_db.get(data.get("order_id"))
+    if not order:
+        return jsonify({"success": False, "error": "Order not found"}), 404
+    if status != "queued" and order.get("order_status") != status:
+        order["order_status"] = status
+        orders_db.put(order)
+    event = {k: data[k] for k in ("order_id", "file_id", "filename", "detail") if data.get(k)}
+    events.publish(order["session_id"], status, event)
+    return jsonify({"success": True})
+
+@app.route("/stats")
+def stats():
+    """Runtime counters for monitoring"""
+    return jsonify({
+        "sessions": sessions.stats(),
+        "media_queue": {"pending": media_queue.qsize(), "maxsize": MEDIA_QUEUE_SIZE},
+        "whatsapp": whatsapp.metrics(),
+        "outbox": outbox.stats(),
+        "metadata_cache": metadata_cache.stats(),
+        "static_assets": static_assets.stats(),
+        "events": events.stats(),
+        "prerender": prerenderer.stats(),
+    }), 200
+
+NDJSON_CHUNK_SIZE = 64 * 1024
+
+def stream_orders_ndjson(rows, gzip_output):
+    """Yield NDJSON (optionally gzip) chunks from an order row iterator"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip_output else None
+    buf = []
+    size = 0
+    for _, _, data in rows:
+        buf.append(data)
+        buf.append("\n")
+        size += len(data) + 1
+        if size >= NDJSON_CHUNK_SIZE:
+            chunk = "".join(buf).encode()
+            buf, size = [], 0
+            if compressor:
+                chunk = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            yield chunk
+    chunk = "".join(buf).encode()
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
 @app.route("/orders")
 def list_orders():
-    """List all orders"""
+    """List orders, newest first
+
+    Filters: status, user_id, since, until (ISO dates). Pagination: limit
+    and the next_cursor returned by the previous page.
+
+    ?format=ndjson streams every matching order, one per line, in constant
+    memory (gzip when the client accepts it). Resume an interrupted export
+    with ?after=<last order_id received> or ?cursor=.
+    """
     try:
-        orders = []
-        for file_path in ORDERS_DIR.glob("*.json"):
-            with open(file_path, 'r') as f:
-                orders.append(json.load(f))
-        return jsonify({"orders": orders, "count": len(orders)}), 200
+        cursor = request.args.get("cursor")
+        if request.args.get("after"):
+            cursor = orders_db.cursor_after(request.args["after"])
+        filters = dict(
+            status=request.args.get("status"),
+            user_id=request.args.get("user_id"),
+            since=request.args.get("since"),
+            until=request.args.get("until"),
+            cursor=cursor,
+        )
+
+        if request.args.get("format") == "ndjson":
+            gzip_output = request.accept_encodings.quality("gzip") > 0
+            rows = orders_db.iter_rows(limit=request.args.get("limit", type=int), **filters)
+            response = Response(
+                stream_with_context(stream_orders_ndjson(rows, gzip_output)),
+                mimetype="application/x-ndjson",
+            )
+            if gzip_output:
+                response.headers["Content-Encoding"] = "gzip"
+            response.headers["Vary"] = "Accept-Encoding"
+            return response
+
+        orders, next_cursor = orders_db.query(
+            limit=request.args.get("limit", 50, type=int), **filters)
+        return jsonify({"orders": orders, "count": len(orders), "next_cursor": next_cursor}), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/orders/requote", methods=["POST"])
+def requote_orders():
+    """What-if pricing: re-price stored orders with a different rate card
+
+    Body: {"pricing": {"sheet_bw", "sheet_color", "tiers"}} (missing keys
+    fall back to the live PRICING). Filters as for /orders. ?detail=1 also
+    returns the per-order rows.
+    """
+    try:
+        overrides = (request.get_json(silent=True) or {}).get("pricing") or {}
+        engine = PricingEngine({**PRICING, **overrides})
+        rows = orders_db.iter_rows(
+            status=request.args.get("status"),
+            user_id=request.args.get("user_id"),
+            since=request.args.get("since"),
+            until=request.args.get("until"),
+        )
+        quotes = engine.requote_many(json.loads(data) for _, _, data in rows)
+        old_revenue = round(sum(q["old_total"] or 0 for q in quotes), 2)
+        new_revenue = round(sum(q["new_total"] for q in quotes), 2)
+        result = {
+            "orders": len(quotes),
+            "pricing": engine.describe(),
+            "old_revenue": old_revenue,
+            "new_revenue": new_revenue,
+            "difference": round(new_revenue - old_revenue, 2),
+            "changed": sum(1 for q in quotes if q["old_total"] != q["new_total"]),
+        }
+        if request.args.get("detail"):
+            result["rows"] = quotes
+        return jsonify(result), 200
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
 @app.route("/orders/<order_id>")
 def get_order(order_id):
     """Get specific order"""
     try:
-        file_path = ORDERS_DIR / f"{order_id}.json"
-        with open(file_path, 'r') as f:
-            order_data = json.load(f)
+        order_data = orders_db.get(order_id)
+        if order_data is None:
+            return jsonify({"error": "Order not found"}), 404
         return jsonify(order_data), 200
-    except FileNotFoundError:
-        return jsonify({"error": "Order not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
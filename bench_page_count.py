@@ -0,0 +1,150 @@
+"""Benchmark: fast xref page count vs. full PyPDF2 parse
+
+Generates a corpus of PDFs in a temp directory and times both paths:
+
+    python bench_page_count.py [repeats]
+"""
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+from PIL import Image
+from PyPDF2 import PdfReader, PdfWriter
+
+from page_counter import count_pdf_pages, fast_pdf_page_count
+
+
+def write_blank(path, pages):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=595, height=842)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def write_scanned(path, pages):
+    """Image-only PDF, like a phone-scanned document"""
+    images = [Image.new("L", (620, 877), color=(i * 7) % 255) for i in range(pages)]
+    images[0].save(path, save_all=True, append_images=images[1:], resolution=75)
+
+
+def write_encrypted(path, pages):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=595, height=842)
+    writer.encrypt(user_password="", owner_password="secret")
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def write_xref_stream(path, pages):
+    """PDF 1.5 layout: catalog and page tree in an object stream, xref stream"""
+    kids = " ".join(f"{4 + i} 0 R" for i in range(pages))
+    packed = [(1, b"<< /Type /Catalog /Pages 2 0 R >>"),
+              (2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())]
+    offsets, body = [], b""
+    for num, obj in packed:
+        offsets.append(len(body))
+        body += obj + b"\n"
+    header = " ".join(f"{num} {off}" for (num, _), off in zip(packed, offsets)).encode() + b"\n"
+    objstm = zlib.compress(header + body)
+
+    out = bytearray(b"%PDF-1.5\n")
+    xref = {}
+    xref[3] = len(out)
+    out += (f"3 0 obj\n<< /Type /ObjStm /N {len(packed)} /First {len(header)} "
+            f"/Filter /FlateDecode /Length {len(objstm)} >>\nstream\n").encode()
+    out += objstm + b"\nendstream\nendobj\n"
+    for i in range(pages):
+        num = 4 + i
+        xref[num] = len(out)
+        out += f"{num} 0 obj\n<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] >>\nendobj\n".encode()
+    size = 4 + pages + 1
+    xref_num = size - 1
+    xref[xref_num] = len(out)
+    rows = bytearray()
+    for num in range(size):
+        if num in (1, 2):
+            rows += bytes([2]) + (3).to_bytes(4, "big") + bytes([num - 1])
+        elif num in xref:
+            rows += bytes([1]) + xref[num].to_bytes(4, "big") + bytes([0])
+        else:
+            rows += bytes([0, 0, 0, 0, 0, 0xFF])
+    data = zlib.compress(bytes(rows))
+    out += (f"{xref_num} 0 obj\n<< /Type /XRef /Size {size} /W [1 4 1] /Root 1 0 R "
+            f"/Filter /FlateDecode /Length {len(data)} >>\nstream\n").encode()
+    out += data + b"\nendstream\nendobj\n"
+    out += f"startxref\n{xref[xref_num]}\n%%EOF\n".encode()
+    Path(path).write_bytes(out)
+
+
+def write_incremental(path, pages):
+    """Classic PDF plus an incremental update that drops the last page"""
+    write_blank(path, pages)
+    original = Path(path).read_bytes()
+    reader = PdfReader(path)
+    catalog = reader.trailer["/Root"]
+    root = reader.trailer.raw_get("/Root").idnum
+    pages_ref = catalog.raw_get("/Pages").idnum
+    kids = " ".join(f"{k.idnum} 0 R" for k in catalog["/Pages"].raw_get("/Kids")[:-1])
+    prev = int(original.rsplit(b"startxref", 1)[1].split()[0])
+    update = bytearray(b"\n")
+    offset = len(original) + len(update)
+    update += f"{pages_ref} 0 obj\n<< /Type /Pages /Kids [{kids}] /Count {pages - 1} >>\nendobj\n".encode()
+    xref_at = len(original) + len(update)
+    update += f"xref\n0 1\n0000000000 65535 f \n{pages_ref} 1\n{offset:010d} 00000 n \n".encode()
+    update += (f"trailer\n<< /Size {reader.trailer['/Size']} /Root {root} 0 R "
+               f"/Prev {prev} >>\nstartxref\n{xref_at}\n%%EOF\n").encode()
+    Path(path).write_bytes(original + update)
+
+
+CORPUS = [
+    ("blank", write_blank, 1),
+    ("blank", write_blank, 10),
+    ("blank", write_blank, 100),
+    ("blank", write_blank, 300),
+    ("scanned", write_scanned, 30),
+    ("scanned", write_scanned, 300),
+    ("xrefstream", write_xref_stream, 300),
+    ("incremental", write_incremental, 50),
+    ("encrypted", write_encrypted, 20),
+]
+
+
+def best_of(fn, path, repeats):
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(path)
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def pypdf2_count(path):
+    reader = PdfReader(str(path))
+    if reader.is_encrypted:
+        reader.decrypt("")
+    return len(reader.pages)
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'file':<22}{'size':>10}{'pages':>7}{'fast ms':>10}{'pypdf2 ms':>11}{'speedup':>9}  path")
+        for kind, writer, pages in CORPUS:
+            path = Path(tmp) / f"{kind}_{pages}.pdf"
+            writer(path, pages)
+            fast, fast_ms = best_of(fast_pdf_page_count, path, repeats)
+            full, full_ms = best_of(pypdf2_count, path, repeats)
+            counted, smart_ms = best_of(count_pdf_pages, path, repeats)
+            used = "fast" if fast is not None else "fallback"
+            status = "ok" if counted == full else f"MISMATCH {counted} != {full}"
+            print(f"{path.name:<22}{path.stat().st_size:>10}{full:>7}{smart_ms:>10.2f}"
+                  f"{full_ms:>11.2f}{full_ms / smart_ms:>8.1f}x  {used} {status}")
+
+
+if __name__ == "__main__":
+    main()
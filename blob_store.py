@@ -0,0 +1,70 @@
+"""Content-addressed upload storage (uploads/blobs/ab/cd/<sha256>.<ext>)"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+CHUNK_SIZE = 128 * 1024
+
+
+def blob_relpath(digest, ext):
+    """Path of a blob relative to the uploads directory"""
+    name = f"{digest}.{ext}" if ext else digest
+    return Path("blobs") / digest[:2] / digest[2:4] / name
+
+
+class Blob:
+    __slots__ = ("sha256", "path", "size", "existed")
+
+    def __init__(self, sha256, path, size, existed):
+        self.sha256 = sha256
+        self.path = path
+        self.size = size
+        self.existed = existed
+
+
+class BlobStore:
+    """Stores each distinct upload once, keyed by its SHA-256.
+
+    The hash is computed while the data streams to a temp file; if a blob
+    with the same hash already exists the temp file is discarded.
+    """
+
+    def __init__(self, uploads_dir):
+        self.uploads_dir = Path(uploads_dir)
+        self.tmp_dir = self.uploads_dir / "blobs" / "tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, digest, ext):
+        return self.uploads_dir / blob_relpath(digest, ext)
+
+    def write_stream(self, chunks, ext):
+        """Store an iterable of byte chunks; returns a Blob"""
+        sha = hashlib.sha256()
+        fd, tmp_name = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    if chunk:
+                        sha.update(chunk)
+                        f.write(chunk)
+            return self.adopt(tmp_name, sha.hexdigest(), ext)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+
+    def adopt(self, file_path, digest, ext):
+        """Move an already-hashed file into the store; returns a Blob"""
+        size = os.path.getsize(file_path)
+        path = self.path_for(digest, ext)
+        if path.exists():
+            os.unlink(file_path)
+            return Blob(digest, path, size, True)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(file_path, path)
+        return Blob(digest, path, size, False)
+
+    def save_fileobj(self, fileobj, ext):
+        """Store a readable binary file object; returns a Blob"""
+        return self.write_stream(iter(lambda: fileobj.read(CHUNK_SIZE), b""), ext)
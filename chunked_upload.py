@@ -0,0 +1,149 @@
+"""Chunked, resumable uploads (init / PUT chunk at offset / finalize)"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+CHUNK_SIZE = 1024 * 1024
+STALE_AFTER = 24 * 3600
+
+
+class UploadError(Exception):
+    """Client-visible upload failure with an HTTP status"""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class ChunkedUploads:
+    """Partial uploads live in <root>/<upload_id>.part with a .json header.
+
+    The server-side offset is simply the size of the .part file, so any
+    worker can accept the next chunk. Each process hashes chunks as they
+    arrive; finalize re-reads the file only if that running hash does not
+    cover the whole upload (e.g. chunks landed on another worker).
+    """
+
+    def __init__(self, root, blob_store, max_size=200 * 1024 * 1024, chunk_size=CHUNK_SIZE):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.blobs = blob_store
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self._hashers = {}      # upload_id -> (sha256 object, bytes hashed)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, upload_id):
+        if not upload_id or not upload_id.isalnum():
+            raise UploadError("Invalid upload id", 404)
+        return self.root / f"{upload_id}.json", self.root / f"{upload_id}.part"
+
+    def _upload_lock(self, upload_id):
+        with self._lock:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def _load(self, upload_id):
+        header_path, part_path = self._paths(upload_id)
+        try:
+            with open(header_path, "r", encoding="utf-8") as f:
+                header = json.load(f)
+        except FileNotFoundError:
+            raise UploadError("Upload not found", 404)
+        header["offset"] = part_path.stat().st_size if part_path.exists() else 0
+        return header
+
+    def _forget(self, upload_id):
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+            self._locks.pop(upload_id, None)
+
+    def cleanup_stale(self):
+        """Drop partial uploads nobody has touched for a day"""
+        cutoff = time.time() - STALE_AFTER
+        for path in self.root.glob("*.json"):
+            part = path.with_suffix(".part")
+            last = max(path.stat().st_mtime, part.stat().st_mtime if part.exists() else 0)
+            if last < cutoff:
+                part.unlink(missing_ok=True)
+                path.unlink(missing_ok=True)
+                self._forget(path.stem)
+
+    def init(self, session_id, filename, size, upload_id=None):
+        """Start an upload, or resume upload_id if it matches this file"""
+        if size <= 0 or size > self.max_size:
+            raise UploadError(f"File size must be between 1 byte and {self.max_size // (1024 * 1024)} MB", 413)
+        if upload_id:
+            try:
+                header = self._load(upload_id)
+                if (header["session_id"], header["filename"], header["size"]) == (session_id, filename, size):
+                    return header
+            except UploadError:
+                pass
+        self.cleanup_stale()
+        upload_id = uuid.uuid4().hex
+        header = {"upload_id": upload_id, "session_id": session_id, "filename": filename,
+                  "size": size, "created": time.time()}
+        header_path, part_path = self._paths(upload_id)
+        part_path.touch()
+        with open(header_path, "w", encoding="utf-8") as f:
+            json.dump(header, f)
+        header["offset"] = 0
+        return header
+
+    def status(self, upload_id):
+        return self._load(upload_id)
+
+    def write_chunk(self, upload_id, offset, stream):
+        """Append a chunk that starts at offset; returns the new offset"""
+        with self._upload_lock(upload_id):
+            header = self._load(upload_id)
+            current = header["offset"]
+            if offset != current:
+                raise UploadError("Offset mismatch", 409, offset=current)
+            _, part_path = self._paths(upload_id)
+            with self._lock:
+                sha, hashed = self._hashers.get(upload_id, (None, 0))
+            if sha is None or hashed != current:
+                sha, hashed = (hashlib.sha256(), 0) if current == 0 else (None, 0)
+            with open(part_path, "ab") as f:
+                while True:
+                    chunk = stream.read(64 * 1024)
+                    if not chunk:
+                        break
+                    if current + len(chunk) > header["size"]:
+                        f.truncate(current)
+                        raise UploadError("Chunk runs past the declared file size", 400, offset=current)
+                    f.write(chunk)
+                    if sha is not None:
+                        sha.update(chunk)
+                        hashed += len(chunk)
+                    current += len(chunk)
+            if sha is not None:
+                with self._lock:
+                    self._hashers[upload_id] = (sha, hashed)
+            return current
+
+    def finalize(self, upload_id, ext):
+        """Move a complete upload into the blob store; returns (Blob, header)"""
+        with self._upload_lock(upload_id):
+            header = self._load(upload_id)
+            if header["offset"] != header["size"]:
+                raise UploadError("Upload incomplete", 409, offset=header["offset"])
+            header_path, part_path = self._paths(upload_id)
+            with self._lock:
+                sha, hashed = self._hashers.get(upload_id, (None, 0))
+            if sha is None or hashed != header["size"]:
+                sha = hashlib.sha256()
+                with open(part_path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                        sha.update(chunk)
+            blob = self.blobs.adopt(part_path, sha.hexdigest(), ext)
+            header_path.unlink(missing_ok=True)
+        self._forget(upload_id)
+        return blob, header
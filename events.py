@@ -0,0 +1,120 @@
+"""In-process pub/sub for the order page's Server-Sent Events stream"""
+import itertools
+import json
+import queue
+import threading
+from collections import OrderedDict, deque
+
+
+class _Topic:
+    __slots__ = ("history", "lost")
+
+    def __init__(self, replay):
+        self.history = deque(maxlen=replay)
+        self.lost = 0            # newest event id that fell out of history
+
+
+class Subscription:
+    """One connected client; events arrive on a bounded queue"""
+
+    def __init__(self, bus, topic, maxsize):
+        self.bus = bus
+        self.topic = topic
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def get(self, timeout):
+        """Next (event_id, name, data), or None after timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus._unsubscribe(self)
+
+
+class EventBus:
+    """Topic-based fan-out with a short replay buffer per topic.
+
+    Topics are session ids. Event ids are increasing integers shared by all
+    topics, so a reconnecting client sends Last-Event-ID and gets every
+    newer event still held in that topic's buffer. If its id is older than
+    the buffer it gets a single "resync" event instead. A subscriber that
+    stops reading is dropped instead of blocking publishers.
+
+    Events only reach clients connected to the same process.
+    """
+
+    def __init__(self, replay=50, max_topics=10000, queue_size=100):
+        self.replay = replay
+        self.max_topics = max_topics
+        self.queue_size = queue_size
+        self._ids = itertools.count(1)
+        self._topics = OrderedDict()   # topic -> _Topic, least recently published first
+        self._subscribers = {}         # topic -> set of Subscription
+        self._lock = threading.Lock()
+        self.counters = {"published": 0, "delivered": 0, "dropped_subscribers": 0}
+
+    def publish(self, topic, name, data):
+        """Record an event and hand it to every subscriber of topic"""
+        payload = json.dumps(data, separators=(",", ":"))
+        with self._lock:
+            event = (next(self._ids), name, payload)
+            state = self._topics.get(topic)
+            if state is None:
+                state = self._topics[topic] = _Topic(self.replay)
+                if len(self._topics) > self.max_topics:
+                    self._topics.popitem(last=False)
+            self._topics.move_to_end(topic)
+            if len(state.history) == self.replay:
+                state.lost = state.history[0][0]
+            state.history.append(event)
+            self.counters["published"] += 1
+            for sub in list(self._subscribers.get(topic, ())):
+                try:
+                    sub.queue.put_nowait(event)
+                    self.counters["delivered"] += 1
+                except queue.Full:
+                    sub.dropped = True
+                    self._subscribers[topic].discard(sub)
+                    self.counters["dropped_subscribers"] += 1
+        return event[0]
+
+    def subscribe(self, topic, last_event_id=None):
+        """Register a subscriber, pre-loaded with events after last_event_id"""
+        sub = Subscription(self, topic, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(sub)
+            if last_event_id is not None:
+                state = self._topics.get(topic)
+                if state is None or state.lost > last_event_id:
+                    # Some events are gone; the client has to reload the order
+                    newest = state.history[-1][0] if state else last_event_id
+                    missed = [(newest, "resync", "{}")]
+                else:
+                    missed = [e for e in state.history if e[0] > last_event_id]
+                for event in missed[-self.queue_size:]:
+                    sub.queue.put_nowait(event)
+        return sub
+
+    def _unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.topic)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.topic]
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "topics": len(self._topics),
+                "subscribers": sum(len(s) for s in self._subscribers.values()),
+            }
+
+
+def format_sse(event_id, name, data):
+    """One text/event-stream frame"""
+    return f"id: {event_id}\nevent: {name}\ndata: {data}\n\n"
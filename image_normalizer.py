@@ -0,0 +1,166 @@
+"""Image normalization for printing: EXIF rotation, A4 fit at printer DPI, grayscale, auto-crop"""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+A4_INCHES = (8.27, 11.69)
+MARGIN_INCHES = 0.5
+JPEG_QUALITY = 85
+# EXIF orientations that swap width and height
+_TRANSPOSED = {5, 6, 7, 8}
+
+
+def target_pixels(dpi):
+    """(width, height) of the printable A4 area at dpi, in pixels"""
+    return (round((A4_INCHES[0] - 2 * MARGIN_INCHES) * dpi),
+            round((A4_INCHES[1] - 2 * MARGIN_INCHES) * dpi))
+
+
+def autocrop_box(img, threshold=0.5, min_keep=0.3):
+    """Bounding box of the bright (paper) area of a document photo, or None.
+
+    Works on a small grayscale copy: pixels brighter than halfway between
+    the mean and the maximum count as paper. The box is used only if it
+    trims at least 5% and keeps at least min_keep of the picture.
+    """
+    small = img.convert("L")
+    small.thumbnail((256, 256))
+    lo, hi = small.getextrema()
+    mean = sum(i * n for i, n in enumerate(small.histogram())) / (small.width * small.height)
+    if hi - lo < 32:
+        return None   # flat picture: nothing to crop
+    cut = mean + (hi - mean) * threshold
+    box = small.point(lambda v: 255 if v > cut else 0).getbbox()
+    if box is None:
+        return None
+    area = (box[2] - box[0]) * (box[3] - box[1]) / (small.width * small.height)
+    if area < min_keep or area > 0.95:
+        return None
+    sx, sy = img.width / small.width, img.height / small.height
+    return (int(box[0] * sx), int(box[1] * sy), int(box[2] * sx + 0.999), int(box[3] * sy + 0.999))
+
+
+def normalize_image(src, out_path, color=True, dpi=300, autocrop=False, quality=JPEG_QUALITY):
+    """Write src as a one-page A4 PDF ready for the printer; returns a report dict.
+
+    Steps: EXIF rotation; landscape pictures are turned to fill the
+    portrait page; JPEGs are decoded in draft mode at the smallest scale
+    (1/2, 1/4, 1/8) that still covers the page at dpi; optional auto-crop
+    to the paper in a document photo; grayscale for B&W jobs; downscale
+    to fit the printable area (never upscale); centre on an A4 page.
+    Small pictures keep their own resolution rather than being padded
+    out to a full-dpi page.
+    """
+    started = time.perf_counter()
+    fit_w, fit_h = target_pixels(dpi)
+    mode = "RGB" if color else "L"
+
+    with Image.open(src) as img:
+        source_size = img.size
+        orientation = img.getexif().get(0x0112, 1)
+        w, h = (img.height, img.width) if orientation in _TRANSPOSED else img.size
+        landscape = w > h
+        if landscape:
+            w, h = h, w
+        # Smallest decode that still fills the printable area
+        scale = min(fit_w / w, fit_h / h)
+        need = (max(1, int(w * scale)), max(1, int(h * scale)))
+        if (orientation in _TRANSPOSED) != landscape:
+            need = (need[1], need[0])   # the file is stored sideways to the page
+        if img.format == "JPEG":
+            img.draft(mode, need)
+        draft_size = img.size
+
+        img = ImageOps.exif_transpose(img)
+        if landscape:
+            img = img.transpose(Image.Transpose.ROTATE_90)
+        if autocrop:
+            box = autocrop_box(img)
+            if box:
+                img = img.crop(box)
+        if img.mode in ("RGBA", "LA", "P"):
+            # Transparent areas print as white paper, not black
+            rgba = img.convert("RGBA")
+            background = Image.new("RGBA", rgba.size, "white")
+            img = Image.alpha_composite(background, rgba)
+        img = img.convert(mode)
+        img.thumbnail((fit_w, fit_h), Image.LANCZOS)
+
+        # Small pictures get a page at their own resolution instead of being
+        # padded out to a full-dpi canvas; the page is still A4.
+        fit_inches = (fit_w / dpi, fit_h / dpi)
+        page_dpi = min(dpi, max(72.0, img.width / fit_inches[0], img.height / fit_inches[1]))
+        page_w, page_h = round(A4_INCHES[0] * page_dpi), round(A4_INCHES[1] * page_dpi)
+        page = Image.new(mode, (page_w, page_h), "white")
+        page.paste(img, ((page_w - img.width) // 2, (page_h - img.height) // 2))
+        page.save(out_path, "PDF", resolution=page_dpi, quality=quality)
+        output_size = img.size
+
+    source_bytes = os.path.getsize(src)
+    output_bytes = os.path.getsize(out_path)
+    return {
+        "source_bytes": source_bytes,
+        "output_bytes": output_bytes,
+        "saved_bytes": source_bytes - output_bytes,
+        "seconds": round(time.perf_counter() - started, 3),
+        "source_size": source_size,
+        "decoded_size": draft_size,
+        "output_size": output_size,
+    }
+
+
+class ImageNormalizer:
+    """Runs normalize_image in a process pool (decoding and resizing are CPU-bound).
+
+    The pool is started on first use. Totals of bytes in/out and time are
+    kept for /stats.
+    """
+
+    def __init__(self, workers=2, dpi=300, autocrop=False):
+        self.workers = workers
+        self.dpi = dpi
+        self.autocrop = autocrop
+        self._pool = None
+        self._lock = threading.Lock()
+        self.counters = {"images": 0, "failed": 0, "source_bytes": 0, "output_bytes": 0,
+                         "seconds": 0.0}
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def normalize(self, src, out_path, color=True, timeout=120):
+        """Normalize one image (blocking the calling thread, not the process); returns the report"""
+        future = self._executor().submit(normalize_image, str(src), str(out_path), color,
+                                         self.dpi, self.autocrop)
+        try:
+            report = future.result(timeout=timeout)
+        except Exception:
+            with self._lock:
+                self.counters["failed"] += 1
+            raise
+        with self._lock:
+            self.counters["images"] += 1
+            self.counters["source_bytes"] += report["source_bytes"]
+            self.counters["output_bytes"] += report["output_bytes"]
+            self.counters["seconds"] += report["seconds"]
+        return report
+
+    def stats(self):
+        with self._lock:
+            c = dict(self.counters)
+        return {
+            **c,
+            "saved_bytes": c["source_bytes"] - c["output_bytes"],
+            "seconds": round(c["seconds"], 3),
+            "avg_seconds": round(c["seconds"] / c["images"], 3) if c["images"] else None,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
@@ -0,0 +1,105 @@
+"""Persistent file metadata cache (page count, dimensions, color, format)"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from PIL import Image
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_meta (
+    key       TEXT PRIMARY KEY,
+    meta      TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_file_meta_last_used ON file_meta(last_used);
+"""
+
+GRAYSCALE_MODES = {"1", "L", "LA", "I", "I;16", "F"}
+
+
+def describe_file(file_path, file_ext, page_count):
+    """Metadata record for a file whose page count is already known"""
+    meta = {"page_count": page_count, "format": file_ext, "width": None, "height": None, "color": None}
+    try:
+        with Image.open(file_path) as img:
+            meta["width"], meta["height"] = img.size
+            meta["color"] = img.mode not in GRAYSCALE_MODES
+            meta["format"] = (img.format or file_ext).lower()
+    except Exception:
+        pass
+    return meta
+
+
+class MetadataCache:
+    """SQLite-backed LRU of file metadata.
+
+    Keys are ``sha256:<hex>`` when the content hash is known, otherwise
+    ``stat:<size>:<mtime_ns>:<inode>``. Once ``max_entries`` is exceeded
+    the least recently used tenth of the entries is dropped.
+    """
+
+    def __init__(self, path="metadata_cache.db", max_entries=50000):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key_for(file_path, sha256=None):
+        if sha256:
+            return f"sha256:{sha256}"
+        st = os.stat(file_path)
+        return f"stat:{st.st_size}:{st.st_mtime_ns}:{st.st_ino}"
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def get(self, key):
+        """Cached metadata dict, or None"""
+        conn = self._conn()
+        row = conn.execute("SELECT meta FROM file_meta WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        with conn:
+            conn.execute("UPDATE file_meta SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, meta):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO file_meta (key, meta, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(meta), time.time()))
+            total = conn.execute("SELECT COUNT(*) FROM file_meta").fetchone()[0]
+            if total > self.max_entries:
+                drop = total - self.max_entries + self.max_entries // 10
+                cur = conn.execute(
+                    "DELETE FROM file_meta WHERE key IN"
+                    " (SELECT key FROM file_meta ORDER BY last_used LIMIT ?)", (drop,))
+                self._count("evictions", cur.rowcount)
+
+    def stats(self):
+        entries = self._conn().execute("SELECT COUNT(*) FROM file_meta").fetchone()[0]
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = round(counters["hits"] / lookups, 3) if lookups else None
+        counters["entries"] = entries
+        counters["max_entries"] = self.max_entries
+        return counters
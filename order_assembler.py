@@ -0,0 +1,220 @@
+"""Order assembler: one merged PDF per order (and print settings) with a banner page"""
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from PyPDF2 import PdfReader, PdfWriter
+
+from image_normalizer import normalize_image
+
+A4 = (595, 842)            # points
+TEXT_FONT_SIZE = 10
+TEXT_LEADING = 12
+TEXT_COLUMNS = 90
+TEXT_LINES_PER_PAGE = 64
+
+PDF_TYPES = {'.pdf'}
+IMAGE_TYPES = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.tif', '.webp'}
+TEXT_TYPES = {'.txt', '.log', '.csv'}
+
+
+def can_assemble(path):
+    """True for files the assembler can turn into PDF pages itself"""
+    return Path(path).suffix.lower() in PDF_TYPES | IMAGE_TYPES | TEXT_TYPES
+
+
+def _pdf_string(text):
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def text_pdf(lines, out_path, font_size=TEXT_FONT_SIZE, leading=TEXT_LEADING):
+    """Write lines as a plain Courier A4 PDF (wrapped and paginated); returns page count"""
+    wrapped = []
+    for line in lines:
+        line = line.rstrip("\r\n").expandtabs(4)
+        while len(line) > TEXT_COLUMNS:
+            wrapped.append(line[:TEXT_COLUMNS])
+            line = line[TEXT_COLUMNS:]
+        wrapped.append(line)
+    pages = [wrapped[i:i + TEXT_LINES_PER_PAGE]
+             for i in range(0, len(wrapped), TEXT_LINES_PER_PAGE)] or [[]]
+
+    # Objects: 1 catalog, 2 page tree, 3 font, then (page, content) per page
+    objects = {
+        1: "<< /Type /Catalog /Pages 2 0 R >>",
+        3: "<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+    }
+    kids = []
+    for n, page_lines in enumerate(pages):
+        page_id, content_id = 4 + 2 * n, 5 + 2 * n
+        kids.append(f"{page_id} 0 R")
+        body = "\n".join(f"{_pdf_string(l)} Tj T*" for l in page_lines)
+        stream = (f"BT /F1 {font_size} Tf {leading} TL 50 {A4[1] - 50} Td\n{body}\nET")
+        data = stream.encode("latin-1")
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {A4[0]} {A4[1]}]"
+                            f" /Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        objects[content_id] = (f"<< /Length {len(data)} >>\nstream\n", data, "\nendstream")
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+
+    with open(out_path, "wb") as out:
+        out.write(b"%PDF-1.4\n")
+        offsets = {}
+        for obj_id in sorted(objects):
+            offsets[obj_id] = out.tell()
+            out.write(f"{obj_id} 0 obj\n".encode())
+            obj = objects[obj_id]
+            if isinstance(obj, tuple):
+                head, data, tail = obj
+                out.write(head.encode() + data + tail.encode())
+            else:
+                out.write(obj.encode("latin-1"))
+            out.write(b"\nendobj\n")
+        xref = out.tell()
+        size = max(objects) + 1
+        out.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode())
+        for obj_id in range(1, size):
+            out.write(f"{offsets[obj_id]:010d} 00000 n \n".encode())
+        out.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return len(pages)
+
+
+def banner_lines(order, jobs):
+    """Separator page text: who the order is for and what is in it"""
+    lines = [
+        "",
+        "=" * 60,
+        f"  ORDER   {order.get('order_id', '')}",
+        f"  USER    {order.get('user_id', '')}",
+        f"  PRINTED {time.strftime('%Y-%m-%d %H:%M')}",
+        "=" * 60,
+        "",
+    ]
+    for job in jobs:
+        opts = job.options
+        lines.append(f"  {job.seq:>3}. {job.filename}")
+        lines.append(f"       {job.pages or 1} page(s) x {opts.get('copies', 1)} copies,"
+                     f" {opts.get('sides', 'single')}, {'color' if opts.get('color') else 'B&W'}")
+    lines += [
+        "",
+        f"  Files: {len(order.get('files') or [])}   Pages: {order.get('total_pages', '')}"
+        f"   Sheets: {order.get('total_sheets', '')}",
+        f"  Total: Rs. {order.get('total_price', '')}   Payment: {order.get('payment_status', '')}",
+    ]
+    return lines
+
+
+class AssembledJob:
+    """One merged PDF and the queue jobs it covers"""
+    __slots__ = ("path", "color", "sides", "jobs", "pages")
+
+    def __init__(self, path, color, sides, jobs, pages):
+        self.path = path
+        self.color = color
+        self.sides = sides
+        self.jobs = jobs
+        self.pages = pages
+
+    @property
+    def options(self):
+        return {"copies": 1, "color": self.color, "sides": self.sides}
+
+
+class OrderAssembler:
+    """Turns the files of one order into as few print jobs as possible.
+
+    Files are grouped by (color, sides), since those are per-job printer
+    settings; most orders make exactly one group. Each group becomes one
+    PDF: an optional banner page, then every file's pages repeated for
+    its copies. Double-sided groups get a blank page after odd-length
+    documents so the next one starts on a fresh sheet.
+
+    Source PDFs are opened as files and their pages are pulled in one at
+    a time while the merged file is written, rather than read whole.
+    Images and text are first rendered to single small PDFs in work_dir
+    (images at dpi, see image_normalizer).
+    """
+
+    def __init__(self, work_dir, keep_seconds=3600, dpi=300):
+        self.work_dir = Path(work_dir)
+        self.dpi = dpi
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.keep_seconds = keep_seconds
+
+    def cleanup(self):
+        """Delete merged PDFs older than keep_seconds.
+
+        They are not deleted right after submission because some print
+        tools open the file after they report success.
+        """
+        cutoff = time.time() - self.keep_seconds
+        for path in self.work_dir.glob("*.pdf"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+    def assemble(self, order, jobs, banner=True):
+        """AssembledJob list for jobs (all assemblable), banner on the first"""
+        self.cleanup()
+        groups = {}
+        for job in jobs:
+            key = (bool(job.options.get("color")), job.options.get("sides", "single"))
+            groups.setdefault(key, []).append(job)
+
+        stamp = f"{order.get('order_id', 'order')}_{int(time.time() * 1000)}"
+        assembled = []
+        for n, ((color, sides), group) in enumerate(groups.items()):
+            out_path = self.work_dir / f"{stamp}_{n}.pdf"
+            pages = self._merge(out_path, order, group, color, sides == "double",
+                                banner_for=jobs if banner and n == 0 else None)
+            assembled.append(AssembledJob(out_path, color, sides, group, pages))
+        return assembled
+
+    def _merge(self, out_path, order, jobs, color, duplex, banner_for=None):
+        writer = PdfWriter()
+        temp_files = []
+        try:
+            with ExitStack() as stack:
+                def add(pdf_path, copies=1):
+                    reader = PdfReader(stack.enter_context(open(pdf_path, "rb")))
+                    count = len(reader.pages)
+                    for _ in range(copies):
+                        for page in reader.pages:
+                            writer.add_page(page)
+                        if duplex and count % 2:
+                            writer.add_blank_page(*A4)
+
+                if banner_for is not None:
+                    banner = self._temp(out_path, "banner", temp_files)
+                    text_pdf(banner_lines(order, banner_for), banner)
+                    add(banner)
+
+                for job in jobs:
+                    copies = max(1, int(job.options.get("copies") or 1))
+                    suffix = Path(job.path).suffix.lower()
+                    if suffix in PDF_TYPES:
+                        add(job.path, copies)
+                    elif suffix in IMAGE_TYPES:
+                        rendered = self._temp(out_path, job.job_id, temp_files)
+                        normalize_image(job.path, rendered, color, dpi=self.dpi)
+                        add(rendered, copies)
+                    else:
+                        rendered = self._temp(out_path, job.job_id, temp_files)
+                        with open(job.path, "r", encoding="utf-8", errors="replace") as f:
+                            text_pdf(f, rendered)
+                        add(rendered, copies)
+
+                with open(out_path, "wb") as out:
+                    writer.write(out)
+            return len(writer.pages)
+        finally:
+            for path in temp_files:
+                path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _temp(out_path, tag, temp_files):
+        path = out_path.with_name(f"{out_path.stem}.{tag}.pdf")
+        temp_files.append(path)
+        return path
@@ -0,0 +1,163 @@
+"""Indexed order database (SQLite) behind the /orders API"""
+import base64
+import json
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    order_id       TEXT PRIMARY KEY,
+    user_id        TEXT,
+    session_id     TEXT,
+    order_status   TEXT,
+    payment_status TEXT,
+    created_at     TEXT NOT NULL,
+    total_price    REAL,
+    total_pages    INTEGER,
+    total_sheets   INTEGER,
+    data           TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(created_at, order_id);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(order_status, created_at, order_id);
+CREATE INDEX IF NOT EXISTS idx_orders_user ON orders(user_id, created_at, order_id);
+"""
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at, order_id):
+    raw = f"{created_at}|{order_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return (created_at, order_id) or raise ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, order_id = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return created_at, order_id
+
+
+class OrderStore:
+    """Orders indexed by status, user and date; full JSON kept in one column"""
+
+    def __init__(self, path="orders.db"):
+        self.path = str(path)
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def _row(self, order):
+        created_at = order.get("order_placed_at") or order.get("timestamp") or ""
+        return (
+            order["order_id"], order.get("user_id"), order.get("session_id"),
+            order.get("order_status"), order.get("payment_status"), created_at,
+            order.get("total_price"), order.get("total_pages"), order.get("total_sheets"),
+            json.dumps(order, separators=(",", ":")),
+        )
+
+    def put(self, order):
+        """Insert or replace one order"""
+        self.put_many([order])
+
+    def put_many(self, orders):
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO orders (order_id, user_id, session_id, order_status,"
+                " payment_status, created_at, total_price, total_pages, total_sheets, data)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._row(o) for o in orders])
+
+    def get(self, order_id):
+        """Get one order as a dict, or None"""
+        row = self._conn().execute(
+            "SELECT data FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _where(self, status, user_id, since, until, cursor):
+        clauses, params = [], []
+        if status:
+            clauses.append("order_status = ?")
+            params.append(status)
+        if user_id:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if since:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until:
+            # A bare date means "through the end of that day"
+            clauses.append("created_at < ?" if "T" in until else "created_at <= ?")
+            params.append(until if "T" in until else until + "T99")
+        if cursor:
+            clauses.append("(created_at, order_id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def iter_rows(self, status=None, user_id=None, since=None, until=None,
+                  cursor=None, limit=None):
+        """Yield (created_at, order_id, json_text), newest first"""
+        where, params = self._where(status, user_id, since, until, cursor)
+        sql = f"SELECT created_at, order_id, data FROM orders{where} ORDER BY created_at DESC, order_id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        yield from self._conn().execute(sql, params)
+
+    def cursor_after(self, order_id):
+        """Cursor that resumes listing right after order_id"""
+        row = self._conn().execute(
+            "SELECT created_at FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Unknown order: {order_id}")
+        return encode_cursor(row[0], order_id)
+
+    def query(self, status=None, user_id=None, since=None, until=None,
+              cursor=None, limit=50):
+        """One page of orders, newest first, plus the cursor for the next page"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        rows = list(self.iter_rows(status, user_id, since, until, cursor, limit + 1))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][0], rows[-1][1])
+        return [json.loads(data) for _, _, data in rows], next_cursor
+
+    def import_json_dir(self, orders_dir):
+        """One-shot import of existing orders/*.json files; returns count"""
+        orders = []
+        for file_path in sorted(Path(orders_dir).glob("*.json")):
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    order = json.load(f)
+                if order.get("order_id"):
+                    orders.append(order)
+            except Exception as e:
+                print(f"⚠️ Skipping {file_path.name}: {e}")
+        if orders:
+            self.put_many(orders)
+        return len(orders)
+
+
+if __name__ == "__main__":
+    # python order_store.py [orders_dir] [orders.db]
+    source = sys.argv[1] if len(sys.argv) > 1 else "orders"
+    db_path = sys.argv[2] if len(sys.argv) > 2 else "orders.db"
+    count = OrderStore(db_path).import_json_dir(source)
+    print(f"✅ Imported {count} order(s) from {source} into {db_path}")
@@ -0,0 +1,129 @@
+"""Outbound WhatsApp message scheduler with per-user coalescing"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _Batch:
+    """Messages waiting to go to one recipient"""
+    __slots__ = ("texts", "uploads", "link", "first_at", "last_at")
+
+    def __init__(self, now):
+        self.texts = []
+        self.uploads = []
+        self.link = None
+        self.first_at = now
+        self.last_at = now
+
+    def render(self):
+        parts = list(self.texts)
+        if len(self.uploads) == 1:
+            parts.append(f"✓ {self.uploads[0]} uploaded!")
+        elif self.uploads:
+            parts.append(f"✓ {len(self.uploads)} files uploaded")
+        if self.link:
+            parts.append(self.link)
+        return "\n\n".join(parts)
+
+    def size(self):
+        return len(self.texts) + len(self.uploads) + (1 if self.link else 0)
+
+
+class OutboundScheduler:
+    """Coalesce messages per recipient and send them at a bounded global rate.
+
+    Everything posted for a phone number within ``window`` seconds of the
+    previous post (and at most ``max_delay`` after the first) goes out as a
+    single message. Posting never blocks; a dispatcher thread hands due
+    batches to a small sender pool, keeping under ``rate`` messages/second.
+    """
+
+    def __init__(self, send, window=1.5, max_delay=5.0, rate=20.0, burst=5, senders=4):
+        self.send = send
+        self.window = window
+        self.max_delay = max_delay
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=senders, thread_name_prefix="outbox")
+        self.counters = {"posted": 0, "sent": 0, "failed": 0}
+        threading.Thread(target=self._dispatch, name="outbox-dispatcher", daemon=True).start()
+
+    def _batch(self, to_phone):
+        now = time.monotonic()
+        batch = self._pending.get(to_phone)
+        if batch is None:
+            batch = self._pending[to_phone] = _Batch(now)
+        batch.last_at = now
+        self.counters["posted"] += 1
+        self._cond.notify()
+        return batch
+
+    def post(self, to_phone, text):
+        """Queue a free-form text"""
+        with self._cond:
+            self._batch(to_phone).texts.append(text)
+
+    def post_upload(self, to_phone, filename):
+        """Queue an upload confirmation (merged into "✓ N files uploaded")"""
+        with self._cond:
+            self._batch(to_phone).uploads.append(filename)
+
+    def post_link(self, to_phone, link):
+        """Queue the order page link (only the latest one is sent)"""
+        with self._cond:
+            self._batch(to_phone).link = link
+
+    def _due_at(self, batch):
+        return min(batch.last_at + self.window, batch.first_at + self.max_delay)
+
+    def _take_token(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            time.sleep((1 - self._tokens) / self.rate)
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    due = [(self._due_at(b), phone) for phone, b in self._pending.items()]
+                    ready = [phone for due_at, phone in due if due_at <= now]
+                    if ready:
+                        break
+                    timeout = min(due_at for due_at, _ in due) - now if due else None
+                    self._cond.wait(timeout)
+                batches = [(phone, self._pending.pop(phone)) for phone in ready]
+            for phone, batch in batches:
+                self._take_token()
+                self._pool.submit(self._send, phone, batch.render())
+
+    def _send(self, to_phone, body):
+        ok = self.send(to_phone, body) is not None
+        with self._cond:
+            self.counters["sent" if ok else "failed"] += 1
+
+    def flush(self, timeout=10.0):
+        """Wait until nothing is pending (used on shutdown and in scripts)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._cond:
+                if not self._pending:
+                    break
+            time.sleep(0.05)
+
+    def stats(self):
+        with self._cond:
+            pending = sum(b.size() for b in self._pending.values())
+            counters = dict(self.counters)
+        counters["pending"] = pending
+        counters["rate_limit"] = self.rate
+        return counters
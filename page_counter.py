@@ -0,0 +1,319 @@
+"""Fast page counting helpers used by app.count_pages_smart"""
+import math
+import mmap
+import os
+import re
+import zipfile
+import zlib
+
+from PyPDF2 import PdfReader
+
+_STARTXREF = re.compile(rb"startxref\s+(\d+)")
+_OBJ_HEADER = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj\b")  # tolerate offsets that land on the preceding EOL
+_XREF_SECTION = re.compile(rb"\s*(\d+)\s+(\d+)\s*[\r\n]")
+_XREF_ENTRY = re.compile(rb"(\d{10})\s(\d{5})\s([nf])")
+_STREAM_START = re.compile(rb">>\s*stream(\r\n|\n|\r)")
+_INT = re.compile(rb"\s*(\d+)")
+
+
+def _ref(dict_text, key):
+    m = re.search(rb"/" + key + rb"\s+(\d+)\s+(\d+)\s+R", dict_text)
+    return int(m.group(1)) if m else None
+
+
+def _int(dict_text, key):
+    m = re.search(rb"/" + key + rb"\s+(\d+)(?![\d\s]*R)", dict_text)
+    return int(m.group(1)) if m else None
+
+
+def _ints(dict_text, key):
+    m = re.search(rb"/" + key + rb"\s*\[([\d\s]*)\]", dict_text)
+    return [int(x) for x in m.group(1).split()] if m else None
+
+
+def _unpredict(data, columns, predictor):
+    """Undo PNG row predictors (PDF /Predictor >= 10)"""
+    if predictor < 10:
+        return data
+    row_len = columns + 1
+    out = bytearray()
+    prev = bytearray(columns)
+    for i in range(0, len(data), row_len):
+        ftype, row = data[i], bytearray(data[i + 1:i + row_len])
+        for j in range(len(row)):
+            left = row[j - 1] if j else 0
+            up = prev[j]
+            if ftype == 1:
+                row[j] = (row[j] + left) & 0xFF
+            elif ftype == 2:
+                row[j] = (row[j] + up) & 0xFF
+            elif ftype == 3:
+                row[j] = (row[j] + ((left + up) >> 1)) & 0xFF
+            elif ftype == 4:
+                upleft = prev[j - 1] if j else 0
+                p = left + up - upleft
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - upleft)
+                pred = left if pa <= pb and pa <= pc else (up if pb <= pc else upleft)
+                row[j] = (row[j] + pred) & 0xFF
+        out += row
+        prev = row
+    return bytes(out)
+
+
+class _PdfIndex:
+    """Just enough of a PDF cross-reference reader to find /Root /Pages /Count"""
+
+    def __init__(self, data):
+        self.data = data
+        self.offsets = {}       # objnum -> byte offset
+        self.compressed = {}    # objnum -> (object stream objnum, index)
+        self.trailer = None
+        self._objstm = {}
+
+    def load(self):
+        tail = self.data[max(0, len(self.data) - 2048):]
+        matches = list(_STARTXREF.finditer(tail))
+        if not matches:
+            raise ValueError("no startxref")
+        pending = [int(matches[-1].group(1))]
+        seen = set()
+        while pending:
+            offset = pending.pop(0)
+            if offset in seen:
+                continue
+            seen.add(offset)
+            if self.data[offset:offset + 4] == b"xref":
+                trailer = self._read_xref_table(offset)
+                xref_stm = _int(trailer, b"XRefStm")
+                if xref_stm is not None:
+                    self._read_xref_stream(xref_stm)
+            else:
+                trailer = self._read_xref_stream(offset)
+            if self.trailer is None:
+                self.trailer = trailer
+            prev = _int(trailer, b"Prev")
+            if prev is not None:
+                pending.append(prev)
+
+    def _read_xref_table(self, offset):
+        pos = offset + 4
+        data = self.data
+        while True:
+            m = _XREF_SECTION.match(data, pos)
+            if not m:
+                break
+            start, count = int(m.group(1)), int(m.group(2))
+            pos = m.end()
+            for num in range(start, start + count):
+                e = _XREF_ENTRY.search(data, pos, pos + 40)
+                if not e:
+                    raise ValueError("bad xref entry")
+                pos = e.end()
+                if e.group(3) == b"n" and num not in self.offsets and num not in self.compressed:
+                    self.offsets[num] = int(e.group(1))
+        trailer_at = data.find(b"trailer", pos)
+        end = data.find(b"startxref", trailer_at)
+        if trailer_at < 0 or end < 0:
+            raise ValueError("no trailer")
+        return data[trailer_at:end]
+
+    def _read_stream(self, offset):
+        """Return (dict_text, decoded stream bytes) for the object at offset"""
+        data = self.data
+        m = _STREAM_START.search(data, offset)
+        if not m:
+            raise ValueError("no stream")
+        dict_text = data[offset:m.start() + 2]
+        start = m.end()
+        length = _int(dict_text, b"Length")
+        if length is None:
+            end = data.find(b"endstream", start)
+            raw = data[start:end].rstrip(b"\r\n")
+        else:
+            raw = data[start:start + length]
+        if b"/FlateDecode" in dict_text:
+            raw = zlib.decompress(raw)
+        elif b"/Filter" in dict_text:
+            raise ValueError("unsupported filter")
+        predictor = _int(dict_text, b"Predictor") or 1
+        columns = _int(dict_text, b"Columns") or 1
+        return dict_text, _unpredict(raw, columns, predictor)
+
+    def _read_xref_stream(self, offset):
+        dict_text, body = self._read_stream(offset)
+        widths = _ints(dict_text, b"W")
+        if not widths or len(widths) != 3:
+            raise ValueError("bad /W")
+        index = _ints(dict_text, b"Index") or [0, _int(dict_text, b"Size")]
+        w0, w1, w2 = widths
+        entry = w0 + w1 + w2
+        pos = 0
+        for i in range(0, len(index), 2):
+            for num in range(index[i], index[i] + index[i + 1]):
+                row = body[pos:pos + entry]
+                pos += entry
+                ftype = int.from_bytes(row[:w0], "big") if w0 else 1
+                f1 = int.from_bytes(row[w0:w0 + w1], "big")
+                f2 = int.from_bytes(row[w0 + w1:], "big")
+                if num in self.offsets or num in self.compressed:
+                    continue
+                if ftype == 1:
+                    self.offsets[num] = f1
+                elif ftype == 2:
+                    self.compressed[num] = (f1, f2)
+        return dict_text
+
+    def _object_stream(self, num):
+        if num not in self._objstm:
+            dict_text, body = self._read_stream(self.offsets[num])
+            count, first = _int(dict_text, b"N"), _int(dict_text, b"First")
+            header = body[:first].split()
+            positions = [first + int(header[i * 2 + 1]) for i in range(count)]
+            self._objstm[num] = (body, positions)
+        return self._objstm[num]
+
+    def object(self, num):
+        """Raw body of an object (dictionary text, no stream data)"""
+        if num in self.compressed:
+            stm, idx = self.compressed[num]
+            body, positions = self._object_stream(stm)
+            end = positions[idx + 1] if idx + 1 < len(positions) else len(body)
+            return body[positions[idx]:end]
+        offset = self.offsets[num]
+        m = _OBJ_HEADER.match(self.data, offset)
+        if not m or int(m.group(1)) != num:
+            raise ValueError(f"object {num} not at its xref offset")
+        end = self.data.find(b"endobj", m.end())
+        stream_at = self.data.find(b"stream", m.end(), end)
+        return self.data[m.end():stream_at if stream_at >= 0 else end]
+
+    def page_count(self):
+        self.load()
+        if b"/Encrypt" in self.trailer:
+            return None
+        root = _ref(self.trailer, b"Root")
+        pages = _ref(self.object(root), b"Pages")
+        pages_obj = self.object(pages)
+        count_ref = _ref(pages_obj, b"Count")
+        if count_ref is not None:
+            m = _INT.match(self.object(count_ref))
+            return int(m.group(1)) if m else None
+        return _int(pages_obj, b"Count")
+
+
+def fast_pdf_page_count(file_path):
+    """Page count read from the xref and the root /Pages /Count.
+
+    Returns None when the file is encrypted or too broken for the fast
+    path, so callers can fall back to a full parse.
+    """
+    try:
+        with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            count = _PdfIndex(data).page_count()
+        return count if count and count > 0 else None
+    except Exception:
+        return None
+
+
+def count_pdf_pages(file_path):
+    """PDF page count: fast path first, full PyPDF2 parse as the fallback"""
+    count = fast_pdf_page_count(file_path)
+    if count is not None:
+        return count
+    reader = PdfReader(file_path)
+    if reader.is_encrypted:
+        reader.decrypt("")
+    return len(reader.pages)
+
+
+ROWS_PER_PAGE = 50          # spreadsheet rows that fit on an A4 page
+LINES_PER_PAGE = 60         # plain text lines per page
+CHARS_PER_LINE = 80
+BYTES_PER_PAGE = {"txt": 3000}
+DEFAULT_BYTES_PER_PAGE = 50000
+
+_APP_XML_COUNT = {"docx": b"Pages", "pptx": b"Slides"}
+_ODF_PAGE_COUNT = re.compile(rb'meta:page-count="(\d+)"')
+_XLSX_DIMENSION = re.compile(rb'<(?:\w+:)?dimension ref="[A-Z]+(\d+)(?::[A-Z]+(\d+))?"')
+_XLSX_SHEET = re.compile(r"xl/worksheets/sheet\d+\.xml$")
+
+
+def _read_member(zf, name, limit=256 * 1024):
+    """Read (at most limit bytes of) one archive member; b"" if missing"""
+    try:
+        with zf.open(name) as f:
+            return f.read(limit)
+    except KeyError:
+        return b""
+
+
+def _count_tag_streaming(f, tag, head=b"", chunk_size=64 * 1024):
+    """Count occurrences of tag in head + the rest of stream f, chunk by chunk"""
+    count = head.count(tag)
+    keep = len(tag) - 1
+    tail = head[-keep:]
+    for chunk in iter(lambda: f.read(chunk_size), b""):
+        data = tail + chunk
+        count += data.count(tag) - tail.count(tag)
+        tail = data[-keep:]
+    return count
+
+
+def _xlsx_pages(zf):
+    pages = 0
+    for name in zf.namelist():
+        if not _XLSX_SHEET.match(name):
+            continue
+        with zf.open(name) as f:
+            head = f.read(4096)
+            m = _XLSX_DIMENSION.search(head)
+            if m:
+                rows = int(m.group(2) or m.group(1))
+            else:
+                rows = _count_tag_streaming(f, b"<row ", head)
+        pages += max(1, math.ceil(rows / ROWS_PER_PAGE))
+    return pages
+
+
+def _text_pages(file_path, rows_only=False):
+    lines = 0
+    with open(file_path, "rb") as f:
+        for line in f:
+            lines += 1 if rows_only else max(1, math.ceil(len(line.rstrip()) / CHARS_PER_LINE))
+    per_page = ROWS_PER_PAGE if rows_only else LINES_PER_PAGE
+    return max(1, math.ceil(lines / per_page))
+
+
+def count_document_pages(file_path, file_ext):
+    """Page count for office/text documents without rendering them.
+
+    Returns (pages, source). OOXML reads docProps/app.xml (Pages/Slides),
+    ODF reads meta.xml, XLSX streams sheet row counts, CSV/TXT count lines.
+    When none of that is available, source is "size-estimate" and the
+    count is a guess from the file size.
+    """
+    try:
+        if file_ext in _APP_XML_COUNT or file_ext in ("xlsx", "odt"):
+            with zipfile.ZipFile(file_path) as zf:
+                if file_ext in _APP_XML_COUNT:
+                    tag = _APP_XML_COUNT[file_ext]
+                    m = re.search(rb"<" + tag + rb">(\d+)</" + tag + rb">",
+                                  _read_member(zf, "docProps/app.xml"))
+                    if m and int(m.group(1)) > 0:
+                        return int(m.group(1)), "metadata"
+                elif file_ext == "odt":
+                    m = _ODF_PAGE_COUNT.search(_read_member(zf, "meta.xml"))
+                    if m and int(m.group(1)) > 0:
+                        return int(m.group(1)), "metadata"
+                else:
+                    pages = _xlsx_pages(zf)
+                    if pages:
+                        return pages, "rows"
+        elif file_ext == "csv":
+            return _text_pages(file_path, rows_only=True), "rows"
+        elif file_ext == "txt":
+            return _text_pages(file_path), "lines"
+    except (zipfile.BadZipFile, OSError, ValueError):
+        pass
+    per_page = BYTES_PER_PAGE.get(file_ext, DEFAULT_BYTES_PER_PAGE)
+    return max(1, min(100, os.path.getsize(file_path) // per_page)), "size-estimate"
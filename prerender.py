@@ -0,0 +1,139 @@
+"""Printer-ready PDF artifacts rendered in the background and stored next to their blob"""
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from blob_store import blob_relpath
+from image_normalizer import ImageNormalizer
+from order_assembler import text_pdf
+
+RENDER_VERSION = 2        # bump when rendering changes so old artifacts are not reused
+DEFAULT_DPI = 300
+PAPER = "A4"
+
+IMAGE_TYPES = {'jpg', 'jpeg', 'png', 'bmp', 'gif', 'tiff', 'tif', 'webp'}
+TEXT_TYPES = {'txt', 'log', 'csv'}
+OFFICE_TYPES = {'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'odt', 'rtf'}
+
+
+def render_options(print_options, dpi=DEFAULT_DPI, autocrop=False):
+    """The part of a file's print options that changes what gets rendered"""
+    return {"color": bool((print_options or {}).get("color")), "dpi": dpi,
+            "paper": PAPER, "crop": bool(autocrop), "v": RENDER_VERSION}
+
+
+def artifact_relpath(digest, ext, print_options, dpi=DEFAULT_DPI, autocrop=False):
+    """Where the printer-ready PDF for a blob + options lives, relative to the uploads dir.
+
+    None for types that are already printer-ready (PDF) or unknown.
+    """
+    ext = (ext or "").lower()
+    if not digest or ext not in IMAGE_TYPES | TEXT_TYPES | OFFICE_TYPES:
+        return None
+    key = json.dumps(render_options(print_options, dpi, autocrop), sort_keys=True)
+    tag = hashlib.sha256(key.encode()).hexdigest()[:12]
+    return blob_relpath(digest, ext).with_name(f"{digest}.{tag}.pdf")
+
+
+class Prerenderer:
+    """Renders uploads into printer-ready PDFs on a small thread pool.
+
+    submit() is called when a file is uploaded and again, with the final
+    options, when the order is placed. Work is keyed by artifact path, so
+    a file that is already rendered (or being rendered) costs nothing;
+    re-prints of the same content with the same options reuse the artifact.
+    Office files are converted only when LibreOffice is installed.
+    Images are normalized (rotated, fitted to A4 at dpi, grayscale for
+    B&W) in a separate process pool so big photos do not hold the GIL.
+    """
+
+    def __init__(self, uploads_dir, dpi=DEFAULT_DPI, workers=2, autocrop=False, image_workers=2):
+        self.uploads_dir = Path(uploads_dir)
+        self.dpi = dpi
+        self.autocrop = autocrop
+        self.images = ImageNormalizer(workers=image_workers, dpi=dpi, autocrop=autocrop)
+        self.soffice = shutil.which("soffice") or shutil.which("libreoffice")
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prerender")
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.counters = {"submitted": 0, "cached": 0, "rendered": 0, "failed": 0,
+                         "skipped": 0, "render_seconds": 0.0}
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def submit(self, source_path, digest, ext, print_options):
+        """Queue rendering for one file; returns the artifact path (it may not exist yet) or None"""
+        rel = artifact_relpath(digest, ext, print_options, self.dpi, self.autocrop)
+        if rel is None or (ext.lower() in OFFICE_TYPES and not self.soffice):
+            self._count("skipped")
+            return None
+        target = self.uploads_dir / rel
+        with self._lock:
+            self.counters["submitted"] += 1
+            if target.exists():
+                self.counters["cached"] += 1
+                return target
+            if target in self._pending:
+                return target
+            self._pending.add(target)
+        color = render_options(print_options, self.dpi)["color"]
+        self._pool.submit(self._render, Path(source_path), ext.lower(), color, target)
+        return target
+
+    def submit_order(self, order_data):
+        """Queue every file of a placed order with its final print options"""
+        for f in order_data.get("files") or []:
+            if f.get("sha256"):
+                self.submit(f["local_path"], f["sha256"], f.get("file_type", ""),
+                            f.get("print_options"))
+
+    def _render(self, source, ext, color, target):
+        started = time.perf_counter()
+        fd, tmp_name = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+        os.close(fd)
+        try:
+            if ext in IMAGE_TYPES:
+                report = self.images.normalize(source, tmp_name, color)
+                print(f"🖼️ Normalized {source.name}: {report['source_bytes']:,} → "
+                      f"{report['output_bytes']:,} bytes in {report['seconds']}s")
+            elif ext in TEXT_TYPES:
+                with open(source, "r", encoding="utf-8", errors="replace") as f:
+                    text_pdf(f, tmp_name)
+            else:
+                self._office_pdf(source, tmp_name)
+            os.replace(tmp_name, target)   # readers only ever see complete artifacts
+            self._count("rendered")
+        except Exception as e:
+            print(f"⚠️ Pre-render failed for {source.name}: {e}")
+            self._count("failed")
+        finally:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            with self._lock:
+                self._pending.discard(target)
+                self.counters["render_seconds"] += time.perf_counter() - started
+
+    def _office_pdf(self, source, out_path):
+        with tempfile.TemporaryDirectory() as tmp:
+            result = subprocess.run(
+                [self.soffice, "--headless", "--convert-to", "pdf", "--outdir", tmp, str(source)],
+                capture_output=True, timeout=180)
+            converted = Path(tmp) / (source.stem + ".pdf")
+            if result.returncode != 0 or not converted.exists():
+                raise RuntimeError(f"LibreOffice returned code {result.returncode}")
+            shutil.move(str(converted), out_path)
+
+    def stats(self):
+        with self._lock:
+            counters = {**self.counters, "pending": len(self._pending),
+                        "render_seconds": round(self.counters["render_seconds"], 3)}
+        return {**counters, "images": self.images.stats()}
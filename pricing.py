@@ -0,0 +1,120 @@
+"""Print pricing: per-sheet rates, bulk tiers, running totals and batch re-quotes"""
+import bisect
+import math
+
+# Base per-sheet rates. A tier applies once the order has at least
+# min_sheets sheets of that kind (B&W and color are counted separately),
+# and then covers every sheet of that kind in the order.
+PRICING = {
+    'sheet_bw': 1.1,
+    'sheet_color': 6.0,
+    'tiers': [
+        # {'min_sheets': 200, 'sheet_bw': 0.9},
+        # {'min_sheets': 50, 'sheet_color': 5.0},
+    ],
+}
+
+
+def sheets_for(page_count, sides, copies):
+    """(sheets per copy, total sheets) for one file"""
+    per_copy = page_count if sides == "single" else math.ceil(page_count / 2)
+    return per_copy, per_copy * copies
+
+
+class PricingEngine:
+    """Rates from a PRICING-style dict; all prices come from here"""
+
+    def __init__(self, pricing=PRICING):
+        self.pricing = pricing
+        self._steps = {}
+        for kind in ("sheet_bw", "sheet_color"):
+            steps = sorted((t["min_sheets"], t[kind]) for t in pricing.get("tiers", ()) if kind in t)
+            self._steps[kind] = ([0] + [s for s, _ in steps], [pricing[kind]] + [r for _, r in steps])
+
+    def rate(self, color, sheets):
+        """Per-sheet rate when the order has `sheets` sheets of this kind"""
+        thresholds, rates = self._steps["sheet_color" if color else "sheet_bw"]
+        return rates[bisect.bisect_right(thresholds, sheets) - 1]
+
+    def rates(self, bw_sheets, color_sheets):
+        """{False: B&W rate, True: color rate} for an order with these totals"""
+        return {False: self.rate(False, bw_sheets), True: self.rate(True, color_sheets)}
+
+    def order_price(self, bw_sheets, color_sheets):
+        return round(bw_sheets * self.rate(False, bw_sheets)
+                     + color_sheets * self.rate(True, color_sheets), 2)
+
+    def quote(self, files):
+        """Full quote for order-JSON style file dicts (page_count + print_options)"""
+        lines = []
+        pages = bw = color = 0
+        for f in files:
+            opts = f.get("print_options") or {}
+            page_count = max(1, int(f.get("page_count") or 1))
+            is_color = bool(opts.get("color", False))
+            per_copy, total = sheets_for(page_count, opts.get("sides", "double"),
+                                         max(1, int(opts.get("copies") or 1)))
+            lines.append((f.get("file_id"), is_color, per_copy, total))
+            pages += page_count
+            if is_color:
+                color += total
+            else:
+                bw += total
+        rates = self.rates(bw, color)
+        return {
+            "files": [
+                {"file_id": file_id, "sheets_required": per_copy, "total_sheets": total,
+                 "rate": rates[is_color], "price": round(total * rates[is_color], 2)}
+                for file_id, is_color, per_copy, total in lines
+            ],
+            "total_pages": pages,
+            "total_sheets": bw + color,
+            "total_price": self.order_price(bw, color),
+        }
+
+    def requote_many(self, orders):
+        """Re-price many stored orders in one pass (e.g. to try out a new PRICING).
+
+        Works column-wise: every file of every order is flattened into
+        parallel lists, sheet counts are computed for all of them at once
+        and summed per order. Returns one row per order with the old and
+        new totals.
+        """
+        owner, pages, single, copies, color = [], [], [], [], []
+        ids, old = [], []
+        for i, order in enumerate(orders):
+            ids.append(order.get("order_id"))
+            old.append(order.get("total_price"))
+            for f in order.get("files") or ():
+                opts = f.get("print_options") or {}
+                owner.append(i)
+                pages.append(max(1, int(f.get("page_count") or 1)))
+                single.append(opts.get("sides") == "single")
+                copies.append(max(1, int(opts.get("copies") or 1)))
+                color.append(bool(opts.get("color")))
+
+        sheets = [(p if s else (p + 1) // 2) * c for p, s, c in zip(pages, single, copies)]
+        bw_sheets = [0] * len(ids)
+        color_sheets = [0] * len(ids)
+        for i, n, is_color in zip(owner, sheets, color):
+            if is_color:
+                color_sheets[i] += n
+            else:
+                bw_sheets[i] += n
+
+        return [
+            {"order_id": order_id, "old_total": old_total,
+             "new_total": self.order_price(bw, col), "total_sheets": bw + col}
+            for order_id, old_total, bw, col in zip(ids, old, bw_sheets, color_sheets)
+        ]
+
+    def describe(self):
+        """Rate card for clients"""
+        return {
+            "sheet_bw": self.pricing["sheet_bw"],
+            "sheet_color": self.pricing["sheet_color"],
+            "tiers": list(self.pricing.get("tiers", ())),
+        }
+
+
+ENGINE = PricingEngine()
@@ -0,0 +1,281 @@
+"""Durable print job queue (SQLite journal) used by printer_service"""
+import json
+import random
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS print_orders (
+    order_id    TEXT PRIMARY KEY,
+    source_path TEXT,
+    data        TEXT NOT NULL,
+    state       TEXT NOT NULL DEFAULT 'queued',
+    created_at  REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS print_jobs (
+    job_id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id        TEXT NOT NULL REFERENCES print_orders(order_id),
+    seq             INTEGER NOT NULL,
+    file_id         TEXT,
+    filename        TEXT,
+    path            TEXT NOT NULL,
+    options         TEXT NOT NULL,
+    pages           INTEGER NOT NULL DEFAULT 1,
+    printer         TEXT,
+    artifact        TEXT,
+    state           TEXT NOT NULL DEFAULT 'queued',
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error      TEXT,
+    updated_at      REAL NOT NULL,
+    UNIQUE (order_id, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_print_jobs_state ON print_jobs(state, job_id);
+"""
+
+# Per-file states
+QUEUED, SPOOLING, PRINTED, FAILED = "queued", "spooling", "printed", "failed"
+DONE_STATES = (PRINTED, FAILED)
+
+
+class PrintJob:
+    """One file of one order, as stored in the journal"""
+    __slots__ = ("job_id", "order_id", "seq", "file_id", "filename", "path",
+                 "options", "pages", "printer", "artifact", "state", "attempts", "last_error")
+
+    def __init__(self, row):
+        for name in self.__slots__:
+            setattr(self, name, row[name])
+        self.options = json.loads(self.options)
+
+
+class PrintQueue:
+    """Orders and their files, each file moving queued -> spooling -> printed/failed.
+
+    Every state change is committed before the printer is touched, so after
+    a crash the journal says exactly which files are done. A file that was
+    spooling when the process died goes back to queued on restart.
+    Failed attempts are retried with exponential backoff up to max_attempts.
+    """
+
+    def __init__(self, path="print_queue.db", max_attempts=4, retry_base=5.0, retry_cap=300.0):
+        self.path = str(path)
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        self._migrate(conn)
+
+    def _migrate(self, conn):
+        """Add job columns introduced after the journal was created"""
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(print_jobs)")}
+        if "pages" not in existing:
+            conn.execute("ALTER TABLE print_jobs ADD COLUMN pages INTEGER NOT NULL DEFAULT 1")
+        if "printer" not in existing:
+            conn.execute("ALTER TABLE print_jobs ADD COLUMN printer TEXT")
+        if "artifact" not in existing:
+            conn.execute("ALTER TABLE print_jobs ADD COLUMN artifact TEXT")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    def is_empty(self):
+        return self._conn().execute("SELECT COUNT(*) FROM print_orders").fetchone()[0] == 0
+
+    def has_order(self, order_id):
+        return self._conn().execute(
+            "SELECT 1 FROM print_orders WHERE order_id = ?", (order_id,)).fetchone() is not None
+
+    def enqueue(self, order, source_path, resolve_path, resolve_artifact=None):
+        """Journal an order and one job per file; False if it was already queued.
+
+        resolve_artifact(file) may name a pre-rendered, printer-ready copy
+        of the file; it is used at print time if it exists by then.
+        """
+        now = time.time()
+        conn = self._conn()
+        with self._lock, conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO print_orders (order_id, source_path, data, created_at)"
+                " VALUES (?, ?, ?, ?)",
+                (order["order_id"], str(source_path), json.dumps(order), now))
+            if cur.rowcount == 0:
+                return False
+            rows = []
+            for seq, f in enumerate(order.get("files") or [], 1):
+                artifact = resolve_artifact(f) if resolve_artifact else None
+                rows.append((order["order_id"], seq, f.get("file_id"), f.get("filename"),
+                             str(resolve_path(f)), json.dumps(f.get("print_options") or {}),
+                             int(f.get("page_count") or 1), str(artifact) if artifact else None, now))
+            conn.executemany(
+                "INSERT INTO print_jobs (order_id, seq, file_id, filename, path, options, pages,"
+                " artifact, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self._wakeup.set()
+        return True
+
+    def recover(self):
+        """Requeue files left spooling by a crash; returns how many"""
+        conn = self._conn()
+        with self._lock, conn:
+            cur = conn.execute(
+                "UPDATE print_jobs SET state = ?, next_attempt_at = 0, updated_at = ? WHERE state = ?",
+                (QUEUED, time.time(), SPOOLING))
+        return cur.rowcount
+
+    def _candidates(self, rows, printer, now, split_min_pages):
+        """Jobs of one order that printer may start now, in file order"""
+        pending = [r for r in rows if r["state"] in (QUEUED, SPOOLING)]
+        if not pending:
+            return []
+        due = [r for r in pending if r["state"] == QUEUED and r["next_attempt_at"] <= now]
+        pages = sum(r["pages"] for r in rows)
+        if split_min_pages is not None and pages >= split_min_pages:
+            return due      # large order: files may go to different printers at once
+        # Otherwise one file at a time, in file order
+        return due[:1] if due and due[0] is pending[0] else []
+
+    def claim(self, printer=None, accept=None, split_min_pages=None):
+        """Mark the next file this printer should print spooling and return it, or None.
+
+        Orders are served oldest first and files in order; a file that is
+        waiting out a retry holds back the rest of its order. accept(job)
+        can veto a file (e.g. it needs a color printer). Orders of at least
+        split_min_pages pages may be spread over several printers.
+        """
+        now = time.time()
+        conn = self._conn()
+        with self._lock, conn:
+            rows = conn.execute(
+                "SELECT j.* FROM print_jobs j JOIN print_orders o ON o.order_id = j.order_id"
+                " WHERE o.state = ? ORDER BY o.created_at, j.order_id, j.seq",
+                (QUEUED,)).fetchall()
+            by_order = {}
+            for row in rows:
+                by_order.setdefault(row["order_id"], []).append(row)
+            for order_rows in by_order.values():
+                for row in self._candidates(order_rows, printer, now, split_min_pages):
+                    job = PrintJob(row)
+                    if accept is not None and not accept(job):
+                        continue
+                    conn.execute(
+                        "UPDATE print_jobs SET state = ?, attempts = attempts + 1, printer = ?,"
+                        " updated_at = ? WHERE job_id = ?", (SPOOLING, printer, now, job.job_id))
+                    job.state, job.printer, job.attempts = SPOOLING, printer, job.attempts + 1
+                    return job
+        return None
+
+    def claim_rest(self, job, printer=None, accept=None, split_min_pages=None):
+        """Also claim the files that follow job in its order, so they print as one batch.
+
+        Takes the unbroken run of due, queued files after job that accept()
+        allows; nothing for orders big enough to be split across printers.
+        """
+        now = time.time()
+        conn = self._conn()
+        with self._lock, conn:
+            rows = conn.execute("SELECT * FROM print_jobs WHERE order_id = ? ORDER BY seq",
+                                (job.order_id,)).fetchall()
+            if split_min_pages is not None and sum(r["pages"] for r in rows) >= split_min_pages:
+                return []
+            batch = []
+            for row in rows:
+                if row["seq"] <= job.seq or row["state"] in DONE_STATES:
+                    continue
+                if row["state"] != QUEUED or row["next_attempt_at"] > now:
+                    break
+                nxt = PrintJob(row)
+                if accept is not None and not accept(nxt):
+                    break
+                batch.append(nxt)
+            for nxt in batch:
+                conn.execute(
+                    "UPDATE print_jobs SET state = ?, attempts = attempts + 1, printer = ?,"
+                    " updated_at = ? WHERE job_id = ?", (SPOOLING, printer, now, nxt.job_id))
+                nxt.state, nxt.printer, nxt.attempts = SPOOLING, printer, nxt.attempts + 1
+        return batch
+
+    def order(self, order_id):
+        """The order JSON as it was queued"""
+        row = self._conn().execute(
+            "SELECT data FROM print_orders WHERE order_id = ?", (order_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def next_due_in(self):
+        """Seconds until the earliest queued file may be tried (None if nothing queued)"""
+        row = self._conn().execute(
+            "SELECT MIN(next_attempt_at) FROM print_jobs WHERE state = ?", (QUEUED,)).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def wait(self, timeout):
+        """Sleep until something is enqueued or finished, or timeout passes"""
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+    def notify(self):
+        """Wake waiting workers (a printer freed up or changed state)"""
+        self._wakeup.set()
+
+    def mark_printed(self, job):
+        return self._finish(job, PRINTED, None)
+
+    def mark_failed(self, job, error, retry=True):
+        """Record a failed attempt; requeue with backoff unless attempts are used up"""
+        if retry and job.attempts < self.max_attempts:
+            delay = min(self.retry_cap, self.retry_base * 2 ** (job.attempts - 1))
+            delay *= random.uniform(0.8, 1.2)
+            conn = self._conn()
+            with self._lock, conn:
+                conn.execute(
+                    "UPDATE print_jobs SET state = ?, next_attempt_at = ?, last_error = ?,"
+                    " updated_at = ? WHERE job_id = ?",
+                    (QUEUED, time.time() + delay, str(error), time.time(), job.job_id))
+            return None
+        return self._finish(job, FAILED, str(error))
+
+    def _finish(self, job, state, error):
+        """Set a final file state; returns the order summary once every file is done"""
+        now = time.time()
+        conn = self._conn()
+        with self._lock, conn:
+            conn.execute(
+                "UPDATE print_jobs SET state = ?, last_error = ?, updated_at = ? WHERE job_id = ?",
+                (state, error, now, job.job_id))
+            self._wakeup.set()   # the next file of this order may now be free
+            counts = dict(conn.execute(
+                "SELECT state, COUNT(*) FROM print_jobs WHERE order_id = ? GROUP BY state",
+                (job.order_id,)).fetchall())
+            if any(s not in DONE_STATES for s in counts):
+                return None
+            order_state = FAILED if counts.get(FAILED) else PRINTED
+            conn.execute(
+                "UPDATE print_orders SET state = ?, finished_at = ? WHERE order_id = ?",
+                (order_state, now, job.order_id))
+            row = conn.execute("SELECT * FROM print_orders WHERE order_id = ?",
+                               (job.order_id,)).fetchone()
+        return {
+            "order": json.loads(row["data"]),
+            "source_path": row["source_path"],
+            "state": order_state,
+            "printed": counts.get(PRINTED, 0),
+            "failed": counts.get(FAILED, 0),
+        }
+
+    def stats(self):
+        conn = self._conn()
+        jobs = dict(conn.execute("SELECT state, COUNT(*) FROM print_jobs GROUP BY state").fetchall())
+        orders = dict(conn.execute("SELECT state, COUNT(*) FROM print_orders GROUP BY state").fetchall())
+        return {"jobs": jobs, "orders": orders}
@@ -0,0 +1,807 @@
+"""Printer backends: Windows spooler, CUPS (lp) and a file-sink virtual printer"""
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+IMAGE_TYPES = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.tif'}
+OFFICE_TYPES = {'.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx'}
+TEXT_TYPES = {'.txt', '.log', '.csv'}
+SUPPORTED_TYPES = IMAGE_TYPES | OFFICE_TYPES | TEXT_TYPES | {'.pdf'}
+
+# Spool job states, in order of progress. UNCONFIRMED: the tool reported
+# success but the job never showed up in the printer's queue (it may have
+# printed before we looked).
+SUBMITTED, SPOOLED, COMPLETED = "submitted", "spooled", "completed"
+UNCONFIRMED, FAILED = "unconfirmed", "failed"
+_PROGRESS = {SUBMITTED: 0, SPOOLED: 1, COMPLETED: 2}
+
+
+def match_printer(name, installed):
+    """Exact (case-insensitive) match first, then substring; None if nothing fits"""
+    for p in installed:
+        if p.lower() == name.lower():
+            return p
+    for p in installed:
+        if name.lower() in p.lower():
+            return p
+    return None
+
+
+class SpoolJob:
+    """One submission to a printer, correlated with its spooler job once it appears"""
+    __slots__ = ("printer", "document", "job_id", "state", "before", "submitted_at",
+                 "spooled_at", "completed_at")
+
+    def __init__(self, printer, document, before=()):
+        self.printer = printer
+        self.document = document
+        self.job_id = None
+        self.state = SUBMITTED
+        self.before = set(before)   # spooler job ids already queued when we submitted
+        self.submitted_at = time.time()
+        self.spooled_at = None
+        self.completed_at = None
+
+    def advance(self, state):
+        if state == SPOOLED and self.spooled_at is None:
+            self.spooled_at = time.time()
+        elif state == COMPLETED:
+            self.spooled_at = self.spooled_at or time.time()
+            self.completed_at = time.time()
+        self.state = state
+
+
+class PrinterBackend:
+    """What printer_service needs from a print system.
+
+    discover() runs once at startup and caches tool paths and the list of
+    installed printers; resolve() maps a configured name to an installed
+    printer and remembers the answer, so printing a file never has to
+    search for tools or enumerate printers again.
+
+    print_file() returns a SpoolJob (None on failure) and wait_job()
+    follows it through the spooler, so callers wait exactly as long as
+    the job takes instead of sleeping a fixed time.
+    """
+    kind = "none"
+    job_poll_interval = 0.1
+
+    def __init__(self):
+        self.tools = {}
+        self.installed = []
+        self._names = {}
+        self._lock = threading.Lock()
+        self._change = threading.Condition()
+
+    def discover(self):
+        """Find tools and printers; returns {tool: path or None}"""
+        self.installed = self._list_printers()
+        return self.tools
+
+    def _list_printers(self):
+        return []
+
+    def resolve(self, printer_name):
+        """Installed printer name for a configured one (cached), or None"""
+        name = self._names.get(printer_name)
+        if name is not None:
+            return name
+        with self._lock:
+            name = match_printer(printer_name, self.installed)
+            if name is None:
+                # Maybe it was added after startup
+                self.installed = self._list_printers()
+                name = match_printer(printer_name, self.installed)
+            if name is None:
+                print(f"Printer '{printer_name}' not found. Available printers:")
+                for p in self.installed:
+                    print(f"   - {p}")
+                return None
+            if name != printer_name:
+                print(f"Using printer: {name}")
+            self._names[printer_name] = name
+            return name
+
+    def snapshot(self, printer_name):
+        """(is_ready, message, jobs in the printer's queue)"""
+        raise NotImplementedError
+
+    def status(self, printer_name):
+        """(is_ready, message)"""
+        return self.snapshot(printer_name)[:2]
+
+    def wait_for_change(self, printer_name, timeout):
+        """Block until the printer may have changed, at most timeout seconds.
+
+        Backends that cannot be notified by the print system simply time
+        out, which makes the caller poll every timeout seconds.
+        """
+        with self._change:
+            self._change.wait(timeout)
+
+    def _changed(self):
+        with self._change:
+            self._change.notify_all()
+
+    def print_file(self, file_path, printer_name, options, pages=1):
+        """Send one file; its SpoolJob, or None if the print system refused it"""
+        raise NotImplementedError
+
+    def _update_job(self, job):
+        """Refresh job.state from the print system"""
+        raise NotImplementedError
+
+    def wait_job(self, job, until=SPOOLED, timeout=60):
+        """Wait until job reaches `until` (spooled or completed), fails, or timeout passes.
+
+        Returns the job's state. A job that never appeared in the queue
+        within timeout comes back UNCONFIRMED.
+        """
+        deadline = time.time() + timeout
+        while True:
+            self._update_job(job)
+            if job.state == FAILED or _PROGRESS[job.state] >= _PROGRESS[until]:
+                return job.state
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return UNCONFIRMED if job.state == SUBMITTED else job.state
+            with self._change:
+                self._change.wait(min(self.job_poll_interval, remaining))
+
+    def close(self):
+        pass
+
+    def describe(self):
+        return {"backend": self.kind, "tools": self.tools, "printers": list(self.installed)}
+
+
+class WindowsBackend(PrinterBackend):
+    """win32print spooler with SumatraPDF/Adobe/shell for PDFs, mspaint, notepad and Office"""
+    kind = "windows"
+
+    def __init__(self):
+        super().__init__()
+        import win32api
+        import win32print
+        self.win32api = win32api
+        self.win32print = win32print
+        self._handles = {}
+        self._notifications = {}   # printer -> (printer handle, change notification handle)
+        # Shell and notepad printing go through the Windows default printer,
+        # which is process-wide; workers for different printers take turns
+        self._default_printer_lock = threading.Lock()
+
+    def discover(self):
+        self.tools = {"sumatra": self._find_sumatra_pdf(), "adobe": self._find_adobe()}
+        return super().discover()
+
+    def _list_printers(self):
+        try:
+            return [printer[2] for printer in self.win32print.EnumPrinters(2)]
+        except Exception as e:
+            print(f"Error accessing printers: {e}")
+            return []
+
+    def _find_sumatra_pdf(self):
+        """Find SumatraPDF installation"""
+        common_paths = [
+            r"C:\Program Files\SumatraPDF\SumatraPDF.exe",
+            r"C:\Program Files (x86)\SumatraPDF\SumatraPDF.exe",
+            Path.home() / "AppData" / "Local" / "SumatraPDF" / "SumatraPDF.exe",
+            Path(os.environ.get('LOCALAPPDATA', '')) / "SumatraPDF" / "SumatraPDF.exe",
+        ]
+
+        for path in common_paths:
+            if Path(path).exists():
+                return str(path)
+
+        # Try to find in PATH
+        try:
+            result = subprocess.run(['where', 'SumatraPDF'], capture_output=True, text=True)
+            if result.returncode == 0:
+                return result.stdout.strip().split('\n')[0]
+        except:
+            pass
+
+        return None
+
+    def _find_adobe(self):
+        adobe_paths = [
+            r"C:\Program Files\Adobe\Acrobat DC\Acrobat\Acrobat.exe",
+            r"C:\Program Files (x86)\Adobe\Acrobat Reader DC\Reader\AcroRd32.exe",
+            r"C:\Program Files\Adobe\Acrobat Reader DC\Reader\AcroRd32.exe",
+        ]
+        return next((p for p in adobe_paths if Path(p).exists()), None)
+
+    def _handle(self, printer):
+        """Open printer handle, kept for the life of the service"""
+        handle = self._handles.get(printer)
+        if handle is None:
+            handle = self._handles[printer] = self.win32print.OpenPrinter(printer)
+        return handle
+
+    def _with_handle(self, printer, fn):
+        """fn(handle), reopening the handle once if it has gone stale"""
+        try:
+            return fn(self._handle(printer))
+        except Exception:
+            self._drop_handle(printer)
+            return fn(self._handle(printer))
+
+    def _drop_handle(self, printer):
+        handle = self._handles.pop(printer, None)
+        if handle is not None:
+            try:
+                self.win32print.ClosePrinter(handle)
+            except Exception:
+                pass
+
+    def snapshot(self, printer_name):
+        """Check if printer is ready, and how many jobs it has queued"""
+        win32print = self.win32print
+        try:
+            printer = self.resolve(printer_name)
+            if not printer:
+                return False, "Printer not found", 0
+
+            info = self._with_handle(printer, lambda h: win32print.GetPrinter(h, 2))
+            status, jobs = info['Status'], info['cJobs']
+
+            if status == 0:
+                return True, "Ready", jobs
+            elif status & win32print.PRINTER_STATUS_PAPER_OUT:
+                return False, "Out of paper", jobs
+            elif status & win32print.PRINTER_STATUS_OFFLINE:
+                return False, "Offline", jobs
+            elif status & win32print.PRINTER_STATUS_ERROR:
+                return False, "Error state", jobs
+            else:
+                return True, f"Status: {status}", jobs
+
+        except Exception as e:
+            return False, str(e), 0
+
+    def wait_for_change(self, printer_name, timeout):
+        """Wait on a spooler change notification (printer or job changes)"""
+        printer = self.resolve(printer_name)
+        try:
+            import win32event
+            entry = self._notifications.get(printer)
+            if entry is None:
+                handle = self.win32print.OpenPrinter(printer)
+                notify = self.win32print.FindFirstPrinterChangeNotification(
+                    handle, self.win32print.PRINTER_CHANGE_PRINTER | self.win32print.PRINTER_CHANGE_JOB,
+                    0, None)
+                entry = self._notifications[printer] = (handle, notify)
+            if win32event.WaitForSingleObject(entry[1], int(timeout * 1000)) == win32event.WAIT_OBJECT_0:
+                self.win32print.FindNextPrinterChangeNotification(entry[1], None)
+        except Exception:
+            # No notifications for this printer (or it is missing): poll instead
+            self._close_notification(printer)
+            super().wait_for_change(printer_name, timeout)
+
+    def _close_notification(self, printer):
+        entry = self._notifications.pop(printer, None)
+        if entry is not None:
+            try:
+                self.win32print.FindClosePrinterChangeNotification(entry[1])
+                self.win32print.ClosePrinter(entry[0])
+            except Exception:
+                pass
+
+    def _jobs(self, printer):
+        """{job id: job info} currently in the printer's queue"""
+        jobs = self._with_handle(printer, lambda h: self.win32print.EnumJobs(h, 0, -1, 1))
+        return {j['JobId']: j for j in jobs}
+
+    def print_file(self, file_path, printer_name, options, pages=1):
+        printer = self.resolve(printer_name)
+        if not printer:
+            return None
+
+        file_ext = Path(file_path).suffix.lower()
+        if file_ext not in SUPPORTED_TYPES:
+            print(f"   Unsupported file type: {file_ext}")
+            return None
+
+        job = SpoolJob(printer, Path(file_path).name, self._jobs(printer))
+
+        if file_ext in IMAGE_TYPES:
+            print(f"   Image file detected")
+            sent = self._print_image(file_path, printer)
+        elif file_ext == '.pdf':
+            print(f"   PDF file detected")
+            sent = self._print_pdf(file_path, printer, job)
+        elif file_ext in OFFICE_TYPES:
+            print(f"   Office file detected")
+            sent = self._print_office(file_path, printer, job)
+        else:
+            print(f"   Text file detected")
+            sent = self._print_text(file_path, printer, job)
+
+        return job if sent else None
+
+    def _update_job(self, job):
+        win32print = self.win32print
+        try:
+            jobs = self._jobs(job.printer)
+        except Exception:
+            return
+        if job.job_id is None:
+            new = [j for j_id, j in jobs.items() if j_id not in job.before]
+            if not new:
+                return
+            stem = Path(job.document).stem.lower()
+            match = next((j for j in new if stem in (j.get('pDocument') or '').lower()), new[0])
+            job.job_id = match['JobId']
+        info = jobs.get(job.job_id)
+        if info is None:
+            job.advance(COMPLETED)      # left the queue
+        elif info['Status'] & (win32print.JOB_STATUS_DELETING | win32print.JOB_STATUS_DELETED):
+            job.advance(FAILED)
+        elif info['Status'] & win32print.JOB_STATUS_PRINTED:
+            job.advance(COMPLETED)
+        elif not info['Status'] & win32print.JOB_STATUS_SPOOLING:
+            job.advance(SPOOLED)
+
+    def _print_pdf(self, file_path, printer, job):
+        """Print PDF using multiple methods in order of reliability"""
+
+        # Method 1: SumatraPDF (BEST - most reliable and silent)
+        if self._print_pdf_sumatra(file_path, printer):
+            return True
+
+        # Method 2: Adobe Reader (GOOD - if installed)
+        if self._print_pdf_adobe(file_path, printer, job):
+            return True
+
+        # Method 3: Windows Shell Execute (FALLBACK - opens default PDF viewer)
+        if self._print_pdf_with_shellexecute(file_path, printer, job):
+            return True
+
+        # All methods failed
+        print(f"   ❌ Could not print PDF")
+        print(f"   Please install SumatraPDF: https://www.sumatrapdfreader.org/")
+        return False
+
+    def _print_pdf_sumatra(self, file_path, printer):
+        """Print PDF using SumatraPDF (most reliable method)"""
+        try:
+            sumatra_path = self.tools.get("sumatra")
+
+            if not sumatra_path:
+                print(f"   SumatraPDF not found")
+                return False
+
+            file_path_abs = str(Path(file_path).resolve())
+
+            # SumatraPDF command: -print-to "printer" -silent file.pdf
+            cmd = [sumatra_path, '-print-to', printer, '-silent', file_path_abs]
+
+            print(f"   Using SumatraPDF...")
+            result = subprocess.run(cmd, capture_output=True, timeout=30)
+
+            # SumatraPDF exits once the job is in the spooler
+            if result.returncode == 0:
+                print(f"   Print job sent successfully (SumatraPDF)")
+                return True
+            else:
+                print(f"   SumatraPDF returned code: {result.returncode}")
+                return False
+
+        except subprocess.TimeoutExpired:
+            print(f"   SumatraPDF timeout (job may still print)")
+            return True
+        except Exception as e:
+            print(f"   SumatraPDF error: {e}")
+            return False
+
+    def _print_pdf_adobe(self, file_path, printer, job):
+        """Print PDF using Adobe Reader"""
+        try:
+            adobe_path = self.tools.get("adobe")
+
+            if not adobe_path:
+                print(f"   Adobe Reader not found")
+                return False
+
+            file_path_abs = str(Path(file_path).resolve())
+
+            # Adobe command: /t file.pdf printer
+            cmd = [adobe_path, '/t', file_path_abs, printer]
+
+            print(f"   Using Adobe Reader...")
+            subprocess.Popen(cmd)
+
+            if self.wait_job(job, SPOOLED, timeout=30) == UNCONFIRMED:
+                print(f"   Adobe Reader did not spool a job")
+                return False
+            print(f"   Print job sent (Adobe Reader)")
+            return True
+
+        except Exception as e:
+            print(f"   Adobe error: {e}")
+            return False
+
+    def _print_pdf_with_shellexecute(self, file_path, printer, job):
+        """Print PDF using Windows shell print verb"""
+        try:
+            file_path_abs = str(Path(file_path).resolve())
+
+            print(f"   Using Windows shell print...")
+
+            with self._default_printer_lock:
+                # Set default printer temporarily
+                current_default = self.win32print.GetDefaultPrinter()
+                self.win32print.SetDefaultPrinter(printer)
+                try:
+                    # Use ShellExecute to print
+                    self.win32api.ShellExecute(
+                        0,
+                        "print",
+                        file_path_abs,
+                        None,
+                        ".",
+                        0
+                    )
+
+                    # The viewer reads the default printer when it prints,
+                    # so keep it switched until the job shows up
+                    self.wait_job(job, SPOOLED, timeout=30)
+                finally:
+                    # Restore default printer
+                    try:
+                        self.win32print.SetDefaultPrinter(current_default)
+                    except:
+                        pass
+
+            print(f"   Print job sent (Shell)")
+            return True
+
+        except Exception as e:
+            print(f"   Shell print error: {e}")
+            return False
+
+    def _print_image(self, file_path, printer):
+        """Print using mspaint (for images)"""
+        try:
+            print(f"   Using mspaint...")
+
+            cmd = f'mspaint /pt "{file_path}" "{printer}"'
+            result = subprocess.run(cmd, shell=True, capture_output=True, timeout=10)
+
+            if result.returncode == 0 or result.returncode == 1:
+                print(f"   Print job sent")
+                return True
+            else:
+                print(f"   mspaint returned code: {result.returncode}")
+                return False
+
+        except subprocess.TimeoutExpired:
+            print(f"   Timeout (job may still print)")
+            return True
+        except Exception as e:
+            print(f"   mspaint error: {e}")
+            return False
+
+    def _print_text(self, file_path, printer, job):
+        """Print text files using notepad"""
+        try:
+            print(f"   Using notepad...")
+
+            with self._default_printer_lock:
+                # Set as default printer for notepad
+                current_default = self.win32print.GetDefaultPrinter()
+                self.win32print.SetDefaultPrinter(printer)
+                try:
+                    cmd = f'notepad /p "{file_path}"'
+                    subprocess.Popen(cmd, shell=True)
+
+                    self.wait_job(job, SPOOLED, timeout=15)
+                finally:
+                    # Restore default printer
+                    try:
+                        self.win32print.SetDefaultPrinter(current_default)
+                    except:
+                        pass
+
+            print(f"   Print job sent")
+            return True
+
+        except Exception as e:
+            print(f"   Notepad error: {e}")
+            return False
+
+    def _print_office(self, file_path, printer, job):
+        """Print Microsoft Office files"""
+        try:
+            import pythoncom
+            from win32com import client
+
+            pythoncom.CoInitialize()  # COM must be initialised on the print worker thread
+
+            file_ext = Path(file_path).suffix.lower()
+            file_path = str(Path(file_path).resolve())
+
+            print(f"   Opening Office app for {file_ext}...")
+
+            if file_ext in ['.doc', '.docx']:
+                word = client.Dispatch("Word.Application")
+                word.Visible = False
+
+                doc = word.Documents.Open(file_path)
+                doc.PrintOut(Background=False, Append=False, Range=0, Copies=1,
+                            PrintToFile=False, Collate=True, ActivePrinterMacGX=printer)
+
+                doc.Close(False)
+                word.Quit()
+
+                print(f"   Print job sent (Word)")
+                return True
+
+            elif file_ext in ['.xls', '.xlsx']:
+                excel = client.Dispatch("Excel.Application")
+                excel.Visible = False
+                excel.DisplayAlerts = False
+
+                workbook = excel.Workbooks.Open(file_path)
+                workbook.ActiveSheet.PrintOut(Copies=1, Collate=True, ActivePrinter=printer)
+
+                # Closing the app before the job has spooled cancels it
+                self.wait_job(job, SPOOLED, timeout=30)
+                workbook.Close(False)
+                excel.Quit()
+
+                print(f"   Print job sent (Excel)")
+                return True
+
+            elif file_ext in ['.ppt', '.pptx']:
+                powerpoint = client.Dispatch("PowerPoint.Application")
+
+                presentation = powerpoint.Presentations.Open(file_path, WithWindow=False)
+                presentation.PrintOptions.ActivePrinter = printer
+                presentation.PrintOut(Copies=1, Collate=True)
+
+                self.wait_job(job, SPOOLED, timeout=30)
+                presentation.Close()
+                powerpoint.Quit()
+
+                print(f"   Print job sent (PowerPoint)")
+                return True
+
+            else:
+                print(f"   Unsupported Office file: {file_ext}")
+                return False
+
+        except Exception as e:
+            print(f"   Office error: {e}")
+            print(f"   Make sure Microsoft Office is installed")
+            return False
+
+    def close(self):
+        for printer in list(self._notifications):
+            self._close_notification(printer)
+        for printer in list(self._handles):
+            self._drop_handle(printer)
+
+
+class CupsBackend(PrinterBackend):
+    """CUPS via the lp and lpstat commands; Office files go through LibreOffice"""
+    kind = "cups"
+    _REQUEST_ID = re.compile(r"request id is (\S+)")
+
+    def discover(self):
+        self.tools = {
+            "lp": shutil.which("lp"),
+            "lpstat": shutil.which("lpstat"),
+            "soffice": shutil.which("soffice") or shutil.which("libreoffice"),
+        }
+        return super().discover()
+
+    def _run(self, tool, *args, timeout=30):
+        path = self.tools.get(tool)
+        if not path:
+            raise RuntimeError(f"{tool} not found")
+        return subprocess.run([path, *args], capture_output=True, text=True, timeout=timeout)
+
+    def _list_printers(self):
+        try:
+            result = self._run("lpstat", "-e", timeout=10)
+            return [line.strip() for line in result.stdout.splitlines() if line.strip()]
+        except Exception as e:
+            print(f"Error accessing printers: {e}")
+            return []
+
+    def snapshot(self, printer_name):
+        try:
+            printer = self.resolve(printer_name)
+            if not printer:
+                return False, "Printer not found", 0
+            result = self._run("lpstat", "-p", printer, timeout=10)
+            if result.returncode != 0:
+                return False, (result.stderr or result.stdout).strip() or "lpstat failed", 0
+            text = result.stdout.lower()
+            queued = self._run("lpstat", "-o", printer, timeout=10)
+            jobs = len([line for line in queued.stdout.splitlines() if line.strip()])
+            if "disabled" in text:
+                return False, "Disabled", jobs
+            if "printing" in text:
+                return True, "Printing", jobs
+            return True, "Ready", jobs
+        except Exception as e:
+            return False, str(e), 0
+
+    def print_file(self, file_path, printer_name, options, pages=1):
+        printer = self.resolve(printer_name)
+        if not printer:
+            return None
+
+        file_path = Path(file_path)
+        file_ext = file_path.suffix.lower()
+        if file_ext not in SUPPORTED_TYPES:
+            print(f"   Unsupported file type: {file_ext}")
+            return None
+
+        job = SpoolJob(printer, file_path.name)
+        if file_ext in OFFICE_TYPES:
+            with tempfile.TemporaryDirectory() as tmp:
+                pdf = self._office_to_pdf(file_path, tmp)
+                sent = bool(pdf) and self._lp(pdf, printer, options, job)
+        else:
+            sent = self._lp(file_path, printer, options, job)
+        return job if sent else None
+
+    def _update_job(self, job):
+        """lp returns once CUPS has the job, so only completion needs checking"""
+        if job.job_id is None:
+            return
+        try:
+            result = self._run("lpstat", "-W", "not-completed", "-o", job.printer, timeout=10)
+        except Exception:
+            return
+        if result.returncode == 0 and not any(
+                line.split()[0] == job.job_id for line in result.stdout.splitlines() if line.strip()):
+            job.advance(COMPLETED)
+
+    def _office_to_pdf(self, file_path, out_dir):
+        try:
+            print(f"   Converting {file_path.suffix} with LibreOffice...")
+            result = self._run("soffice", "--headless", "--convert-to", "pdf",
+                               "--outdir", out_dir, str(file_path), timeout=120)
+            pdf = Path(out_dir) / (file_path.stem + ".pdf")
+            if result.returncode == 0 and pdf.exists():
+                return pdf
+            print(f"   LibreOffice returned code: {result.returncode}")
+        except Exception as e:
+            print(f"   LibreOffice error: {e}")
+        return None
+
+    def _lp(self, file_path, printer, options, job):
+        copies = max(1, int(options.get("copies") or 1))
+        sides = "two-sided-long-edge" if options.get("sides") == "double" else "one-sided"
+        args = ["-d", printer, "-n", str(copies), "-o", f"sides={sides}", "-t", job.document]
+        if not options.get("color"):
+            args += ["-o", "ColorModel=Gray"]
+        try:
+            print(f"   Using lp...")
+            result = self._run("lp", *args, str(file_path))
+            if result.returncode != 0:
+                print(f"   lp returned code {result.returncode}: {result.stderr.strip()}")
+                return False
+            match = self._REQUEST_ID.search(result.stdout)
+            if match:
+                job.job_id = match.group(1)
+                job.advance(SPOOLED)
+            print(f"   Print job sent ({job.job_id or 'lp'})")
+            return True
+        except Exception as e:
+            print(f"   lp error: {e}")
+            return False
+
+
+class FileSinkBackend(PrinterBackend):
+    """Virtual printers that copy each job into a folder and log it.
+
+    Any printer name is accepted. A job is spooled once its file has been
+    copied and completes as long after that as the pages would take on a
+    printer running at ppm pages a minute (times time_scale, so tests can
+    use 0). Creating <root>/<printer>.offline takes that printer offline;
+    the file's text, if any, is reported as the reason.
+    """
+    kind = "file"
+
+    def __init__(self, root, ppm=20, time_scale=1.0):
+        super().__init__()
+        self.root = Path(root)
+        self.ppm = ppm
+        self.time_scale = time_scale
+        self._jobs = 0
+        self._pending = {}   # printer -> jobs still "printing"
+
+    def discover(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.tools = {"sink": str(self.root)}
+        self.installed = sorted(p.name for p in self.root.iterdir() if p.is_dir())
+        return self.tools
+
+    def _list_printers(self):
+        return self.installed
+
+    def resolve(self, printer_name):
+        return printer_name
+
+    @staticmethod
+    def _safe(printer_name):
+        return re.sub(r"[^\w.-]+", "_", printer_name)
+
+    def snapshot(self, printer_name):
+        jobs = self._pending.get(printer_name, 0)
+        marker = self.root / f"{self._safe(printer_name)}.offline"
+        if marker.exists():
+            return False, marker.read_text(encoding="utf-8").strip() or "Offline", jobs
+        return True, "Ready", jobs
+
+    def print_file(self, file_path, printer_name, options, pages=1):
+        file_path = Path(file_path)
+        if file_path.suffix.lower() not in SUPPORTED_TYPES:
+            print(f"   Unsupported file type: {file_path.suffix.lower()}")
+            return None
+
+        copies = max(1, int(options.get("copies") or 1))
+        out_dir = self.root / self._safe(printer_name)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._jobs += 1
+            job_id = self._jobs
+            self._pending[printer_name] = self._pending.get(printer_name, 0) + 1
+        dest = out_dir / f"{time.strftime('%Y%m%d_%H%M%S')}_{job_id}_{file_path.name}"
+        shutil.copyfile(file_path, dest)
+
+        seconds = 60.0 * pages * copies / max(1, self.ppm) * self.time_scale
+        with self._lock, open(self.root / "jobs.jsonl", "a", encoding="utf-8") as log:
+            log.write(json.dumps({
+                "job_id": job_id, "printer": printer_name, "file": dest.name,
+                "pages": pages, "options": options, "submitted_at": time.time(),
+                "seconds": round(seconds, 2),
+            }) + "\n")
+        print(f"   Print job sent (file sink: {dest.name})")
+        job = SpoolJob(printer_name, file_path.name)
+        job.job_id = job_id
+        job.advance(SPOOLED)
+        timer = threading.Timer(seconds, self._finish, (job,))
+        timer.daemon = True
+        timer.start()
+        self._changed()
+        return job
+
+    def _finish(self, job):
+        with self._lock:
+            self._pending[job.printer] -= 1
+            job.advance(COMPLETED)
+        self._changed()
+
+    def _update_job(self, job):
+        pass   # _finish moves the job along when its print time is up
+
+
+BACKENDS = {"windows": WindowsBackend, "cups": CupsBackend, "file": FileSinkBackend}
+
+
+def default_backend_kind():
+    """windows on Windows, cups where lp is installed, else the file sink"""
+    if os.name == "nt":
+        return "windows"
+    return "cups" if shutil.which("lp") else "file"
+
+
+def make_backend(kind=None, **options):
+    kind = kind or default_backend_kind()
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown printer backend {kind!r} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[kind](**options)
@@ -0,0 +1,115 @@
+"""Background printer status monitor: one snapshot per printer, change events, readiness waits"""
+import threading
+import time
+
+
+class PrinterState:
+    """Last known status of one printer"""
+    __slots__ = ("name", "ready", "message", "jobs", "updated_at", "changed_at")
+
+    def __init__(self, name):
+        self.name = name
+        self.ready = False
+        self.message = "Unknown"
+        self.jobs = 0
+        self.updated_at = 0.0
+        self.changed_at = 0.0
+
+    def as_dict(self):
+        return {
+            "name": self.name, "ready": self.ready, "message": self.message,
+            "jobs": self.jobs, "updated_at": self.updated_at, "changed_at": self.changed_at,
+        }
+
+
+class PrinterMonitor:
+    """Keeps an in-memory status snapshot of each printer up to date.
+
+    One watcher thread per printer asks the backend for (ready, message,
+    queued jobs) and then waits for the backend to report a change (a
+    spooler notification on Windows) or for interval seconds to pass.
+    Listeners are called as listener(event, state) with event "status"
+    (ready/message changed, e.g. paper out or back online) or
+    "job-finished" (the printer's queue got shorter). Workers call
+    wait_ready() instead of polling the printer themselves.
+    """
+
+    def __init__(self, backend, printer_names, interval=5.0):
+        self.backend = backend
+        self.interval = interval
+        self.states = {name: PrinterState(name) for name in printer_names}
+        self._listeners = []
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+        self.counters = {"polls": 0, "status_events": 0, "job_finished_events": 0}
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def start(self):
+        """Take a first snapshot of every printer, then watch them in the background"""
+        for name in self.states:
+            self.refresh(name)
+        for name in self.states:
+            thread = threading.Thread(target=self._watch, args=(name,),
+                                      name=f"monitor-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _watch(self, name):
+        while not self._stop.is_set():
+            try:
+                self.backend.wait_for_change(name, self.interval)
+                self.refresh(name)
+            except Exception as e:
+                print(f"Printer monitor error ({name}): {e}")
+                self._stop.wait(self.interval)
+
+    def refresh(self, name):
+        """Poll one printer now and publish whatever changed; returns its state"""
+        ready, message, jobs = self.backend.snapshot(name)
+        events = []
+        now = time.time()
+        with self._cond:
+            state = self.states[name]
+            self.counters["polls"] += 1
+            if state.updated_at == 0.0 or (ready, message) != (state.ready, state.message):
+                state.ready, state.message, state.changed_at = ready, message, now
+                events.append("status")
+                self.counters["status_events"] += 1
+            if jobs < state.jobs:
+                events.append("job-finished")
+                self.counters["job_finished_events"] += 1
+            state.jobs = jobs
+            state.updated_at = now
+            self._cond.notify_all()
+        for event in events:
+            for listener in self._listeners:
+                try:
+                    listener(event, state)
+                except Exception as e:
+                    print(f"Printer monitor listener error: {e}")
+        return state
+
+    def get(self, name):
+        return self.states[name]
+
+    def wait_ready(self, name, timeout=None):
+        """Block until the printer is ready (or timeout); returns its state"""
+        state = self.states[name]
+        with self._cond:
+            self._cond.wait_for(lambda: state.ready or self._stop.is_set(), timeout)
+        return state
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self.counters,
+                "printers": [s.as_dict() for s in self.states.values()],
+            }
@@ -0,0 +1,110 @@
+"""Printer pool: capabilities, load and capability-aware job routing"""
+import threading
+import time
+
+
+class Printer:
+    """One configured printer and what it is doing right now"""
+
+    def __init__(self, name, color=False, duplex=False, ppm=10):
+        self.name = name
+        self.color = color
+        self.duplex = duplex
+        self.ppm = ppm
+        self.busy_until = 0.0    # estimated finish time of the current job
+        self.current = None      # job_id being printed
+        self.ready = True        # last status check found the printer usable
+        self.jobs_done = 0
+        self.pages_done = 0
+
+    @property
+    def idle(self):
+        return self.current is None
+
+    @property
+    def available(self):
+        return self.ready and self.current is None
+
+    def describe(self):
+        return {
+            "name": self.name, "color": self.color, "duplex": self.duplex, "ppm": self.ppm,
+            "ready": self.ready, "busy": not self.idle, "eta_seconds": round(max(0.0, self.busy_until - time.time())),
+            "jobs_done": self.jobs_done, "pages_done": self.pages_done,
+        }
+
+
+def job_pages(job):
+    """Pages a job puts through the printer (all copies)"""
+    return (job.pages or 1) * max(1, int(job.options.get("copies") or 1))
+
+
+class PrinterPool:
+    """Decides which printer takes which file.
+
+    Every printer has its own worker that asks the queue for work when it
+    is idle; accept() lets a worker take a file only if its printer can do
+    it and no better-suited printer is idle and ready. Suitability: a color file
+    needs a color printer (a mono printer is used only when the pool has
+    no color printer at all), a B&W file prefers a mono printer, a
+    double-sided file prefers a duplex printer, then the faster printer wins.
+    """
+
+    def __init__(self, printers, split_min_pages=None):
+        self.printers = [p if isinstance(p, Printer) else Printer(**p) for p in printers]
+        if not self.printers:
+            raise ValueError("No printers configured")
+        self.split_min_pages = split_min_pages
+        self.has_color = any(p.color for p in self.printers)
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        return next(p for p in self.printers if p.name == name)
+
+    def score(self, printer, job):
+        """How well printer fits job (higher is better), or None if it cannot print it"""
+        opts = job.options
+        if opts.get("color"):
+            if not printer.color and self.has_color:
+                return None
+            fit = 2 if printer.color else 0
+        else:
+            fit = 1 if printer.color else 2
+        if opts.get("sides") == "double" and printer.duplex:
+            fit += 1
+        return (fit, printer.ppm)
+
+    def accept(self, printer, job):
+        """Should this (idle) printer take job now?"""
+        mine = self.score(printer, job)
+        if mine is None:
+            return False
+        with self._lock:
+            for other in self.printers:
+                if other is printer or not other.available:
+                    continue
+                theirs = self.score(other, job)
+                if theirs is not None and theirs > mine:
+                    return False
+        return True
+
+    def set_ready(self, printer, ready):
+        with self._lock:
+            printer.ready = ready
+
+    def start(self, printer, jobs):
+        """printer took jobs (one file, or a batch from one order)"""
+        with self._lock:
+            printer.current = jobs[0].job_id
+            pages = sum(job_pages(job) for job in jobs)
+            printer.busy_until = time.time() + 60.0 * pages / max(1, printer.ppm)
+
+    def finish(self, printer, printed_jobs):
+        with self._lock:
+            printer.current = None
+            printer.busy_until = 0.0
+            printer.jobs_done += len(printed_jobs)
+            printer.pages_done += sum(job_pages(job) for job in printed_jobs)
+
+    def stats(self):
+        with self._lock:
+            return [p.describe() for p in self.printers]
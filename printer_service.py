@@ -1,504 +1,316 @@
 import json
-import win32api
-import win32print
-import pywintypes
 from pathlib import Path
 import shutil
 import time
 import os
-import subprocess
+import threading
+import requests
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+from blob_store import blob_relpath
+from print_queue import PrintQueue
+from printer_pool import PrinterPool
+from printer_backends import make_backend, FAILED, UNCONFIRMED
+from printer_monitor import PrinterMonitor
+from order_assembler import OrderAssembler, can_assemble
+from prerender import artifact_relpath, DEFAULT_DPI
 
 # ---------- CONFIG ----------
-BASE_DIR = Path(r"C:\Users\rushi\OneDrive\Desktop\automation")
+BASE_DIR = Path(os.getenv("PRINT_BASE_DIR", r"C:\Users\rushi\OneDrive\Desktop\automation"))
 ORDERS_DIR = BASE_DIR / "orders"
 UPLOADS_DIR = BASE_DIR / "uploads"
 PRINTED_DIR = BASE_DIR / "printed"
-PRINTER_NAME = "HP LaserJet 1020"
+# Every printer gets its own worker; files go to the best-suited idle printer.
+# A color file only goes to a mono printer when no color printer is listed.
+PRINTERS = [
+    {"name": "HP LaserJet 1020", "color": False, "duplex": False, "ppm": 14},
+    # {"name": "Epson L3250", "color": True, "duplex": False, "ppm": 10},
+]
+# windows (win32 spooler), cups (lp) or file (virtual printers writing into
+# FILE_SINK_DIR, for running without real printers); default picks for the OS
+PRINTER_BACKEND = os.getenv("PRINTER_BACKEND") or None
+FILE_SINK_DIR = BASE_DIR / "virtual_printers"
+FILE_SINK_TIME_SCALE = float(os.getenv("FILE_SINK_TIME_SCALE", "1"))  # 0 = print instantly
+# Merge the PDF, image and text files of an order into one print job
+# (Office files still print on their own), led by a banner page that
+# separates customers at the output tray
+ASSEMBLE_ORDERS = True
+BANNER_PAGES = True
+ASSEMBLY_DIR = BASE_DIR / "spool"
+# The web app pre-renders images, text and Office files into printer-ready
+# PDFs next to their blobs; these must match its PRERENDER_DPI and
+# PRERENDER_AUTOCROP. Images merged here without an artifact use the same dpi.
+PRERENDER_DPI = int(os.getenv("PRERENDER_DPI", str(DEFAULT_DPI)))
+PRERENDER_AUTOCROP = os.getenv("PRERENDER_AUTOCROP", "0") == "1"
+# Orders with at least this many pages may be spread over several printers
+# (None keeps every order's files in sequence)
+SPLIT_MIN_PAGES = None
+QUEUE_DB = BASE_DIR / "print_queue.db"
+MAX_PRINT_ATTEMPTS = 4
+PRINTER_RETRY_SECONDS = 10   # back-off after a worker error
+# Longest gap between printer status checks when the backend cannot
+# notify us of changes itself (Windows spooler notifications can)
+PRINTER_POLL_SECONDS = 5
+# A file counts as printed once its spooler job reaches this state:
+# "spooled" (the printer has it; fastest) or "completed" (it came out)
+PRINT_WAIT_UNTIL = "spooled"
+SPOOL_TIMEOUT = 60   # seconds to wait for that before giving up on confirmation
+# Web app endpoint that relays print progress to the customer's order page
+STATUS_URL = os.getenv("PRINT_STATUS_URL", "http://localhost:5000/api/print-status")
+STATUS_TOKEN = os.getenv("PRINT_STATUS_TOKEN")
 
 # Create directories if they don't exist
 PRINTED_DIR.mkdir(exist_ok=True)
 # ----------------------------
 
+print_queue = PrintQueue(QUEUE_DB, max_attempts=MAX_PRINT_ATTEMPTS)
+printer_pool = PrinterPool(PRINTERS, split_min_pages=SPLIT_MIN_PAGES)
+backend = make_backend(
+    PRINTER_BACKEND,
+    **({"root": FILE_SINK_DIR, "time_scale": FILE_SINK_TIME_SCALE}
+       if PRINTER_BACKEND == "file" else {}))
+order_assembler = OrderAssembler(ASSEMBLY_DIR, dpi=PRERENDER_DPI)
+printer_monitor = PrinterMonitor(backend, [p.name for p in printer_pool.printers],
+                                 interval=PRINTER_POLL_SECONDS)
+
 class OrderHandler(FileSystemEventHandler):
-    """Watches for new JSON order files"""
+    """Watches for new JSON order files and journals them (printing happens on the worker)"""
     
     def on_created(self, event):
-        if event.is_directory:
-            return
-        
-        if event.src_path.endswith('.json'):
-            print(f"\nNew order detected: {Path(event.src_path).name}")
-            time.sleep(1)  # Wait for file to be fully written
-            process_order(event.src_path)
+        if not event.is_directory and event.src_path.endswith('.json'):
+            enqueue_order_file(event.src_path)
+    
+    # A file still being written fails to parse on create; it is picked up when it is closed
+    on_modified = on_created
+    
+    def on_moved(self, event):
+        if not event.is_directory and event.dest_path.endswith('.json'):
+            enqueue_order_file(event.dest_path)
 
-def get_printer_handle(printer_name):
-    """Get handle to specific printer"""
+def print_file(file_path, printer_name, options, pages=1):
+    """Send file to printer"""
     try:
-        printers = [printer[2] for printer in win32print.EnumPrinters(2)]
-        
-        # Try exact match first
-        for p in printers:
-            if p.lower() == printer_name.lower():
-                return p
+        copies = options.get("copies", 1)
+        color = options.get("color", False)
+        sides = options.get("sides", "single")
         
-        # Try partial match
-        for p in printers:
-            if printer_name.lower() in p.lower():
-                print(f"Using printer: {p}")
-                return p
+        color_text = "Color" if color else "B&W"
+        print(f"   Options: {copies} copies | {sides} | {color_text}")
         
-        print(f"Printer '{printer_name}' not found. Available printers:")
-        for p in printers:
-            print(f"   - {p}")
-        return None
-    except Exception as e:
-        print(f"Error accessing printers: {e}")
-        return None
-
-def clear_print_queue(printer_name):
-    """Clear all jobs from printer queue"""
-    try:
-        printer = get_printer_handle(printer_name)
-        if not printer:
+        job = backend.print_file(file_path, printer_name, options, pages)
+        if not job:
+            print(f"   ✗ Failed to print")
             return False
         
-        handle = win32print.OpenPrinter(printer)
-        jobs = win32print.EnumJobs(handle, 0, -1, 1)
-        
-        if jobs:
-            print(f"   Clearing {len(jobs)} old job(s)...")
-            for job in jobs:
-                try:
-                    win32print.SetJob(handle, job['JobId'], 0, None, win32print.JOB_CONTROL_DELETE)
-                except:
-                    pass
-            time.sleep(1)
-        
-        win32print.ClosePrinter(handle)
+        state = backend.wait_job(job, PRINT_WAIT_UNTIL, SPOOL_TIMEOUT)
+        if state == FAILED:
+            print(f"   ✗ Spooler dropped the job")
+            return False
+        if state == UNCONFIRMED:
+            print(f"   ⚠ Sent, but the job never showed up in the printer queue")
+        print(f"   ✓ Success! ({state} in {time.time() - job.submitted_at:.1f}s)")
         return True
         
     except Exception as e:
-        print(f"Could not clear queue: {e}")
+        print(f"   Print error: {e}")
         return False
 
-def check_printer_status(printer_name):
-    """Check if printer is ready"""
-    try:
-        printer = get_printer_handle(printer_name)
-        if not printer:
-            return False, "Printer not found"
-        
-        handle = win32print.OpenPrinter(printer)
-        printer_info = win32print.GetPrinter(handle, 2)
-        status = printer_info['Status']
-        
-        win32print.ClosePrinter(handle)
-        
-        if status == 0:
-            return True, "Ready"
-        elif status & win32print.PRINTER_STATUS_PAPER_OUT:
-            return False, "Out of paper"
-        elif status & win32print.PRINTER_STATUS_OFFLINE:
-            return False, "Offline"
-        elif status & win32print.PRINTER_STATUS_ERROR:
-            return False, "Error state"
-        else:
-            return True, f"Status: {status}"
-            
-    except Exception as e:
-        return False, str(e)
+def resolve_upload_path(file_info):
+    """Locate an order file under UPLOADS_DIR (content-addressed blobs or legacy flat files)"""
+    if file_info.get("sha256"):
+        return UPLOADS_DIR / blob_relpath(file_info["sha256"], file_info.get("file_type", ""))
+    return UPLOADS_DIR / Path(file_info["local_path"]).name
 
-def find_sumatra_pdf():
-    """Find SumatraPDF installation"""
-    common_paths = [
-        r"C:\Program Files\SumatraPDF\SumatraPDF.exe",
-        r"C:\Program Files (x86)\SumatraPDF\SumatraPDF.exe",
-        Path.home() / "AppData" / "Local" / "SumatraPDF" / "SumatraPDF.exe",
-        Path(os.environ.get('LOCALAPPDATA', '')) / "SumatraPDF" / "SumatraPDF.exe",
-    ]
-    
-    for path in common_paths:
-        if Path(path).exists():
-            return str(path)
-    
-    # Try to find in PATH
-    try:
-        result = subprocess.run(['where', 'SumatraPDF'], capture_output=True, text=True)
-        if result.returncode == 0:
-            return result.stdout.strip().split('\n')[0]
-    except:
-        pass
-    
-    return None
+def resolve_artifact(file_info):
+    """Pre-rendered PDF for an order file (may not exist yet), or None"""
+    rel = artifact_relpath(file_info.get("sha256"), file_info.get("file_type", ""),
+                           file_info.get("print_options"), PRERENDER_DPI, PRERENDER_AUTOCROP)
+    return UPLOADS_DIR / rel if rel else None
 
-def print_pdf_sumatra(file_path, printer_name):
-    """Print PDF using SumatraPDF (most reliable method)"""
-    try:
-        sumatra_path = find_sumatra_pdf()
-        
-        if not sumatra_path:
-            print(f"   SumatraPDF not found")
-            return False
-        
-        printer = get_printer_handle(printer_name)
-        if not printer:
-            return False
-        
-        file_path_abs = str(Path(file_path).resolve())
-        
-        # SumatraPDF command: -print-to "printer" -silent file.pdf
-        cmd = [sumatra_path, '-print-to', printer, '-silent', file_path_abs]
-        
-        print(f"   Using SumatraPDF...")
-        result = subprocess.run(cmd, capture_output=True, timeout=30)
-        
-        if result.returncode == 0:
-            print(f"   Print job sent successfully (SumatraPDF)")
-            time.sleep(2)
-            return True
-        else:
-            print(f"   SumatraPDF returned code: {result.returncode}")
-            return False
-        
-    except subprocess.TimeoutExpired:
-        print(f"   SumatraPDF timeout (job may still print)")
-        return True
-    except Exception as e:
-        print(f"   SumatraPDF error: {e}")
-        return False
+def use_artifacts(jobs):
+    """Point jobs at their pre-rendered PDFs where those are ready"""
+    for job in jobs:
+        if job.artifact and Path(job.artifact).exists():
+            job.path = job.artifact
 
-def print_pdf_adobe(file_path, printer_name):
-    """Print PDF using Adobe Reader"""
+def report_status(order, status, **details):
+    """Send queued/printing/printed/failed to the web app (best effort)"""
+    if not STATUS_URL:
+        return
     try:
-        adobe_paths = [
-            r"C:\Program Files\Adobe\Acrobat DC\Acrobat\Acrobat.exe",
-            r"C:\Program Files (x86)\Adobe\Acrobat Reader DC\Reader\AcroRd32.exe",
-            r"C:\Program Files\Adobe\Acrobat Reader DC\Reader\AcroRd32.exe",
-        ]
-        
-        adobe_path = None
-        for path in adobe_paths:
-            if Path(path).exists():
-                adobe_path = path
-                break
-        
-        if not adobe_path:
-            print(f"   Adobe Reader not found")
-            return False
-        
-        printer = get_printer_handle(printer_name)
-        if not printer:
-            return False
-        
-        file_path_abs = str(Path(file_path).resolve())
-        
-        # Adobe command: /t file.pdf printer
-        cmd = [adobe_path, '/t', file_path_abs, printer]
-        
-        print(f"   Using Adobe Reader...")
-        subprocess.Popen(cmd)
-        
-        time.sleep(5)  # Wait for print job to be sent
-        print(f"   Print job sent (Adobe Reader)")
-        return True
-        
-    except Exception as e:
-        print(f"   Adobe error: {e}")
-        return False
+        requests.post(
+            STATUS_URL,
+            json={"order_id": order["order_id"], "status": status, **details},
+            headers={"X-Print-Token": STATUS_TOKEN} if STATUS_TOKEN else None,
+            timeout=3,
+        )
+    except requests.RequestException as e:
+        print(f"   Could not report status: {e}")
 
-def print_pdf_with_shellexecute(file_path, printer_name):
-    """Print PDF using Windows shell print verb"""
+def enqueue_order_file(order_file_path):
+    """Add an order JSON to the print queue (no-op if already queued or not fully written)"""
     try:
-        printer = get_printer_handle(printer_name)
-        if not printer:
-            return False
-        
-        # Set default printer temporarily
-        current_default = win32print.GetDefaultPrinter()
-        win32print.SetDefaultPrinter(printer)
-        
-        file_path_abs = str(Path(file_path).resolve())
-        
-        print(f"   Using Windows shell print...")
-        
-        # Use ShellExecute to print
-        win32api.ShellExecute(
-            0,
-            "print",
-            file_path_abs,
-            None,
-            ".",
-            0
-        )
-        
-        time.sleep(5)  # Wait for print job
-        
-        # Restore default printer
-        try:
-            win32print.SetDefaultPrinter(current_default)
-        except:
-            pass
-        
-        print(f"   Print job sent (Shell)")
-        return True
-        
-    except Exception as e:
-        print(f"   Shell print error: {e}")
-        # Restore default printer on error
-        try:
-            win32print.SetDefaultPrinter(current_default)
-        except:
-            pass
+        with open(order_file_path, "r", encoding="utf-8") as f:
+            order = json.load(f)
+    except (OSError, ValueError):
         return False
-
-def print_pdf_direct(file_path, printer_name):
-    """Print PDF using multiple methods in order of reliability"""
     
-    # Method 1: SumatraPDF (BEST - most reliable and silent)
-    if print_pdf_sumatra(file_path, printer_name):
-        return True
+    if not print_queue.enqueue(order, order_file_path, resolve_upload_path, resolve_artifact):
+        return False
     
-    # Method 2: Adobe Reader (GOOD - if installed)
-    if print_pdf_adobe(file_path, printer_name):
-        return True
+    print(f"\nQueued order {order['order_id']} for user {order.get('user_id')}"
+          f" ({len(order.get('files') or [])} file(s))")
+    report_status(order, "queued")
+    return True
+
+def print_job(job, printer):
+    """Print one queued file on printer and record the outcome; True if it printed"""
+    file_path = Path(job.path)
+    print(f"\n[{printer.name}] Order {job.order_id} file {job.seq}: {job.filename}"
+          f" (attempt {job.attempts})")
     
-    # Method 3: Windows Shell Execute (FALLBACK - opens default PDF viewer)
-    if print_pdf_with_shellexecute(file_path, printer_name):
-        return True
+    if not file_path.exists():
+        print(f"   File not found: {file_path}")
+        record_result(job, False, "file not found", retry=False)
+        return False
     
-    # All methods failed
-    print(f"   ❌ Could not print PDF")
-    print(f"   Please install SumatraPDF: https://www.sumatrapdfreader.org/")
-    return False
+    report_status({"order_id": job.order_id}, "printing",
+                  file_id=job.file_id, filename=job.filename, printer=printer.name)
+    printed = print_file(file_path, printer.name, job.options, job.pages)
+    record_result(job, printed)
+    return printed
 
-def print_file_method2(file_path, printer_name):
-    """Print using mspaint (for images)"""
+def print_batch(jobs, printer):
+    """Print a run of files from one order, merged where possible; returns the printed jobs"""
+    if not ASSEMBLE_ORDERS:
+        return [job for job in jobs if print_job(job, printer)]
+    
+    merge = [job for job in jobs if can_assemble(job.path) and Path(job.path).exists()]
+    if not merge or (len(merge) == 1 and not BANNER_PAGES):
+        return [job for job in jobs if print_job(job, printer)]
+    
+    order_id = jobs[0].order_id
+    order = print_queue.order(order_id) or {"order_id": order_id}
+    print(f"\n[{printer.name}] Order {order_id}: {len(merge)} file(s) as one job"
+          f" (attempt {merge[0].attempts})")
     try:
-        print(f"   Using mspaint...")
-        
-        printer = get_printer_handle(printer_name)
-        if not printer:
-            return False
-        
-        cmd = f'mspaint /pt "{file_path}" "{printer}"'
-        result = subprocess.run(cmd, shell=True, capture_output=True, timeout=10)
-        
-        if result.returncode == 0 or result.returncode == 1:
-            print(f"   Print job sent")
-            return True
-        else:
-            print(f"   mspaint returned code: {result.returncode}")
-            return False
-        
-    except subprocess.TimeoutExpired:
-        print(f"   Timeout (job may still print)")
-        return True
+        assembled = order_assembler.assemble(order, merge, banner=BANNER_PAGES)
     except Exception as e:
-        print(f"   mspaint error: {e}")
-        return False
+        print(f"   Could not merge order ({e}) - printing files one by one")
+        return [job for job in jobs if print_job(job, printer)]
+    
+    printed = []
+    for item in assembled:
+        print(f"   {item.path.name}: files {', '.join(str(j.seq) for j in item.jobs)},"
+              f" {item.pages} page(s)")
+        for job in item.jobs:
+            report_status({"order_id": order_id}, "printing",
+                          file_id=job.file_id, filename=job.filename, printer=printer.name)
+        ok = print_file(item.path, printer.name, item.options, item.pages)
+        for job in item.jobs:
+            record_result(job, ok)
+        if ok:
+            printed.extend(item.jobs)
+    
+    rest = [job for job in jobs if job not in merge]
+    return printed + [job for job in rest if print_job(job, printer)]
 
-def print_text_file(file_path, printer_name):
-    """Print text files using notepad"""
-    try:
-        print(f"   Using notepad...")
-        
-        printer = get_printer_handle(printer_name)
-        if not printer:
-            return False
-        
-        # Set as default printer for notepad
-        current_default = win32print.GetDefaultPrinter()
-        win32print.SetDefaultPrinter(printer)
-        
-        cmd = f'notepad /p "{file_path}"'
-        subprocess.Popen(cmd, shell=True)
-        
-        time.sleep(3)
-        
-        # Restore default printer
-        try:
-            win32print.SetDefaultPrinter(current_default)
-        except:
-            pass
-        
-        print(f"   Print job sent")
-        return True
-        
-    except Exception as e:
-        print(f"   Notepad error: {e}")
-        return False
+def record_result(job, printed, error="print failed", retry=True):
+    """Journal one file's outcome and wrap up its order when that was the last file"""
+    if printed:
+        summary = print_queue.mark_printed(job)
+    else:
+        summary = print_queue.mark_failed(job, error, retry=retry)
+        if summary is None:
+            print(f"   Will retry {job.filename}")
+    if summary:
+        finish_order(summary)
 
-def print_office_file(file_path, printer_name):
-    """Print Microsoft Office files"""
-    try:
-        from win32com import client
-        
-        printer = get_printer_handle(printer_name)
-        if not printer:
-            return False
-        
-        file_ext = Path(file_path).suffix.lower()
-        file_path = str(Path(file_path).resolve())
-        
-        print(f"   Opening Office app for {file_ext}...")
-        
-        if file_ext in ['.doc', '.docx']:
-            word = client.Dispatch("Word.Application")
-            word.Visible = False
-            
-            doc = word.Documents.Open(file_path)
-            doc.PrintOut(Background=False, Append=False, Range=0, Copies=1, 
-                        PrintToFile=False, Collate=True, ActivePrinterMacGX=printer)
-            
-            time.sleep(3)
-            doc.Close(False)
-            word.Quit()
-            
-            print(f"   Print job sent (Word)")
-            return True
-            
-        elif file_ext in ['.xls', '.xlsx']:
-            excel = client.Dispatch("Excel.Application")
-            excel.Visible = False
-            excel.DisplayAlerts = False
-            
-            workbook = excel.Workbooks.Open(file_path)
-            workbook.ActiveSheet.PrintOut(Copies=1, Collate=True, ActivePrinter=printer)
-            
-            time.sleep(3)
-            workbook.Close(False)
-            excel.Quit()
-            
-            print(f"   Print job sent (Excel)")
-            return True
-            
-        elif file_ext in ['.ppt', '.pptx']:
-            powerpoint = client.Dispatch("PowerPoint.Application")
-            
-            presentation = powerpoint.Presentations.Open(file_path, WithWindow=False)
-            presentation.PrintOptions.ActivePrinter = printer
-            presentation.PrintOut(Copies=1, Collate=True)
-            
-            time.sleep(3)
-            presentation.Close()
-            powerpoint.Quit()
-            
-            print(f"   Print job sent (PowerPoint)")
-            return True
-        
-        else:
-            print(f"   Unsupported Office file: {file_ext}")
-            return False
-            
-    except Exception as e:
-        print(f"   Office error: {e}")
-        print(f"   Make sure Microsoft Office is installed")
-        return False
+def finish_order(summary):
+    """Archive a finished order's JSON and report the result"""
+    order = summary["order"]
+    source = Path(summary["source_path"])
+    
+    if source.exists():
+        order_dest = PRINTED_DIR / source.name
+        if order_dest.exists():
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            order_dest = PRINTED_DIR / f"ORD_{timestamp}.json"
+        shutil.move(str(source), order_dest)
+        print(f"\nOrder JSON moved: {order_dest.name}")
+    
+    total = summary["printed"] + summary["failed"]
+    print("\n" + "=" * 60)
+    print(f"Order {order['order_id']} complete! {summary['printed']} of {total} file(s) printed")
+    print("=" * 60)
+    
+    if summary["state"] == "printed":
+        report_status(order, "printed")
+    else:
+        report_status(order, "failed", detail=f"{summary['printed']} of {total} file(s) printed")
 
-def print_file(file_path, printer_name, options):
-    """Send file to printer"""
-    try:
-        copies = options.get("copies", 1)
-        color = options.get("color", False)
-        sides = options.get("sides", "single")
-        
-        color_text = "Color" if color else "B&W"
-        print(f"   Options: {copies} copies | {sides} | {color_text}")
-        
-        is_ready, status_msg = check_printer_status(printer_name)
-        if not is_ready:
-            print(f"   Printer not ready: {status_msg}")
-            return False
-        
-        print(f"   Printer status: {status_msg}")
-        clear_print_queue(printer_name)
-        
-        file_ext = Path(file_path).suffix.lower()
-        success = False
-        
-        if file_ext in ['.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.tif']:
-            print(f"   Image file detected")
-            success = print_file_method2(file_path, printer_name)
-            
-        elif file_ext == '.pdf':
-            print(f"   PDF file detected")
-            success = print_pdf_direct(file_path, printer_name)
-            
-        elif file_ext in ['.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx']:
-            print(f"   Office file detected")
-            success = print_office_file(file_path, printer_name)
-            
-        elif file_ext in ['.txt', '.log', '.csv']:
-            print(f"   Text file detected")
-            success = print_text_file(file_path, printer_name)
-            
-        else:
-            print(f"   Unsupported file type: {file_ext}")
-            return False
-        
-        if success:
-            print(f"   ✓ Success!")
-            time.sleep(2)
-            return True
-        else:
-            print(f"   ✗ Failed to print")
-            return False
-        
-    except Exception as e:
-        print(f"   Print error: {e}")
-        return False
+def on_printer_event(event, state):
+    """Printer monitor listener: keep the pool's view of readiness current"""
+    if event != "status":
+        return
+    printer = printer_pool.get(state.name)
+    printer_pool.set_ready(printer, state.ready)
+    if state.ready:
+        print(f"[{state.name}] {state.message}")
+        print_queue.notify()
+    else:
+        print(f"[{state.name}] not ready ({state.message}) - jobs go to other printers")
 
-def process_order(order_file_path):
-    """Process a single order"""
-    try:
-        with open(order_file_path, "r", encoding="utf-8") as f:
-            order = json.load(f)
-        
-        print(f"\nProcessing order {order['order_id']} for user {order['user_id']}")
-        print("=" * 60)
-        
-        is_ready, status_msg = check_printer_status(PRINTER_NAME)
-        print(f"Printer status: {status_msg}")
-        
-        if not is_ready:
-            print(f"Cannot process - printer not ready")
-            return
-        
-        clear_print_queue(PRINTER_NAME)
-        
-        success_count = 0
-        for file_info in order["files"]:
-            filename = Path(file_info["local_path"]).name
-            file_path = UPLOADS_DIR / filename
-            
-            if not file_path.exists():
-                print(f"\nFile not found: {file_path}")
+def print_worker(printer):
+    """Feed one printer from the shared queue, oldest order first"""
+    accept = lambda job: printer_pool.accept(printer, job)
+    while True:
+        try:
+            due = print_queue.next_due_in()
+            if due is None or due > 0:
+                print_queue.wait(60 if due is None else due)
                 continue
             
-            print(f"\nFile: {file_path.name}")
-            options = file_info.get("print_options", {})
+            # The monitor wakes us as soon as the printer comes back
+            if not printer_monitor.wait_ready(printer.name, 60).ready:
+                continue
             
-            if print_file(file_path, PRINTER_NAME, options):
-                success_count += 1
-                print(f"   File printed!")
-        
-        order_dest = PRINTED_DIR / Path(order_file_path).name
-        if order_dest.exists():
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            order_dest = PRINTED_DIR / f"ORD_{timestamp}.json"
-        
-        shutil.move(order_file_path, order_dest)
-        print(f"\nOrder JSON moved: {order_dest.name}")
-        
-        print("\n" + "=" * 60)
-        print(f"Order complete! {success_count} file(s) sent to printer")
-        print(f"Files remain in: {UPLOADS_DIR}")
-        print(f"Order moved to: {PRINTED_DIR}")
-        
-    except Exception as e:
-        print(f"Error processing order: {e}")
+            job = print_queue.claim(printer.name, accept, printer_pool.split_min_pages)
+            if job is None:
+                # Everything due is in progress elsewhere or better suited to another printer
+                print_queue.wait(PRINTER_RETRY_SECONDS)
+                continue
+            jobs = [job]
+            if ASSEMBLE_ORDERS:
+                jobs += print_queue.claim_rest(job, printer.name, accept,
+                                               printer_pool.split_min_pages)
+            use_artifacts(jobs)
+            printer_pool.start(printer, jobs)
+            printed = []
+            try:
+                printed = print_batch(jobs, printer)
+            finally:
+                printer_pool.finish(printer, printed)
+                print_queue.notify()
+        except Exception as e:
+            print(f"[{printer.name}] print worker error: {e}")
+            time.sleep(PRINTER_RETRY_SECONDS)
+
+def resume_queue():
+    """Pick up where the last run stopped"""
+    first_run = print_queue.is_empty()
+    recovered = print_queue.recover()
+    if recovered:
+        print(f"Resuming {recovered} file(s) that were spooling when the service stopped")
+    
+    if first_run:
+        # No journal yet: keep the old behaviour of setting stale orders aside
+        process_existing_orders()
+        return
+    
+    # Orders that arrived while the service was down
+    queued = sum(enqueue_order_file(p) for p in sorted(ORDERS_DIR.glob("*.json")))
+    print(f"Queue: {print_queue.stats()} ({queued} new order(s) found on disk)")
 
 def process_existing_orders():
     """Move existing orders"""
@@ -525,7 +337,9 @@ def main():
     print(f"Watching: {ORDERS_DIR}")
     print(f"Uploads:  {UPLOADS_DIR}")
     print(f"Orders:   {PRINTED_DIR}")
-    print(f"Printer:  {PRINTER_NAME}")
+    for p in printer_pool.printers:
+        print(f"Printer:  {p.name} ({'color' if p.color else 'B&W'}"
+              f"{', duplex' if p.duplex else ''}, {p.ppm} ppm)")
     print("=" * 60)
     print("\nSupported file types:")
     print("   Images: JPG, PNG, BMP, GIF, TIFF")
@@ -534,24 +348,29 @@ def main():
     print("   Text: TXT, LOG, CSV")
     print("=" * 60)
     
-    # Check for PDF printing tools
-    sumatra = find_sumatra_pdf()
-    if sumatra:
-        print(f"\n✓ SumatraPDF found: {sumatra}")
-    else:
-        print(f"\n⚠ SumatraPDF not found - install from:")
-        print(f"  https://www.sumatrapdfreader.org/download-free-pdf-viewer")
+    # Find printing tools and printers once; every print reuses them
+    print(f"\nBackend: {backend.kind}")
+    for tool, path in backend.discover().items():
+        if path:
+            print(f"✓ {tool} found: {path}")
+        else:
+            print(f"⚠ {tool} not found")
+    if backend.kind == "windows" and not backend.tools.get("sumatra"):
+        print(f"  Install SumatraPDF from https://www.sumatrapdfreader.org/download-free-pdf-viewer")
     
     print("=" * 60)
     
-    printer = get_printer_handle(PRINTER_NAME)
-    if not printer:
-        print("\nWARNING: Printer not found!\n")
-    else:
-        is_ready, status_msg = check_printer_status(PRINTER_NAME)
-        print(f"\nPrinter status: {status_msg}\n")
+    for p in printer_pool.printers:
+        if not backend.resolve(p.name):
+            print(f"\nWARNING: Printer '{p.name}' not found!\n")
+    
+    printer_monitor.subscribe(on_printer_event)
+    printer_monitor.start()
     
-    process_existing_orders()
+    resume_queue()
+    for p in printer_pool.printers:
+        threading.Thread(target=print_worker, args=(p,), name=f"print-{p.name}",
+                         daemon=True).start()
     
     event_handler = OrderHandler()
     observer = Observer()
@@ -569,6 +388,8 @@ def main():
         observer.stop()
     
     observer.join()
+    printer_monitor.stop()
+    backend.close()
     print("Service stopped")
 
 if __name__ == "__main__":
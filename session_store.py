@@ -0,0 +1,784 @@
+"""Session registry for the WhatsApp print bot"""
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from pricing import ENGINE, sheets_for
+
+
+class VersionConflict(Exception):
+    """The session changed since the client last read it"""
+
+    def __init__(self, version):
+        super().__init__(f"Order was changed elsewhere (now at version {version})")
+        self.version = version
+
+
+def _next_file_id(file_ids):
+    """FILE_<n> one past the highest number in use"""
+    highest = 0
+    for file_id in file_ids:
+        if file_id and file_id.startswith("FILE_") and file_id[5:].isdigit():
+            highest = max(highest, int(file_id[5:]))
+    return f"FILE_{highest + 1}"
+
+
+class FileRecord:
+    """One uploaded file inside a session (compact, slot-based)"""
+    __slots__ = (
+        "file_id", "filename", "file_type", "local_path", "file_url", "sha256",
+        "color", "sides", "copies", "page_count",
+        "sheets_required", "total_sheets", "price", "processing_status",
+    )
+
+    def __init__(self, filename, file_type, local_path, page_count=1,
+                 file_url=None, file_id=None, color=False, sides="double",
+                 copies=1, sheets_required=None, total_sheets=None,
+                 price=None, processing_status="pending", sha256=None):
+        self.file_id = file_id
+        self.filename = filename
+        self.file_type = file_type
+        self.local_path = local_path
+        self.file_url = file_url
+        self.sha256 = sha256
+        self.color = color
+        self.sides = sides
+        self.copies = copies
+        self.page_count = page_count
+        self.sheets_required = sheets_required
+        self.total_sheets = total_sheets
+        self.price = price
+        self.processing_status = processing_status
+
+    @property
+    def print_options(self):
+        return {"color": self.color, "sides": self.sides, "copies": self.copies}
+
+    def set_print_options(self, opts):
+        """Apply a (partial) print_options dict from the order page"""
+        if "color" in opts:
+            self.color = bool(opts["color"])
+        if "sides" in opts:
+            if opts["sides"] not in ("single", "double"):
+                raise ValueError(f"Invalid sides: {opts['sides']}")
+            self.sides = opts["sides"]
+        if "copies" in opts:
+            self.copies = max(1, int(opts["copies"] or 1))
+
+    def to_dict(self, rate=None):
+        """Order JSON representation (price = total_sheets * rate when a rate is given)"""
+        price = self.price
+        if rate is not None and self.total_sheets is not None:
+            price = round(self.total_sheets * rate, 2)
+        return {
+            "file_id": self.file_id,
+            "file_url": self.file_url,
+            "filename": self.filename,
+            "file_type": self.file_type,
+            "local_path": self.local_path,
+            "sha256": self.sha256,
+            "print_options": self.print_options,
+            "page_count": self.page_count,
+            "sheets_required": self.sheets_required,
+            "total_sheets": self.total_sheets,
+            "price": price,
+            "processing_status": self.processing_status,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from order JSON (as posted by the order page)"""
+        opts = data.get("print_options") or {}
+        return cls(
+            filename=data.get("filename", ""),
+            file_type=data.get("file_type", ""),
+            local_path=data.get("local_path", ""),
+            page_count=int(data.get("page_count") or 1),
+            file_url=data.get("file_url"),
+            sha256=data.get("sha256"),
+            file_id=data.get("file_id"),
+            color=bool(opts.get("color", False)),
+            sides=opts.get("sides", "double"),
+            copies=max(1, int(opts.get("copies") or 1)),
+            sheets_required=data.get("sheets_required"),
+            total_sheets=data.get("total_sheets"),
+            price=data.get("price"),
+            processing_status=data.get("processing_status", "pending"),
+        )
+
+
+class Session:
+    """A customer's cart, keyed by phone number and session_id"""
+    __slots__ = (
+        "phone", "session_id", "order_id", "timestamp", "last_seen",
+        "order_placed", "order_placed_at", "files", "version",
+        "total_price", "total_pages", "total_sheets", "color_sheets",
+        "payment_status", "order_status",
+    )
+
+    def __init__(self, phone, session_id=None, order_id=None, timestamp=None):
+        self.phone = phone
+        self.session_id = session_id or uuid.uuid4().hex[:12].upper()
+        self.order_id = order_id or f"ORD_{uuid.uuid4().hex[:8].upper()}"
+        self.timestamp = timestamp or datetime.utcnow().isoformat()
+        self.last_seen = time.time()
+        self.order_placed = False
+        self.order_placed_at = None
+        self.files = []
+        self.version = 1         # bumped on every change to the order
+        # Running totals, kept up to date on every file change
+        self.total_price = 0.0
+        self.total_pages = 0
+        self.total_sheets = 0
+        self.color_sheets = 0
+        self.payment_status = "pending"
+        self.order_status = "pending"
+
+    def count_file(self, record, sign=1):
+        """Add (sign=1) or take out (sign=-1) one file in the running totals"""
+        if sign > 0:
+            record.sheets_required, record.total_sheets = sheets_for(
+                record.page_count, record.sides, record.copies)
+        self.total_pages += sign * record.page_count
+        self.total_sheets += sign * record.total_sheets
+        if record.color:
+            self.color_sheets += sign * record.total_sheets
+        self.total_price = ENGINE.order_price(self.total_sheets - self.color_sheets, self.color_sheets)
+
+    def retotal(self):
+        """Recompute the running totals from the file list"""
+        self.total_pages = self.total_sheets = self.color_sheets = 0
+        self.total_price = 0.0
+        for record in self.files:
+            self.count_file(record)
+
+    def order_data(self):
+        """Order JSON representation (same shape as orders/*.json)"""
+        rates = ENGINE.rates(self.total_sheets - self.color_sheets, self.color_sheets)
+        data = {
+            "order_id": self.order_id,
+            "session_id": self.session_id,
+            "user_id": self.phone,
+            "timestamp": self.timestamp,
+            "files": [f.to_dict(rates[bool(f.color)]) for f in self.files],
+            "total_price": self.total_price,
+            "total_pages": self.total_pages,
+            "total_sheets": self.total_sheets,
+            "payment_status": self.payment_status,
+            "order_status": self.order_status,
+        }
+        if self.order_placed_at:
+            data["order_placed_at"] = self.order_placed_at
+        return data
+
+
+def _sizeof_slots(obj):
+    size = sys.getsizeof(obj)
+    for name in obj.__slots__:
+        value = getattr(obj, name, None)
+        if isinstance(value, str):
+            size += sys.getsizeof(value)
+    return size
+
+
+class SessionRegistry:
+    """In-memory session store indexed by phone and session_id.
+
+    Idle sessions expire after ``ttl`` seconds, placed orders after
+    ``completed_ttl`` seconds, and the least recently used sessions are
+    dropped once ``max_sessions`` is exceeded.
+    """
+
+    def __init__(self, ttl=24 * 3600, completed_ttl=3600, max_sessions=10000):
+        self.ttl = ttl
+        self.completed_ttl = completed_ttl
+        self.max_sessions = max_sessions
+        self._by_phone = OrderedDict()   # phone -> Session, least recently used first
+        self._by_id = {}                 # session_id -> Session
+        self._completed = OrderedDict()  # phone -> time the order was placed
+        self._lock = threading.RLock()
+        self.evictions = {"idle": 0, "completed": 0, "capacity": 0}
+
+    def __len__(self):
+        return len(self._by_phone)
+
+    def _touch(self, session, now):
+        session.last_seen = now
+        self._by_phone.move_to_end(session.phone)
+
+    def _expired(self, session, now):
+        if now - session.last_seen > self.ttl:
+            return True
+        placed_at = self._completed.get(session.phone)
+        return placed_at is not None and now - placed_at > self.completed_ttl
+
+    def _drop(self, phone):
+        session = self._by_phone.pop(phone, None)
+        if session is not None:
+            self._by_id.pop(session.session_id, None)
+        self._completed.pop(phone, None)
+        return session
+
+    def _evict(self, now):
+        while self._by_phone:
+            phone, session = next(iter(self._by_phone.items()))
+            if now - session.last_seen <= self.ttl:
+                break
+            self._drop(phone)
+            self.evictions["idle"] += 1
+        while self._completed:
+            phone, placed_at = next(iter(self._completed.items()))
+            if now - placed_at <= self.completed_ttl:
+                break
+            self._drop(phone)
+            self.evictions["completed"] += 1
+        while len(self._by_phone) > self.max_sessions:
+            phone = next(iter(self._by_phone))
+            self._drop(phone)
+            self.evictions["capacity"] += 1
+
+    def get(self, phone):
+        """Find a live session by phone number"""
+        with self._lock:
+            session = self._by_phone.get(phone)
+            if session is None:
+                return None
+            now = time.time()
+            if self._expired(session, now):
+                self._evict(now)
+                return self._by_phone.get(phone)
+            self._touch(session, now)
+            return session
+
+    def get_by_id(self, session_id):
+        """Find a live session by session_id"""
+        with self._lock:
+            session = self._by_id.get(session_id)
+            if session is None:
+                return None
+            return self.get(session.phone)
+
+    def create(self, phone):
+        """Start a fresh session for phone, replacing any existing one"""
+        with self._lock:
+            self._drop(phone)
+            session = Session(phone)
+            self._by_phone[phone] = session
+            self._by_id[session.session_id] = session
+            self._evict(time.time())
+            return session
+
+    def get_or_create(self, phone):
+        with self._lock:
+            return self.get(phone) or self.create(phone)
+
+    def version_of(self, session_id):
+        """Current version of a live session, or None"""
+        session = self.get_by_id(session_id)
+        return session.version if session else None
+
+    def _check(self, session, expected_version):
+        if expected_version is not None and expected_version != session.version:
+            raise VersionConflict(session.version)
+
+    def add_file(self, session, record):
+        """Append a file to the session and assign its file_id"""
+        with self._lock:
+            record.file_id = _next_file_id(f.file_id for f in session.files)
+            session.files.append(record)
+            session.count_file(record)
+            session.version += 1
+            return record
+
+    def set_files(self, session, records, expected_version=None):
+        """Replace the session's file list"""
+        with self._lock:
+            self._check(session, expected_version)
+            session.files = list(records)
+            session.retotal()
+            session.version += 1
+
+    def patch_file(self, session, file_id, options, expected_version=None):
+        """Change one file's print options; returns the record, or None if missing"""
+        with self._lock:
+            self._check(session, expected_version)
+            record = next((f for f in session.files if f.file_id == file_id), None)
+            if record is None:
+                return None
+            session.count_file(record, -1)
+            try:
+                record.set_print_options(options)
+            finally:
+                session.count_file(record)
+            session.version += 1
+            return record
+
+    def remove_file(self, session, file_id, expected_version=None):
+        """Drop one file; False if it was not there"""
+        with self._lock:
+            self._check(session, expected_version)
+            record = next((f for f in session.files if f.file_id == file_id), None)
+            if record is None:
+                return False
+            session.files.remove(record)
+            session.count_file(record, -1)
+            session.version += 1
+            return True
+
+    def update_file(self, session, record):
+        """Persist changes to one file record (only bumps the version in memory)"""
+        with self._lock:
+            session.version += 1
+
+    def save(self, session):
+        """Persist session-level fields (only bumps the version in memory)"""
+        with self._lock:
+            session.version += 1
+
+    def mark_placed(self, session):
+        """Mark the order placed; False if it already was"""
+        with self._lock:
+            if session.order_placed:
+                return False
+            session.order_placed = True
+            self._completed[session.phone] = time.time()
+            return True
+
+    def evict_expired(self):
+        with self._lock:
+            self._evict(time.time())
+
+    def stats(self):
+        """Session counts, eviction counters and approximate memory use"""
+        with self._lock:
+            approx_bytes = 0
+            files = 0
+            for session in self._by_phone.values():
+                approx_bytes += _sizeof_slots(session) + sys.getsizeof(session.files)
+                files += len(session.files)
+                for record in session.files:
+                    approx_bytes += _sizeof_slots(record)
+            return {
+                "backend": "memory",
+                "sessions": len(self._by_phone),
+                "completed": len(self._completed),
+                "files": files,
+                "approx_bytes": approx_bytes,
+                "evictions": dict(self.evictions),
+                "ttl": self.ttl,
+                "completed_ttl": self.completed_ttl,
+                "max_sessions": self.max_sessions,
+            }
+
+
+_FILE_COLUMNS = (
+    "file_id", "filename", "file_type", "local_path", "file_url", "sha256",
+    "color", "sides", "copies", "page_count",
+    "sheets_required", "total_sheets", "price", "processing_status",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    phone           TEXT PRIMARY KEY,
+    session_id      TEXT NOT NULL UNIQUE,
+    order_id        TEXT NOT NULL,
+    timestamp       TEXT NOT NULL,
+    last_seen       REAL NOT NULL,
+    order_placed    INTEGER NOT NULL DEFAULT 0,
+    placed_time     REAL,
+    order_placed_at TEXT,
+    total_price     REAL NOT NULL DEFAULT 0,
+    total_pages     INTEGER NOT NULL DEFAULT 0,
+    total_sheets    INTEGER NOT NULL DEFAULT 0,
+    color_sheets    INTEGER NOT NULL DEFAULT 0,
+    payment_status  TEXT NOT NULL DEFAULT 'pending',
+    order_status    TEXT NOT NULL DEFAULT 'pending',
+    version         INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_last_seen ON sessions(last_seen);
+CREATE INDEX IF NOT EXISTS idx_sessions_placed_time ON sessions(placed_time);
+CREATE TABLE IF NOT EXISTS session_files (
+    session_id        TEXT NOT NULL REFERENCES sessions(session_id) ON DELETE CASCADE,
+    seq               INTEGER NOT NULL,
+    file_id           TEXT,
+    filename          TEXT NOT NULL,
+    file_type         TEXT,
+    local_path        TEXT,
+    file_url          TEXT,
+    sha256            TEXT,
+    color             INTEGER NOT NULL DEFAULT 0,
+    sides             TEXT NOT NULL DEFAULT 'double',
+    copies            INTEGER NOT NULL DEFAULT 1,
+    page_count        INTEGER NOT NULL DEFAULT 1,
+    sheets_required   INTEGER,
+    total_sheets      INTEGER,
+    price             REAL,
+    processing_status TEXT,
+    PRIMARY KEY (session_id, seq)
+);
+CREATE TABLE IF NOT EXISTS session_counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class SQLiteSessionStore:
+    """Session store shared by all gunicorn workers via a SQLite file in WAL mode.
+
+    Exposes the same interface as SessionRegistry. Sessions returned are
+    snapshots: changes are written back one row at a time through
+    add_file / update_file / save / mark_placed.
+    """
+
+    TOUCH_INTERVAL = 60      # seconds between last_seen writes for a session
+    EVICT_INTERVAL = 30      # seconds between eviction sweeps per process
+
+    def __init__(self, path="sessions.db", ttl=24 * 3600, completed_ttl=3600, max_sessions=10000):
+        self.path = str(path)
+        self.ttl = ttl
+        self.completed_ttl = completed_ttl
+        self.max_sessions = max_sessions
+        self._local = threading.local()
+        self._last_evict = 0.0
+        conn = self._conn().conn
+        conn.executescript(_SCHEMA)
+        self._migrate(conn)
+
+    def _conn(self, write=True):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return _Transaction(conn, "BEGIN IMMEDIATE" if write else "BEGIN")
+
+    def _migrate(self, conn):
+        """Add columns introduced after the database was created"""
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(session_files)")}
+        for name in _FILE_COLUMNS:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE session_files ADD COLUMN {name}")
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(sessions)")}
+        if "version" not in existing:
+            conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        if "color_sheets" not in existing:
+            conn.execute("ALTER TABLE sessions ADD COLUMN color_sheets INTEGER")
+            self._backfill_totals(conn)
+
+    def _backfill_totals(self, conn):
+        """Fill in running totals for sessions stored before they existed"""
+        for row in conn.execute("SELECT * FROM sessions").fetchall():
+            session = self._load(conn, row)
+            session.retotal()
+            self._store_totals(conn, session, session.total_pages, session.total_sheets,
+                               session.color_sheets)
+
+    def __len__(self):
+        with self._conn(write=False) as conn:
+            return conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def _load(self, conn, row):
+        session = Session(row["phone"], row["session_id"], row["order_id"], row["timestamp"])
+        session.last_seen = row["last_seen"]
+        session.order_placed = bool(row["order_placed"])
+        session.order_placed_at = row["order_placed_at"]
+        session.total_price = row["total_price"]
+        session.total_pages = row["total_pages"]
+        session.total_sheets = row["total_sheets"]
+        session.payment_status = row["payment_status"]
+        session.order_status = row["order_status"]
+        session.version = row["version"]
+        session.color_sheets = row["color_sheets"]
+        for f in conn.execute(
+                "SELECT * FROM session_files WHERE session_id = ? ORDER BY seq",
+                (session.session_id,)):
+            session.files.append(self._record(f))
+        return session
+
+    def _record(self, row):
+        values = {name: row[name] for name in _FILE_COLUMNS}
+        values["color"] = bool(values["color"])
+        return FileRecord(**values)
+
+    def _fetch(self, where, key):
+        now = time.time()
+        with self._conn(write=False) as conn:
+            row = conn.execute(
+                f"SELECT * FROM sessions WHERE {where} = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            placed_time = row["placed_time"]
+            expired = now - row["last_seen"] > self.ttl or (
+                placed_time is not None and now - placed_time > self.completed_ttl)
+            session = None if expired else self._load(conn, row)
+        if expired:
+            self.evict_expired()
+        elif now - session.last_seen > self.TOUCH_INTERVAL:
+            with self._conn() as conn:
+                conn.execute("UPDATE sessions SET last_seen = ? WHERE phone = ?",
+                             (now, session.phone))
+            session.last_seen = now
+        return session
+
+    def get(self, phone):
+        """Find a live session by phone number"""
+        return self._fetch("phone", phone)
+
+    def get_by_id(self, session_id):
+        """Find a live session by session_id"""
+        return self._fetch("session_id", session_id)
+
+    def create(self, phone):
+        """Start a fresh session for phone, replacing any existing one"""
+        session = Session(phone)
+        with self._conn() as conn:
+            conn.execute("DELETE FROM sessions WHERE phone = ?", (phone,))
+            conn.execute(
+                "INSERT INTO sessions (phone, session_id, order_id, timestamp, last_seen,"
+                " total_price, total_pages, total_sheets, color_sheets)"
+                " VALUES (?, ?, ?, ?, ?, 0, 0, 0, 0)",
+                (phone, session.session_id, session.order_id, session.timestamp,
+                 session.last_seen))
+            if session.last_seen - self._last_evict > self.EVICT_INTERVAL:
+                self._evict(conn, session.last_seen)
+        return session
+
+    def get_or_create(self, phone):
+        return self.get(phone) or self.create(phone)
+
+    def version_of(self, session_id):
+        """Current version of a live session, or None (reads one row, no files)"""
+        now = time.time()
+        with self._conn(write=False) as conn:
+            row = conn.execute(
+                "SELECT version FROM sessions WHERE session_id = ? AND last_seen >= ?"
+                " AND (placed_time IS NULL OR placed_time >= ?)",
+                (session_id, now - self.ttl, now - self.completed_ttl)).fetchone()
+        return row["version"] if row else None
+
+    def _bump(self, conn, session, expected_version=None):
+        """Increment the session version, enforcing expected_version if given"""
+        if expected_version is None:
+            conn.execute("UPDATE sessions SET version = version + 1 WHERE session_id = ?",
+                         (session.session_id,))
+        else:
+            cur = conn.execute(
+                "UPDATE sessions SET version = version + 1 WHERE session_id = ? AND version = ?",
+                (session.session_id, expected_version))
+            if cur.rowcount != 1:
+                row = conn.execute("SELECT version FROM sessions WHERE session_id = ?",
+                                   (session.session_id,)).fetchone()
+                raise VersionConflict(row["version"] if row else None)
+        row = conn.execute("SELECT version FROM sessions WHERE session_id = ?",
+                           (session.session_id,)).fetchone()
+        if row is not None:
+            session.version = row["version"]
+
+    def _add_totals(self, conn, session, record, sign=1):
+        """Apply one file's pages and sheets to the stored totals (atomic across workers)"""
+        if sign > 0 or record.total_sheets is None:
+            record.sheets_required, record.total_sheets = sheets_for(
+                record.page_count, record.sides, record.copies)
+        sheets = sign * record.total_sheets
+        conn.execute(
+            "UPDATE sessions SET total_pages = total_pages + ?, total_sheets = total_sheets + ?,"
+            " color_sheets = color_sheets + ? WHERE session_id = ?",
+            (sign * record.page_count, sheets, sheets if record.color else 0, session.session_id))
+        row = conn.execute(
+            "SELECT total_pages, total_sheets, color_sheets FROM sessions WHERE session_id = ?",
+            (session.session_id,)).fetchone()
+        if row is not None:
+            self._store_totals(conn, session, *row)
+
+    def _store_totals(self, conn, session, pages, sheets, color_sheets):
+        session.total_pages, session.total_sheets, session.color_sheets = pages, sheets, color_sheets
+        session.total_price = ENGINE.order_price(sheets - color_sheets, color_sheets)
+        conn.execute(
+            "UPDATE sessions SET total_pages = ?, total_sheets = ?, color_sheets = ?,"
+            " total_price = ? WHERE session_id = ?",
+            (pages, sheets, color_sheets, session.total_price, session.session_id))
+
+    def _file_row(self, record):
+        row = [getattr(record, name) for name in _FILE_COLUMNS]
+        row[_FILE_COLUMNS.index("color")] = int(bool(record.color))
+        return row
+
+    def add_file(self, session, record):
+        """Insert one file row and assign its file_id"""
+        with self._conn() as conn:
+            rows = conn.execute(
+                "SELECT seq, file_id FROM session_files WHERE session_id = ?",
+                (session.session_id,)).fetchall()
+            record.file_id = _next_file_id(row["file_id"] for row in rows)
+            last = max((row["seq"] for row in rows), default=0)
+            self._add_totals(conn, session, record)
+            conn.execute(
+                f"INSERT INTO session_files (session_id, seq, {', '.join(_FILE_COLUMNS)})"
+                f" VALUES (?, ?, {', '.join('?' * len(_FILE_COLUMNS))})",
+                [session.session_id, last + 1] + self._file_row(record))
+            self._bump(conn, session)
+        session.files.append(record)
+        return record
+
+    def set_files(self, session, records, expected_version=None):
+        """Replace the session's file list"""
+        records = list(records)
+        with self._conn() as conn:
+            self._bump(conn, session, expected_version)
+            conn.execute("DELETE FROM session_files WHERE session_id = ?", (session.session_id,))
+            conn.executemany(
+                f"INSERT INTO session_files (session_id, seq, {', '.join(_FILE_COLUMNS)})"
+                f" VALUES (?, ?, {', '.join('?' * len(_FILE_COLUMNS))})",
+                [[session.session_id, seq] + self._file_row(r)
+                 for seq, r in enumerate(records, 1)])
+            session.files = records
+            session.retotal()
+            self._store_totals(conn, session, session.total_pages, session.total_sheets,
+                               session.color_sheets)
+
+    def patch_file(self, session, file_id, options, expected_version=None):
+        """Change one file's print options; returns the record, or None if missing"""
+        with self._conn() as conn:
+            row = conn.execute("SELECT * FROM session_files WHERE session_id = ? AND file_id = ?",
+                               (session.session_id, file_id)).fetchone()
+            if row is None:
+                return None
+            record = self._record(row)
+            self._add_totals(conn, session, record, -1)
+            record.set_print_options(options)
+            self._add_totals(conn, session, record)
+            conn.execute(
+                "UPDATE session_files SET color = ?, sides = ?, copies = ?,"
+                " sheets_required = ?, total_sheets = ? WHERE session_id = ? AND file_id = ?",
+                (int(record.color), record.sides, record.copies, record.sheets_required,
+                 record.total_sheets, session.session_id, file_id))
+            self._bump(conn, session, expected_version)
+        session.files = [record if f.file_id == file_id else f for f in session.files]
+        return record
+
+    def remove_file(self, session, file_id, expected_version=None):
+        """Drop one file; False if it was not there"""
+        with self._conn() as conn:
+            row = conn.execute("SELECT * FROM session_files WHERE session_id = ? AND file_id = ?",
+                               (session.session_id, file_id)).fetchone()
+            if row is None:
+                return False
+            conn.execute("DELETE FROM session_files WHERE session_id = ? AND file_id = ?",
+                         (session.session_id, file_id))
+            self._add_totals(conn, session, self._record(row), -1)
+            self._bump(conn, session, expected_version)
+        session.files = [f for f in session.files if f.file_id != file_id]
+        return True
+
+    def update_file(self, session, record):
+        """Write one file row back"""
+        assignments = ", ".join(f"{name} = ?" for name in _FILE_COLUMNS)
+        with self._conn() as conn:
+            conn.execute(
+                f"UPDATE session_files SET {assignments} WHERE session_id = ? AND file_id = ?",
+                self._file_row(record) + [session.session_id, record.file_id])
+            self._bump(conn, session)
+
+    def save(self, session):
+        """Write session-level fields back"""
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE sessions SET order_placed_at = ?, total_price = ?, total_pages = ?,"
+                " total_sheets = ?, payment_status = ?, order_status = ? WHERE session_id = ?",
+                (session.order_placed_at, session.total_price, session.total_pages,
+                 session.total_sheets, session.payment_status, session.order_status,
+                 session.session_id))
+            self._bump(conn, session)
+
+    def mark_placed(self, session):
+        """Mark the order placed; False if it already was (atomic across workers)"""
+        with self._conn() as conn:
+            cur = conn.execute(
+                "UPDATE sessions SET order_placed = 1, placed_time = ?"
+                " WHERE session_id = ? AND order_placed = 0",
+                (time.time(), session.session_id))
+        if cur.rowcount != 1:
+            return False
+        session.order_placed = True
+        return True
+
+    def _count(self, conn, name, n):
+        if n > 0:
+            conn.execute(
+                "INSERT INTO session_counters (name, value) VALUES (?, ?)"
+                " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, n))
+
+    def _evict(self, conn, now):
+        self._last_evict = now
+        cur = conn.execute("DELETE FROM sessions WHERE last_seen < ?", (now - self.ttl,))
+        self._count(conn, "idle", cur.rowcount)
+        cur = conn.execute("DELETE FROM sessions WHERE placed_time < ?",
+                           (now - self.completed_ttl,))
+        self._count(conn, "completed", cur.rowcount)
+        cur = conn.execute(
+            "DELETE FROM sessions WHERE phone IN (SELECT phone FROM sessions"
+            " ORDER BY last_seen LIMIT MAX(0, (SELECT COUNT(*) FROM sessions) - ?))",
+            (self.max_sessions,))
+        self._count(conn, "capacity", cur.rowcount)
+
+    def evict_expired(self):
+        with self._conn() as conn:
+            self._evict(conn, time.time())
+
+    def stats(self):
+        """Session counts, eviction counters and database size"""
+        with self._conn(write=False) as conn:
+            sessions, completed = conn.execute(
+                "SELECT COUNT(*), COUNT(placed_time) FROM sessions").fetchone()
+            files = conn.execute("SELECT COUNT(*) FROM session_files").fetchone()[0]
+            evictions = {"idle": 0, "completed": 0, "capacity": 0}
+            for row in conn.execute("SELECT name, value FROM session_counters"):
+                evictions[row["name"]] = row["value"]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "sessions": sessions,
+            "completed": completed,
+            "files": files,
+            "approx_bytes": page_count * page_size,
+            "evictions": evictions,
+            "ttl": self.ttl,
+            "completed_ttl": self.completed_ttl,
+            "max_sessions": self.max_sessions,
+        }
+
+
+class _Transaction:
+    """`with` block that runs statements in one transaction"""
+
+    def __init__(self, conn, begin):
+        self.conn = conn
+        self.begin = begin
+
+    def __enter__(self):
+        self.conn.execute(self.begin)
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def make_session_store(backend="memory", path="sessions.db", **limits):
+    """Build the configured session backend ("memory" or "sqlite")"""
+    if backend == "sqlite":
+        return SQLiteSessionStore(path, **limits)
+    if backend != "memory":
+        raise ValueError(f"Unknown session backend: {backend}")
+    return SessionRegistry(**limits)
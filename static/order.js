@@ -0,0 +1,487 @@
+let files = [];
+let version = null;  // session version the local copy of files reflects
+let totals = { total_pages: 0, total_sheets: 0, total_price: 0 };  // priced by the server
+
+// Load existing files (the server answers 304 when nothing changed)
+async function loadFiles() {
+    try {
+        const response = await fetch(`/api/order/${SESSION_ID}`);
+        const data = await response.json();
+
+        files = data.files || [];
+        version = data.version ?? null;
+        setTotals(data);
+        renderFiles();
+    } catch (error) {
+        console.error('Error loading files:', error);
+    }
+}
+
+function setTotals(data) {
+    totals = {
+        total_pages: data.total_pages || 0,
+        total_sheets: data.total_sheets || 0,
+        total_price: data.total_price || 0
+    };
+}
+
+// Prices come from the server's pricing engine (bulk tiers apply per order)
+async function refreshQuote() {
+    try {
+        const response = await fetch(`/api/quote?session_id=${SESSION_ID}`);
+        const data = await response.json();
+        if (!data.success) {
+            return;
+        }
+        const byId = Object.fromEntries(data.files.map(q => [q.file_id, q]));
+        files.forEach(f => {
+            if (byId[f.file_id]) {
+                Object.assign(f, byId[f.file_id]);
+            }
+        });
+        setTotals(data);
+        renderFiles();
+    } catch (error) {
+        console.error('Quote error:', error);
+    }
+}
+
+// Send one change tagged with our version; on a 409 take the server's state and retry once
+async function sendChange(method, url, body = {}) {
+    for (let attempt = 0; attempt < 2; attempt++) {
+        const response = await fetch(url, {
+            method: method,
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ...body, version: version })
+        });
+        const data = await response.json();
+        if (response.status !== 409 || data.version == null) {
+            return data;
+        }
+        files = data.files;
+        version = data.version;
+    }
+    return { success: false, error: 'Order is being changed elsewhere, please try again' };
+}
+
+// Upload area interactions
+const uploadArea = document.getElementById('uploadArea');
+const fileInput = document.getElementById('fileInput');
+const loadingIndicator = document.getElementById('loadingIndicator');
+
+uploadArea.addEventListener('click', () => fileInput.click());
+
+uploadArea.addEventListener('dragover', (e) => {
+    e.preventDefault();
+    uploadArea.classList.add('dragover');
+});
+
+uploadArea.addEventListener('dragleave', () => {
+    uploadArea.classList.remove('dragover');
+});
+
+uploadArea.addEventListener('drop', (e) => {
+    e.preventDefault();
+    uploadArea.classList.remove('dragover');
+    handleFiles(e.dataTransfer.files);
+});
+
+fileInput.addEventListener('change', (e) => {
+    handleFiles(e.target.files);
+    fileInput.value = ''; // Reset input
+});
+
+// Large files go up in resumable chunks; small ones in one multipart POST
+const CHUNKED_THRESHOLD = 4 * 1024 * 1024;
+const MAX_CHUNK_RETRIES = 6;
+const uploadStatus = document.getElementById('uploadStatus');
+
+function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+}
+
+async function uploadChunked(file) {
+    // Remember the upload id so a retry or re-selection resumes where it stopped
+    const key = `upload:${SESSION_ID}:${file.name}:${file.size}:${file.lastModified}`;
+    let response = await fetch('/api/upload/init', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            session_id: SESSION_ID,
+            filename: file.name,
+            size: file.size,
+            upload_id: localStorage.getItem(key)
+        })
+    });
+    const upload = await response.json();
+    if (!upload.success) {
+        throw new Error(upload.error || 'Could not start upload');
+    }
+    localStorage.setItem(key, upload.upload_id);
+
+    let offset = upload.offset;
+    let failures = 0;
+    while (offset < file.size) {
+        uploadStatus.textContent = `Uploading ${file.name}... ${Math.floor(offset * 100 / file.size)}%`;
+        try {
+            response = await fetch(`/api/upload/${upload.upload_id}?offset=${offset}`, {
+                method: 'PUT',
+                body: file.slice(offset, offset + upload.chunk_size)
+            });
+            const data = await response.json();
+            if (!data.success && response.status !== 409) {
+                throw new Error(data.error || 'Chunk rejected');
+            }
+            offset = data.offset;
+            failures = 0;
+        } catch (error) {
+            if (++failures > MAX_CHUNK_RETRIES) {
+                throw error;
+            }
+            await sleep(Math.min(30000, 1000 * 2 ** failures));
+            // Ask the server how much it actually has before retrying
+            try {
+                const status = await (await fetch(`/api/upload/${upload.upload_id}`)).json();
+                if (status.success) {
+                    offset = status.offset;
+                }
+            } catch (e) {}
+        }
+    }
+
+    uploadStatus.textContent = `Processing ${file.name}...`;
+    response = await fetch(`/api/upload/${upload.upload_id}/finalize`, { method: 'POST' });
+    const done = await response.json();
+    if (!done.success) {
+        throw new Error(done.error || 'Could not finish upload');
+    }
+    localStorage.removeItem(key);
+    return done;
+}
+
+async function uploadMultipart(fileList) {
+    const formData = new FormData();
+
+    for (let file of fileList) {
+        formData.append('files', file);
+    }
+
+    formData.append('session_id', SESSION_ID);
+
+    const response = await fetch('/api/upload', {
+        method: 'POST',
+        body: formData
+    });
+
+    return response.json();
+}
+
+async function handleFiles(fileList) {
+    if (!fileList || fileList.length === 0) {
+        return;
+    }
+
+    const small = Array.from(fileList).filter(f => f.size < CHUNKED_THRESHOLD);
+    const large = Array.from(fileList).filter(f => f.size >= CHUNKED_THRESHOLD);
+    let uploaded = 0;
+    const failures = [];
+
+    // Show loading
+    uploadStatus.textContent = 'Uploading files...';
+    loadingIndicator.classList.remove('hidden');
+    uploadArea.style.opacity = '0.5';
+    uploadArea.style.pointerEvents = 'none';
+
+    try {
+        if (small.length > 0) {
+            try {
+                const data = await uploadMultipart(small);
+                if (data.success) {
+                    files = data.files;
+                    version = data.version;
+                    uploaded += data.uploaded_count;
+                }
+                (data.errors || (data.success ? [] : [data.error || 'Unknown error'])).forEach(e => failures.push(e));
+            } catch (error) {
+                console.error('Upload error:', error);
+                failures.push('Upload failed, please try again');
+            }
+        }
+
+        for (const file of large) {
+            try {
+                const data = await uploadChunked(file);
+                files = data.files;
+                version = data.version;
+                uploaded += 1;
+            } catch (error) {
+                console.error('Chunked upload error:', error);
+                failures.push(`${file.name}: ${error.message} (select it again to resume)`);
+            }
+        }
+
+        renderFiles();
+        await refreshQuote();
+
+        if (failures.length === 0) {
+            alert(`Successfully uploaded ${uploaded} file(s)`);
+        } else {
+            alert(`Uploaded ${uploaded} file(s). Problems:\n` + failures.join('\n'));
+        }
+    } finally {
+        // Hide loading
+        loadingIndicator.classList.add('hidden');
+        uploadArea.style.opacity = '1';
+        uploadArea.style.pointerEvents = 'auto';
+    }
+}
+
+function renderFiles() {
+    const container = document.getElementById('filesContainer');
+    const summary = document.getElementById('summary');
+
+    if (files.length === 0) {
+        container.innerHTML = '';
+        summary.style.display = 'none';
+        return;
+    }
+
+    summary.style.display = 'block';
+
+    container.innerHTML = files.map((file, index) => `
+        <div class="file-card">
+            <div class="file-header">
+                <div class="file-name">📄 ${file.filename} <span style="color: #999; font-size: 0.9rem;">(${file.page_count} pages)</span></div>
+                <button class="remove-btn" onclick="removeFile(${index})">✕</button>
+            </div>
+            <div class="file-options">
+                <div class="option-group">
+                    <label>Print Mode</label>
+                    <select onchange="updateFile(${index}, 'sides', this.value)">
+                        <option value="double" ${file.print_options.sides === 'double' ? 'selected' : ''}>Double-sided</option>
+                        <option value="single" ${file.print_options.sides === 'single' ? 'selected' : ''}>Single-sided</option>
+                    </select>
+                </div>
+                <div class="option-group">
+                    <label>Color</label>
+                    <select onchange="updateFile(${index}, 'color', this.value === 'true')">
+                        <option value="false" ${!file.print_options.color ? 'selected' : ''}>B&W</option>
+                        <option value="true" ${file.print_options.color ? 'selected' : ''}>Color</option>
+                    </select>
+                </div>
+                <div class="option-group">
+                    <label>Copies</label>
+                    <input type="number" min="1" max="100" value="${file.print_options.copies}" onchange="updateFile(${index}, 'copies', parseInt(this.value))">
+                </div>
+            </div>
+            <div class="file-price" id="price_${index}">${file.price == null ? '…' : '₹' + file.price.toFixed(2)}</div>
+        </div>
+    `).join('');
+
+    updateSummary();
+}
+
+async function updateFile(index, key, value) {
+    const fileId = files[index].file_id;
+    files[index].print_options[key] = value;
+    renderFiles();
+
+    // Update just this file on the server
+    try {
+        const data = await sendChange('PATCH', `/api/order/${SESSION_ID}/files/${fileId}`, {
+            print_options: { [key]: value }
+        });
+
+        if (data.success) {
+            version = data.version;
+            files = files.map(f => f.file_id === fileId ? data.file : f);
+            renderFiles();
+            await refreshQuote();
+        } else {
+            alert(data.error || 'Failed to update file');
+            await loadFiles();
+        }
+    } catch (error) {
+        console.error('Update error:', error);
+    }
+}
+
+async function removeFile(index) {
+    if (!confirm('Remove this file?')) {
+        return;
+    }
+
+    const fileId = files[index].file_id;
+    files.splice(index, 1);
+    renderFiles();
+
+    try {
+        const data = await sendChange('DELETE', `/api/order/${SESSION_ID}/files/${fileId}`);
+
+        if (data.success) {
+            version = data.version;
+            files = files.filter(f => f.file_id !== fileId);
+            renderFiles();
+            await refreshQuote();
+        } else {
+            await loadFiles();
+        }
+    } catch (error) {
+        console.error('Remove error:', error);
+    }
+}
+
+function updateSummary() {
+    document.getElementById('totalPages').textContent = totals.total_pages;
+    document.getElementById('totalSheets').textContent = totals.total_sheets;
+    document.getElementById('totalPrice').textContent = `₹${totals.total_price.toFixed(2)}`;
+}
+
+async function placeOrder() {
+    const btn = document.getElementById('placeOrderBtn');
+
+    if (files.length === 0) {
+        alert('Please upload at least one file');
+        return;
+    }
+
+    // Disable button to prevent double-click
+    if (btn.disabled) {
+        return;
+    }
+
+    btn.disabled = true;
+    btn.style.opacity = '0.5';
+    btn.style.cursor = 'not-allowed';
+    btn.innerHTML = '⏳ Processing...';
+
+    try {
+        const response = await fetch('/api/place-order', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                session_id: SESSION_ID
+            })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            btn.innerHTML = '✅ Order Placed!';
+            alert('Order placed successfully! Redirecting to payment...');
+
+            // Redirect to UPI payment
+            setTimeout(() => {
+                window.location.href = data.payment_url;
+            }, 1500);
+        } else {
+            alert(data.message || data.error || 'Failed to place order');
+            // Re-enable button if there was an error
+            btn.disabled = false;
+            btn.style.opacity = '1';
+            btn.style.cursor = 'pointer';
+            btn.innerHTML = '💳 Place Order';
+        }
+    } catch (error) {
+        console.error('Order error:', error);
+        alert('Failed to place order. Please try again.');
+
+        // Re-enable button on error
+        btn.disabled = false;
+        btn.style.opacity = '1';
+        btn.style.cursor = 'pointer';
+        btn.innerHTML = '💳 Place Order';
+    }
+}
+
+async function clearAll() {
+    if (!confirm('Clear all files?')) {
+        return;
+    }
+
+    // Only clear what we have seen: a file uploaded meanwhile causes a 409
+    try {
+        const response = await fetch(`/api/order/${SESSION_ID}/files`, {
+            method: 'DELETE',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ version: version })
+        });
+        const data = await response.json();
+
+        if (data.success) {
+            files = [];
+            version = data.version;
+            setTotals({});
+        } else if (response.status === 409 && data.files) {
+            files = data.files;
+            version = data.version;
+            alert('New files were added meanwhile. Please review and clear again.');
+        }
+        renderFiles();
+    } catch (error) {
+        console.error('Clear error:', error);
+    }
+}
+
+// Live updates: files sent over WhatsApp, option changes and print progress
+const PRINT_STATUS_TEXT = {
+    queued: '🕒 Order received, waiting for the printer',
+    printing: '🖨️ Printing your order...',
+    printed: '✅ Printed! Your order is ready for pickup',
+    failed: '⚠️ There was a problem printing, the shop will contact you'
+};
+
+function showPrintStatus(status, data) {
+    const box = document.getElementById('printStatus');
+    let text = PRINT_STATUS_TEXT[status] || status;
+    if (status === 'printing' && data.filename) {
+        text += ` (${data.filename})`;
+    }
+    box.textContent = text;
+    box.classList.remove('hidden');
+}
+
+function connectEvents() {
+    const source = new EventSource(`/api/order/${SESSION_ID}/events`);
+
+    // Runs again after every reconnect; unchanged orders come back as a 304
+    source.addEventListener('open', () => loadFiles());
+
+    source.addEventListener('file-added', (e) => {
+        const data = JSON.parse(e.data);
+        if (version === null || data.version <= version) {
+            return;
+        }
+        if (data.version > version + 1) {
+            loadFiles();  // missed a change in between
+            return;
+        }
+        files.push(data.file);
+        version = data.version;
+        renderFiles();
+        refreshQuote();
+    });
+
+    source.addEventListener('quote-updated', (e) => {
+        const data = JSON.parse(e.data);
+        if (version === null || data.version > version) {
+            files = data.files;
+            version = data.version;
+            setTotals(data);
+            renderFiles();
+        }
+    });
+
+    source.addEventListener('resync', () => loadFiles());
+
+    Object.keys(PRINT_STATUS_TEXT).forEach(status => {
+        source.addEventListener(status, (e) => showPrintStatus(status, JSON.parse(e.data)));
+    });
+}
+
+// Load files on page load, then follow the live stream
+if (window.EventSource) {
+    connectEvents();
+} else {
+    loadFiles();
+}
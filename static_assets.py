@@ -0,0 +1,84 @@
+"""Fingerprinted, precompressed static assets (static/order.css -> order.<hash>.css)"""
+import gzip
+import hashlib
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+CONTENT_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".js": "application/javascript; charset=utf-8",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".ico": "image/x-icon",
+}
+COMPRESSIBLE = {".css", ".js", ".svg"}
+
+
+class Asset:
+    __slots__ = ("name", "fingerprinted", "digest", "content_type", "bodies")
+
+    def __init__(self, name, data):
+        suffix = Path(name).suffix
+        self.name = name
+        self.digest = hashlib.sha256(data).hexdigest()[:12]
+        stem = name[:-len(suffix)] if suffix else name
+        self.fingerprinted = f"{stem}.{self.digest}{suffix}"
+        self.content_type = CONTENT_TYPES.get(suffix, "application/octet-stream")
+        self.bodies = {"identity": data}
+        if suffix in COMPRESSIBLE:
+            self.bodies["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.bodies["br"] = brotli.compress(data, quality=11)
+
+    def etag(self, encoding):
+        return self.digest if encoding == "identity" else f"{self.digest}-{encoding}"
+
+    def negotiate(self, accept_encoding):
+        """Smallest body the client accepts: returns (encoding, bytes)"""
+        accepted = {part.split(";")[0].strip() for part in (accept_encoding or "").split(",")}
+        for encoding in ("br", "gzip"):
+            if encoding in self.bodies and encoding in accepted:
+                return encoding, self.bodies[encoding]
+        return "identity", self.bodies["identity"]
+
+
+class StaticAssets:
+    """Loads every file under root once and compresses it up front.
+
+    Templates link to url(name), which includes a content hash, so those
+    URLs can be cached forever; a changed file gets a new URL on restart.
+    """
+
+    def __init__(self, root, url_prefix="/static"):
+        self.root = Path(root)
+        self.url_prefix = url_prefix
+        self._by_url = {}
+        self._by_name = {}
+        for path in sorted(self.root.rglob("*")):
+            if path.is_file():
+                name = path.relative_to(self.root).as_posix()
+                asset = Asset(name, path.read_bytes())
+                self._by_name[name] = asset
+                self._by_url[asset.fingerprinted] = asset
+
+    def url(self, name):
+        return f"{self.url_prefix}/{self._by_name[name].fingerprinted}"
+
+    def lookup(self, path):
+        """(asset, immutable) for a fingerprinted or plain path, or (None, False)"""
+        if path in self._by_url:
+            return self._by_url[path], True
+        return self._by_name.get(path), False
+
+    def stats(self):
+        return {
+            name: {enc: len(body) for enc, body in asset.bodies.items()}
+            for name, asset in self._by_name.items()
+        }
@@ -0,0 +1,149 @@
+"""WhatsApp Cloud (Graph API) client with connection pooling and retries"""
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class WhatsAppError(Exception):
+    """Graph API call failed after all retries"""
+
+
+class CallStats:
+    """Latency and outcome counters for one kind of call"""
+
+    def __init__(self, window=200):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recent = deque(maxlen=window)
+
+    def record(self, elapsed_ms, ok, retries):
+        self.calls += 1
+        self.retries += retries
+        if not ok:
+            self.errors += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.recent.append(elapsed_ms)
+
+    def as_dict(self):
+        recent = sorted(self.recent)
+
+        def pct(p):
+            return round(recent[min(len(recent) - 1, int(len(recent) * p))], 1) if recent else None
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_ms": round(self.total_ms / self.calls, 1) if self.calls else None,
+            "max_ms": round(self.max_ms, 1),
+            "p50_ms": pct(0.5),
+            "p95_ms": pct(0.95),
+        }
+
+
+class WhatsAppClient:
+    """One keep-alive session for every send and media fetch.
+
+    429 and 5xx responses (and connection errors) are retried with
+    exponential backoff and full jitter, honouring Retry-After.
+    ``base_url`` can point at a local stub server for testing.
+    """
+
+    def __init__(self, token, phone_id, base_url="https://graph.facebook.com/v17.0",
+                 max_retries=3, backoff=0.5, max_backoff=8.0, pool_size=16, timeout=10):
+        self.token = token
+        self.phone_id = phone_id
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _sleep_before_retry(self, attempt, response):
+        delay = None
+        if response is not None:
+            try:
+                delay = float(response.headers.get("Retry-After"))
+            except (TypeError, ValueError):
+                delay = None
+        if delay is None:
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+        time.sleep(min(delay, self.max_backoff))
+
+    def _request(self, name, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        attempt = 0
+        ok = False
+        try:
+            while True:
+                response = None
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                    if response.status_code not in RETRY_STATUSES:
+                        response.raise_for_status()
+                        ok = True
+                        return response
+                    error = WhatsAppError(f"{name}: HTTP {response.status_code}")
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = WhatsAppError(f"{name}: {e}")
+                except requests.HTTPError as e:
+                    raise WhatsAppError(f"{name}: {e}") from e
+                if attempt >= self.max_retries:
+                    raise error
+                if response is not None:
+                    response.close()
+                self._sleep_before_retry(attempt, response)
+                attempt += 1
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._stats.setdefault(name, CallStats()).record(elapsed_ms, ok, attempt)
+
+    def send_text(self, to_phone, text):
+        """Send a text message; returns the API response JSON"""
+        payload = {"messaging_product": "whatsapp", "to": to_phone, "type": "text", "text": {"body": text}}
+        r = self._request("send_text", "POST", f"{self.base_url}/{self.phone_id}/messages", json=payload)
+        return r.json()
+
+    def get_media_url(self, media_id):
+        """Resolve a media id to its (short-lived) download URL"""
+        r = self._request("media_url", "GET", f"{self.base_url}/{media_id}")
+        return r.json().get("url")
+
+    def open_media(self, media_id):
+        """Start downloading a media object; returns (media_url, streaming response)"""
+        media_url = self.get_media_url(media_id)
+        r = self._request("media_download", "GET", media_url, stream=True, timeout=30)
+        return media_url, r
+
+    def download_media(self, media_id, path, chunk_size=128 * 1024):
+        """Stream a media object to path; returns the media URL"""
+        media_url, r = self.open_media(media_id)
+        with r, open(path, "wb") as f:
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    f.write(chunk)
+        return media_url
+
+    def metrics(self):
+        """Per-call latency/outcome metrics"""
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}